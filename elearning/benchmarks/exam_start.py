@@ -0,0 +1,98 @@
+import time
+import frappe
+from frappe.utils import now
+from elearning.elearning.doctype.user_exam_attempt.user_exam_attempt import insert_exam_attempt
+
+# Start latency of an exam attempt as a function of topic size.
+#
+# Everything runs in one transaction that is rolled back at the end:
+#   bench --site <site> execute elearning.benchmarks.exam_start.run --kwargs "{'sizes': [10, 50, 200, 500]}"
+
+def insert_exam_attempt_per_row(user_id, topic_name, flashcard_names):
+    """The previous per-document path, kept as the baseline"""
+    attempt = frappe.new_doc("User Exam Attempt")
+    attempt.user = user_id
+    attempt.topic = topic_name
+    attempt.start_time = now()
+    attempt.insert(ignore_permissions=True)
+
+    for flashcard_name in flashcard_names:
+        detail = frappe.new_doc("User Exam Attempt Detail")
+        detail.parent = attempt.name
+        detail.parenttype = "User Exam Attempt"
+        detail.parentfield = "attempt_details"
+        detail.flashcard = flashcard_name
+        detail.user_answer = ""
+        detail.user_self_assessment = "Chưa hiểu"
+        detail.insert(ignore_permissions=True)
+
+    return attempt
+
+def create_benchmark_topic(size):
+    topic = frappe.get_doc({
+        "doctype": "Topics",
+        "topic_name": f"Exam start benchmark {size}",
+        "is_active": 1
+    }).insert(ignore_permissions=True)
+
+    flashcard_names = []
+    for position in range(size):
+        flashcard_names.append(frappe.get_doc({
+            "doctype": "Flashcard",
+            "topic": topic.name,
+            "flashcard_type": "Concept/Theorem/Formula",
+            "question": f"Benchmark question {position}",
+            "answer": "Answer"
+        }).insert(ignore_permissions=True).name)
+
+    return topic.name, flashcard_names
+
+def count_writes(function, *args):
+    """Number of write statements issued by one call"""
+    before = frappe.db.transaction_writes
+    function(*args)
+    return frappe.db.transaction_writes - before
+
+def time_call(function, *args, repeat=3):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return round((time.perf_counter() - started) / repeat * 1000, 2)
+
+def run(sizes=(10, 50, 200, 500), repeat=3):
+    """
+    Time per-row and bulk creation of an exam attempt for topics of different sizes
+
+    Args:
+        sizes (list): Number of flashcards per topic
+        repeat (int): Attempts created per size and path
+
+    Returns:
+        list: {"size", "per_row_ms", "bulk_ms", "writes_per_row", "writes_bulk"} per size
+    """
+    user_id = frappe.session.user
+    results = []
+    try:
+        for size in sizes:
+            topic_name, flashcard_names = create_benchmark_topic(size)
+
+            per_row_writes = count_writes(insert_exam_attempt_per_row, user_id, topic_name, flashcard_names)
+            bulk_writes = count_writes(insert_exam_attempt, user_id, topic_name, flashcard_names)
+
+            results.append({
+                "size": size,
+                "per_row_ms": time_call(insert_exam_attempt_per_row, user_id, topic_name, flashcard_names, repeat=repeat),
+                "bulk_ms": time_call(insert_exam_attempt, user_id, topic_name, flashcard_names, repeat=repeat),
+                "writes_per_row": per_row_writes,
+                "writes_bulk": bulk_writes
+            })
+    finally:
+        frappe.db.rollback()
+
+    for result in results:
+        print(
+            f"{result['size']:>5} cards: per-row {result['per_row_ms']:>9} ms ({result['writes_per_row']} writes)"
+            f" | bulk {result['bulk_ms']:>7} ms ({result['writes_bulk']} writes)"
+        )
+
+    return results
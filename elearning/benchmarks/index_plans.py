@@ -0,0 +1,116 @@
+import time
+import frappe
+from elearning.utils.indexes import COMPOSITE_INDEXES, UNIQUE_KEYS
+
+# Query plan benchmark for the composite indexes on User SRS Progress.
+#
+# Run against a scratch copy of the table so real data is never touched:
+#   bench --site <site> execute elearning.benchmarks.index_plans.run --kwargs "{'rows': 1000000}"
+
+SCRATCH_TABLE = "_bench_srs_progress"
+
+HOT_QUERIES = {
+    "progress by user and flashcard": """
+        SELECT name FROM `{table}` WHERE user = %(user)s AND flashcard = %(flashcard)s
+    """,
+    "due window": """
+        SELECT name, flashcard, next_review_timestamp FROM `{table}`
+        WHERE user = %(user)s AND next_review_timestamp <= %(now)s
+        ORDER BY next_review_timestamp
+    """,
+    "upcoming window": """
+        SELECT name, flashcard, next_review_timestamp FROM `{table}`
+        WHERE user = %(user)s AND next_review_timestamp > %(now)s
+        AND next_review_timestamp <= DATE_ADD(%(now)s, INTERVAL 7 DAY)
+        ORDER BY next_review_timestamp
+    """
+}
+
+def get_indexes():
+    """Index name, columns and uniqueness of every registered User SRS Progress index"""
+    return [
+        ("_".join(fields) + "_index", fields, False) for fields in COMPOSITE_INDEXES["User SRS Progress"]
+    ] + [
+        ("unique_" + "_".join(fields), fields, True) for fields in UNIQUE_KEYS["User SRS Progress"]
+    ]
+
+def fill_scratch_table(rows, users):
+    """Fill the scratch table from the MariaDB sequence engine, one row per (user, flashcard)"""
+    frappe.db.sql(f"""
+        INSERT INTO `{SCRATCH_TABLE}`
+            (name, user, flashcard, status, next_review_timestamp, creation, modified, owner, modified_by, docstatus)
+        SELECT
+            CONCAT('BENCH-', seq),
+            CONCAT('bench-user-', seq MOD %(users)s, '@example.com'),
+            CONCAT('BENCH-FLCD-', seq DIV %(users)s),
+            'review',
+            NOW() - INTERVAL 30 DAY + INTERVAL (seq MOD 86400) MINUTE,
+            NOW(), NOW(), 'Administrator', 'Administrator', 0
+        FROM seq_1_to_{int(rows)}
+    """, {"users": users})
+
+def measure(params, repeat):
+    results = {}
+    for label, query in HOT_QUERIES.items():
+        query = query.format(table=SCRATCH_TABLE)
+        plan = frappe.db.sql(f"EXPLAIN {query}", params, as_dict=True)
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            frappe.db.sql(query, params)
+        elapsed = (time.perf_counter() - started) / repeat
+
+        results[label] = {
+            "key": plan[0].get("key"),
+            "rows_examined": plan[0].get("rows"),
+            "extra": plan[0].get("Extra"),
+            "ms": round(elapsed * 1000, 3)
+        }
+    return results
+
+def run(rows=1000000, users=1000, repeat=20):
+    """
+    Compare query plans and latency of the hot SRS queries without and with composite indexes
+
+    Args:
+        rows (int): Number of progress rows to generate
+        users (int): Number of distinct users
+        repeat (int): Executions per query when timing
+
+    Returns:
+        dict: {"before": {...}, "after": {...}} keyed by query label
+    """
+    indexes = get_indexes()
+    params = {
+        "user": "bench-user-1@example.com",
+        "flashcard": "BENCH-FLCD-1",
+        "now": frappe.utils.now_datetime()
+    }
+
+    frappe.db.sql_ddl(f"DROP TABLE IF EXISTS `{SCRATCH_TABLE}`")
+    frappe.db.sql_ddl(f"CREATE TABLE `{SCRATCH_TABLE}` LIKE `tabUser SRS Progress`")
+    try:
+        existing = {row.Key_name for row in frappe.db.sql(f"SHOW INDEX FROM `{SCRATCH_TABLE}`", as_dict=True)}
+        for index_name, fields, unique in indexes:
+            if index_name in existing:
+                frappe.db.sql_ddl(f"ALTER TABLE `{SCRATCH_TABLE}` DROP INDEX `{index_name}`")
+
+        fill_scratch_table(rows, users)
+        frappe.db.sql(f"ANALYZE TABLE `{SCRATCH_TABLE}`")
+        before = measure(params, repeat)
+
+        for index_name, fields, unique in indexes:
+            columns = ", ".join(f"`{field}`" for field in fields)
+            index_type = "UNIQUE" if unique else "INDEX"
+            frappe.db.sql_ddl(f"ALTER TABLE `{SCRATCH_TABLE}` ADD {index_type} `{index_name}` ({columns})")
+        frappe.db.sql(f"ANALYZE TABLE `{SCRATCH_TABLE}`")
+        after = measure(params, repeat)
+    finally:
+        frappe.db.sql_ddl(f"DROP TABLE IF EXISTS `{SCRATCH_TABLE}`")
+
+    for label in HOT_QUERIES:
+        print(f"{label}:")
+        print(f"  before: {before[label]}")
+        print(f"  after:  {after[label]}")
+
+    return {"before": before, "after": after}
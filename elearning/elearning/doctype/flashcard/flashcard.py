@@ -4,6 +4,8 @@
 import frappe
 from frappe.model.document import Document
 from frappe import _
+from elearning.utils import flashcard_cache
+from elearning.utils.child_tables import attach_ordering_steps
 
 def get_current_user():
 	user = frappe.session.user
@@ -62,34 +64,17 @@ def get_flashcards_for_type(topic_id=None, flashcard_type=None):
 		frappe.throw(_("Authentication required."), frappe.AuthenticationError)
 
 	try:
-		filters = {}
+		fields = ["name", "topic", "flashcard_type", "question", "answer", "explanation", "hint", "solution_with_error"]
+		
+		# Topic listings are served from the topic content cache
 		if topic_id:
-			filters["topic"] = topic_id
+			return flashcard_cache.get_topic_flashcards(topic_id, flashcard_type, fields=fields)
 		
+		filters = {}
 		if flashcard_type and flashcard_type != "All":
 			filters["flashcard_type"] = flashcard_type
 		
-		# Get basic flashcard data
-		flashcards = frappe.get_list(
-			"Flashcard",
-			filters=filters,
-			fields=["name", "topic", "flashcard_type", "question", "answer", "explanation", "hint", "solution_with_error"],
-			order_by="name"
-		)
-		
-		# For each flashcard, fetch additional data based on its type
-		for flashcard in flashcards:
-			# For "Ordering Steps" type, fetch the child table items
-			if flashcard.get("flashcard_type") == "Ordering Steps":
-				ordering_steps = frappe.get_all(
-					"Ordering Step Item",
-					filters={"parent": flashcard.get("name")},
-					fields=["step_content", "correct_order"],
-					order_by="correct_order"
-				)
-				flashcard["ordering_steps_items"] = ordering_steps
-		
-		return flashcards
+		return [flashcard_cache.copy_flashcard(card, fields) for card in flashcard_cache.load_flashcards(filters)]
 		
 	except Exception as e:
 		frappe.log_error(f"Error fetching flashcards: {e}", "Flashcard API Error")
@@ -124,14 +109,7 @@ def get_flashcard_by_id(flashcard_id):
 			result["solution_with_error"] = flashcard.solution_with_error
 		
 		# For "Ordering Steps" type, fetch the child table items
-		if flashcard.flashcard_type == "Ordering Steps":
-			ordering_steps = frappe.get_all(
-				"Ordering Step Item",
-				filters={"parent": flashcard.name},
-				fields=["step_content", "correct_order"],
-				order_by="correct_order"
-			)
-			result["ordering_steps_items"] = ordering_steps
+		attach_ordering_steps([result])
 		
 		return result
 		
@@ -1,9 +1,137 @@
 # Copyright (c) 2025, Minh Quy and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from elearning.elearning.doctype.flashcard.flashcard import get_flashcard_by_id, get_flashcards_for_type
+from elearning.elearning.doctype.user_exam_attempt.user_exam_attempt import (
+	get_exam_attempt_details,
+	start_exam_attempt,
+)
+from elearning.elearning.doctype.user_srs_progress.test_user_srs_progress import (
+	create_flashcard,
+	create_topic,
+)
+from elearning.utils import flashcard_cache
+from elearning.utils.child_tables import attach_ordering_steps, get_child_rows
+
 
 class TestFlashcard(FrappeTestCase):
-	pass
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.topic = create_topic("Flashcard Cache Topic").name
+		self.concept = create_flashcard(self.topic).name
+		self.ordering = create_flashcard(self.topic, "Ordering Steps", ["Step A", "Step B"]).name
+
+	def tearDown(self):
+		frappe.db.rollback()
+		flashcard_cache.invalidate_topic(self.topic)
+
+	def test_topic_listing_is_served_from_cache(self):
+		expected = get_flashcards_for_type(self.topic)
+
+		with self.assertQueryCount(0):
+			self.assertEqual(get_flashcards_for_type(self.topic), expected)
+
+		ordering = next(card for card in expected if card.name == self.ordering)
+		self.assertEqual([step.step_content for step in ordering.ordering_steps_items], ["Step A", "Step B"])
+		self.assertEqual(
+			[card.name for card in get_flashcards_for_type(self.topic, "Ordering Steps")],
+			[self.ordering]
+		)
+
+	def test_flashcard_update_invalidates_topic(self):
+		get_flashcards_for_type(self.topic)
+
+		flashcard = frappe.get_doc("Flashcard", self.concept)
+		flashcard.question = "Updated question"
+		flashcard.save(ignore_permissions=True)
+
+		cards = {card.name: card for card in get_flashcards_for_type(self.topic)}
+		self.assertEqual(cards[self.concept].question, "Updated question")
+
+	def test_ordering_step_change_invalidates_topic(self):
+		get_flashcards_for_type(self.topic)
+
+		flashcard = frappe.get_doc("Flashcard", self.ordering)
+		flashcard.append("ordering_steps_items", {"step_content": "Step C", "correct_order": 3})
+		flashcard.save(ignore_permissions=True)
+
+		cards = {card.name: card for card in get_flashcards_for_type(self.topic)}
+		self.assertEqual(
+			[step.step_content for step in cards[self.ordering].ordering_steps_items],
+			["Step A", "Step B", "Step C"]
+		)
+
+	def test_moved_flashcard_leaves_old_topic(self):
+		other_topic = create_topic("Flashcard Cache Other Topic").name
+		get_flashcards_for_type(self.topic)
+		get_flashcards_for_type(other_topic)
+
+		flashcard = frappe.get_doc("Flashcard", self.concept)
+		flashcard.topic = other_topic
+		flashcard.save(ignore_permissions=True)
+
+		self.assertNotIn(self.concept, [card.name for card in get_flashcards_for_type(self.topic)])
+		self.assertIn(self.concept, [card.name for card in get_flashcards_for_type(other_topic)])
+		flashcard_cache.invalidate_topic(other_topic)
+
+	def test_cached_copies_are_independent(self):
+		cards = get_flashcards_for_type(self.topic)
+		for card in cards:
+			card.question = "Changed by caller"
+			card.get("ordering_steps_items", []).clear()
+
+		for card in get_flashcards_for_type(self.topic):
+			self.assertNotEqual(card.question, "Changed by caller")
+			if card.name == self.ordering:
+				self.assertEqual(len(card.ordering_steps_items), 2)
+
+	def test_exam_endpoints_read_cached_content(self):
+		attempt = start_exam_attempt(self.topic)["attempt"]
+		self.assertEqual({card.name for card in attempt["flashcards"]}, {self.concept, self.ordering})
+
+		details = get_exam_attempt_details(attempt["name"])["attempt"]["details"]
+		ordering = next(detail for detail in details if detail["flashcard"] == self.ordering)
+		self.assertEqual([step.step_content for step in ordering["ordering_steps_items"]], ["Step A", "Step B"])
+
+	def test_child_rows_are_grouped_and_ordered(self):
+		flashcard = create_flashcard(self.topic, "Ordering Steps")
+		for step_content, correct_order in (("Third", 3), ("First", 1), ("Second", 2)):
+			flashcard.append("ordering_steps_items", {"step_content": step_content, "correct_order": correct_order})
+		flashcard.save(ignore_permissions=True)
+		other = flashcard.name
+
+		with self.assertQueryCount(1):
+			steps = get_child_rows(
+				"Ordering Step Item",
+				[self.ordering, other, self.concept],
+				["step_content", "correct_order"],
+				order_by="correct_order"
+			)
+
+		self.assertEqual(set(steps), {self.ordering, other})
+		self.assertEqual([step.step_content for step in steps[other]], ["First", "Second", "Third"])
+		self.assertNotIn("parent", steps[other][0])
+
+	def test_ordering_steps_query_budget_is_constant(self):
+		for _ in range(10):
+			create_flashcard(self.topic, "Ordering Steps", ["Step A", "Step B"])
+		flashcard_cache.invalidate_topic(self.topic)
+
+		# One query for the flashcards and one for every ordering step of the topic
+		with self.assertQueryCount(2):
+			cards = get_flashcards_for_type(self.topic)
+
+		self.assertTrue(all(
+			len(card.ordering_steps_items) == 2
+			for card in cards if card.flashcard_type == "Ordering Steps"
+		))
+
+		cards = frappe.get_all("Flashcard", filters={"topic": self.topic}, fields=["name", "flashcard_type"])
+		with self.assertQueryCount(1):
+			attach_ordering_steps(cards)
+
+		single = get_flashcard_by_id(self.ordering)
+		self.assertEqual([step.step_content for step in single["ordering_steps_items"]], ["Step A", "Step B"])
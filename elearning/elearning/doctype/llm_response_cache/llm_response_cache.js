@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Minh Quy and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("LLM Response Cache", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,307 @@
+# Copyright (c) 2026, Minh Quy and Contributors
+# See license.txt
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import frappe
+import redis
+from frappe.tests.utils import FrappeTestCase
+from redis.exceptions import RedisError
+
+from elearning.elearning.doctype.user_exam_attempt.user_exam_attempt import (
+	parse_ai_feedback,
+	request_ai_feedback,
+)
+from elearning.elearning.doctype.user_srs_progress.test_user_srs_progress import (
+	create_flashcard,
+	create_topic,
+)
+from elearning.utils import llm_cache, llm_client
+from elearning.utils.llm_client import LLMClient
+
+FEEDBACK = {
+	"ai_feedback_what_was_correct": "Đúng",
+	"ai_feedback_what_was_incorrect": "",
+	"ai_feedback_what_to_include": "Thêm ví dụ"
+}
+
+
+def gemini_response(text):
+	return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+class LLMStub:
+	"""
+	Local HTTP server answering Gemini generateContent requests
+
+	Used as a context manager it points the LLM client at itself. Queue responses with
+	respond(), otherwise every request gets default_text.
+	"""
+
+	def __init__(self, default_text="Phần đúng: Đúng.\nPhần chưa đúng: Không có.\nPhần nên bổ sung: Không có."):
+		self.default_text = default_text
+		self.requests = []
+		self.responses = []
+		stub = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = "HTTP/1.1"
+
+			def do_POST(self):
+				url = urlparse(self.path)
+				stub.requests.append(frappe._dict({
+					"path": url.path,
+					"query": parse_qs(url.query),
+					"body": json.loads(self.rfile.read(int(self.headers["Content-Length"]))),
+					"client_port": self.client_address[1]
+				}))
+
+				status, payload, delay = stub.responses.pop(0) if stub.responses else (200, gemini_response(stub.default_text), 0)
+				time.sleep(delay)
+
+				data = json.dumps(payload).encode()
+				self.send_response(status)
+				self.send_header("Content-Type", "application/json")
+				self.send_header("Content-Length", str(len(data)))
+				self.end_headers()
+				self.wfile.write(data)
+
+			def log_message(self, *args):
+				pass
+
+		self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+		self.conf = patch.dict(frappe.conf, {
+			"gemini_api_base_url": f"http://127.0.0.1:{self.server.server_port}",
+			"gemini_api_key": "test-key"
+		})
+
+	def respond(self, status=200, payload=None, delay=0, text=None):
+		self.responses.append((status, payload if payload is not None else gemini_response(text or ""), delay))
+
+	def __enter__(self):
+		threading.Thread(target=self.server.serve_forever, daemon=True).start()
+		self.conf.start()
+		return self
+
+	def __exit__(self, *exc):
+		self.conf.stop()
+		self.server.shutdown()
+		self.server.server_close()
+
+
+class TestLLMResponseCache(FrappeTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.namespace = f"test_{frappe.generate_hash(length=8)}"
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_inputs(self, answer="x = 2"):
+		return {"model": "test-model", "prompt": "Solve x + 1 = 3", "answer": llm_cache.normalize_answer(answer)}
+
+	def get_stats(self):
+		return llm_cache.get_cache_stats().get(self.namespace)
+
+	def test_normalize_answer(self):
+		self.assertEqual(llm_cache.normalize_answer("  Hà   Nội\n"), "Hà Nội")
+		# Decomposed "à" (a + combining grave) matches the precomposed character
+		self.assertEqual(llm_cache.normalize_answer("Ha\u0300 N\u00f4\u0323i"), "H\u00e0 N\u1ed9i")
+		self.assertEqual(llm_cache.normalize_answer(None), "")
+
+	def test_key_depends_only_on_content(self):
+		self.assertEqual(
+			llm_cache.make_cache_key(self.namespace, {"a": 1, "b": 2}),
+			llm_cache.make_cache_key(self.namespace, {"b": 2, "a": 1})
+		)
+		self.assertNotEqual(
+			llm_cache.make_cache_key(self.namespace, {"a": 1}),
+			llm_cache.make_cache_key(self.namespace, {"a": 2})
+		)
+		self.assertNotEqual(
+			llm_cache.make_cache_key(self.namespace, {"a": 1}),
+			llm_cache.make_cache_key("other", {"a": 1})
+		)
+
+	def test_hit_after_store_and_stats(self):
+		self.assertIsNone(llm_cache.get_response(self.namespace, self.get_inputs()))
+
+		llm_cache.set_response(self.namespace, self.get_inputs(), FEEDBACK)
+
+		self.assertEqual(llm_cache.get_response(self.namespace, self.get_inputs(" x  =  2 ")), FEEDBACK)
+		self.assertEqual(self.get_stats(), {
+			"redis_hits": 1,
+			"db_hits": 0,
+			"misses": 1,
+			"requests": 2,
+			"hit_rate": 0.5
+		})
+
+	def test_stats_without_redis(self):
+		with patch.object(redis.Redis, "hgetall", side_effect=RedisError("down")):
+			self.assertEqual(llm_cache.get_cache_stats(), {})
+
+	def test_least_recently_used_entry_is_evicted(self):
+		frappe.cache().delete(llm_cache.get_lru_key())
+
+		with patch.object(llm_cache, "MAX_ENTRIES", 2):
+			llm_cache.set_response(self.namespace, {"n": 1}, "one")
+			llm_cache.set_response(self.namespace, {"n": 2}, "two")
+			# Reading the first entry makes the second one the least recently used
+			llm_cache.get_response(self.namespace, {"n": 1})
+			llm_cache.set_response(self.namespace, {"n": 3}, "three")
+
+		self.assertEqual(llm_cache.get_response(self.namespace, {"n": 1}), "one")
+		self.assertIsNone(llm_cache.get_response(self.namespace, {"n": 2}))
+		self.assertEqual(llm_cache.get_response(self.namespace, {"n": 3}), "three")
+
+	def test_persistent_tier_survives_cache_flush(self):
+		with patch.dict(frappe.conf, {"llm_response_cache_persistent": 1}):
+			llm_cache.set_response(self.namespace, self.get_inputs(), FEEDBACK)
+			key = llm_cache.make_cache_key(self.namespace, self.get_inputs())
+			frappe.cache().delete_value(llm_cache.get_entry_key(key))
+
+			self.assertEqual(llm_cache.get_response(self.namespace, self.get_inputs()), FEEDBACK)
+			# The entry is back in Redis after the database hit
+			self.assertEqual(llm_cache.get_response(self.namespace, self.get_inputs()), FEEDBACK)
+
+		self.assertEqual(frappe.db.get_value("LLM Response Cache", key, "hit_count"), 1)
+		self.assertEqual(self.get_stats()["db_hits"], 1)
+		self.assertEqual(self.get_stats()["redis_hits"], 1)
+
+	def test_repeated_exam_answer_skips_llm(self):
+		flashcard = create_flashcard(create_topic("LLM Cache Test Topic").name, flashcard_type="Fill in the Blank")
+		llm_response = "Phần đúng: Đúng.\nPhần chưa đúng: Không có.\nPhần nên bổ sung: Không có."
+
+		with (
+			patch.dict(frappe.conf, {"gemini_api_key": "test-key"}),
+			patch(
+				"elearning.elearning.doctype.user_exam_attempt.user_exam_attempt.call_feedback_llm",
+				return_value=llm_response
+			) as call_feedback_llm
+		):
+			first = request_ai_feedback(flashcard, "Hà Nội")
+			second = request_ai_feedback(flashcard, " Hà  Nội ")
+			other = request_ai_feedback(flashcard, "Huế")
+
+		self.assertEqual(first, second)
+		self.assertEqual(call_feedback_llm.call_count, 2)
+		self.assertNotIn("Huế", call_feedback_llm.call_args_list[0].args[1])
+		self.assertIn("Huế", call_feedback_llm.call_args_list[1].args[1])
+		self.assertEqual(other, first)
+
+
+class TestLLMClient(FrappeTestCase):
+	def setUp(self):
+		llm_client.clear_api_key()
+		self.client = LLMClient()
+		self.client_patch = patch.object(llm_client, "_client", self.client)
+		self.client_patch.start()
+
+	def tearDown(self):
+		self.client_patch.stop()
+		llm_client.clear_api_key()
+		frappe.db.rollback()
+
+	def test_requests_share_one_connection(self):
+		with LLMStub() as stub:
+			stub.respond(text="first")
+			stub.respond(text="second")
+
+			self.assertEqual(llm_client.generate_content(["system", "user"], "test-model"), "first")
+			self.assertEqual(llm_client.generate_content(["system", "user"], "test-model"), "second")
+
+		self.assertEqual(stub.requests[0].path, "/models/test-model:generateContent")
+		self.assertEqual(stub.requests[0].query["key"], ["test-key"])
+		self.assertEqual(
+			[part["text"] for part in stub.requests[0].body["contents"][0]["parts"]],
+			["system", "user"]
+		)
+		self.assertEqual(stub.requests[0].client_port, stub.requests[1].client_port)
+
+	def test_api_key_is_resolved_once(self):
+		with patch.dict(frappe.conf, {"gemini_api_key": "first-key"}):
+			self.assertEqual(llm_client.get_api_key(), "first-key")
+		with patch.dict(frappe.conf, {"gemini_api_key": "second-key"}):
+			self.assertEqual(llm_client.get_api_key(), "first-key")
+			llm_client.clear_api_key()
+			self.assertEqual(llm_client.get_api_key(), "second-key")
+
+	def test_settings_update_rotates_api_key_in_every_process(self):
+		with patch.dict(frappe.conf, {"gemini_api_key": "old-key"}):
+			self.assertEqual(llm_client.get_api_key(), "old-key")
+		with patch.dict(frappe.conf, {"gemini_api_key": "new-key"}):
+			# Another process saved Elearning Settings
+			frappe.cache().incr(llm_client.get_api_key_version_key())
+			self.assertEqual(llm_client.get_api_key(), "new-key")
+
+		with patch.dict(frappe.conf, {"gemini_api_key": "newer-key"}):
+			llm_client.on_settings_update(frappe._dict(), "on_update")
+			self.assertEqual(llm_client.get_api_key(), "newer-key")
+
+	def test_circuit_opens_after_repeated_failures(self):
+		with LLMStub() as stub:
+			for _ in range(llm_client.FAILURE_THRESHOLD):
+				stub.respond(status=503, payload={"error": "unavailable"})
+				with self.assertRaises(llm_client.LLMError):
+					llm_client.generate_content(["prompt"], "test-model")
+
+			with self.assertRaises(llm_client.LLMUnavailableError):
+				llm_client.generate_content(["prompt"], "test-model")
+
+			# After the cooldown one trial request is let through and closes the circuit
+			self.client.circuit.opened_at -= llm_client.CIRCUIT_COOLDOWN_SECONDS
+			self.assertTrue(llm_client.generate_content(["prompt"], "test-model"))
+			self.assertTrue(llm_client.generate_content(["prompt"], "test-model"))
+
+		self.assertEqual(len(stub.requests), llm_client.FAILURE_THRESHOLD + 2)
+
+	def test_rejected_request_does_not_open_circuit(self):
+		with LLMStub() as stub:
+			for _ in range(llm_client.FAILURE_THRESHOLD):
+				stub.respond(status=400, payload={"error": "bad request"})
+				with self.assertRaises(llm_client.LLMError):
+					llm_client.generate_content(["prompt"], "test-model")
+
+			self.assertTrue(llm_client.generate_content(["prompt"], "test-model"))
+
+	def test_slow_response_times_out(self):
+		with LLMStub() as stub:
+			stub.respond(delay=1, text="late")
+			with self.assertRaises(llm_client.LLMError):
+				llm_client.generate_content(["prompt"], "test-model", timeout=0.2)
+
+	def test_concurrency_limit(self):
+		client = LLMClient(max_concurrency=1)
+		client.slots.acquire()
+
+		with LLMStub() as stub, patch.object(llm_client, "MAX_WAIT_SECONDS", 0.1):
+			with self.assertRaises(llm_client.LLMUnavailableError):
+				client.generate_content(["prompt"], "test-model")
+
+			client.slots.release()
+			self.assertTrue(client.generate_content(["prompt"], "test-model"))
+
+		self.assertEqual(len(stub.requests), 1)
+
+	def test_rate_limit(self):
+		rate_limiter = llm_client.RateLimiter(requests_per_minute=2)
+
+		self.assertTrue(rate_limiter.acquire(timeout=0))
+		self.assertTrue(rate_limiter.acquire(timeout=0))
+		self.assertFalse(rate_limiter.acquire(timeout=0))
+
+	def test_exam_feedback_goes_through_client(self):
+		flashcard = create_flashcard(create_topic("LLM Client Test Topic").name)
+
+		with LLMStub() as stub:
+			feedback = request_ai_feedback(flashcard, "Định nghĩa")
+
+		self.assertEqual(len(stub.requests), 1)
+		self.assertEqual(stub.requests[0].path, "/models/gemini-1.5-pro:generateContent")
+		self.assertEqual(feedback, parse_ai_feedback(stub.default_text))
@@ -1,6 +1,7 @@
 import frappe
 from frappe.model.document import Document
 from frappe import _
+from elearning.utils.test_utils import get_test_payload
 
 def get_current_user():
     user = frappe.session.user
@@ -92,62 +93,21 @@ def get_test_details(test_id):
 def get_test_data(test_id):
     """
     Retrieves test metadata and sanitized questions for the test-taking UI.
+    Served from the compiled test payload, see elearning.utils.test_utils.get_test_payload.
     """
     user = get_current_user()
-    if user == "Guest":
-        frappe.throw(_("Authentication required."), frappe.AuthenticationError)
-
-    try:
-        test_doc = frappe.get_doc("Test", test_id)
-        # Consider uncommenting permission check if needed, though get_doc usually handles it
-        # if not frappe.has_permission("Test", "read", doc=test_doc):
-        #     frappe.throw(_("You do not have permission to access this test."), frappe.PermissionError)
-
-        if not test_doc.is_active:
-            frappe.throw(_("Test {0} is not currently active.").format(test_id), frappe.ValidationError)
-
-        sanitized_questions = []
-        for test_q_detail in test_doc.get("questions", []):
-            try:
-                q_doc = frappe.get_doc("Question", test_q_detail.question)
-                
-                formatted_options = None # Use a more descriptive name
-                if q_doc.question_type == "Multiple Choice":
-                    formatted_options = []
-                    for idx, option_row in enumerate(q_doc.get("options", [])):
-                        formatted_options.append({
-                            "id": option_row.name,       
-                            "text": option_row.option_text, 
-                            "label": chr(65 + idx)      
-                            # If options can have images, add: "image": option_row.image_field_name
-                        })
-
-            
-                sanitized_questions.append({
-                    "test_question_detail_id": test_q_detail.name, # ID of the Test Question Item row
-                    "question_id": q_doc.name,                     # ID of the base Question doc
-                    "content": q_doc.content,
-                    "image": q_doc.image_url, # Or q_doc.image, ensure fieldname is correct
-                    "question_type": q_doc.question_type,
-                    "options": formatted_options, # Use the new list with IDs and labels
-                    "hint": q_doc.hint,
-                    "point_value": test_q_detail.points,
-                    "question_order": test_q_detail.idx
-                })
-            except frappe.DoesNotExistError:
-                frappe.log_error(f"Question {test_q_detail.question} linked in Test {test_id} (Test Question Item: {test_q_detail.name}) not found.", "TestDataError")
-                continue # Skip this question if the base Question doc is missing
-
-        return {
-            "id": test_doc.name,
-            "title": test_doc.title,
-            "time_limit_minutes": test_doc.time_limit_minutes,
-            "instructions": test_doc.instructions,
-            "questions": sorted(sanitized_questions, key=lambda q: q.get("question_order", float('inf')))
-        }
 
-    except frappe.DoesNotExistError:
+    payload = get_test_payload(test_id)
+    if not payload:
         frappe.throw(_("Test {0} not found").format(test_id), frappe.DoesNotExistError)
-    except Exception as e:
-        frappe.log_error(frappe.get_traceback(), "GetTestDataUnhandledError")
-        frappe.throw(_("An error occurred while retrieving test data."))
\ No newline at end of file
+
+    if not payload["is_active"]:
+        frappe.throw(_("Test {0} is not currently active.").format(test_id), frappe.ValidationError)
+
+    return {
+        "id": payload["id"],
+        "title": payload["title"],
+        "time_limit_minutes": payload["time_limit_minutes"],
+        "instructions": payload["instructions"],
+        "questions": payload["questions"]
+    }
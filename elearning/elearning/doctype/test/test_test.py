@@ -0,0 +1,154 @@
+# Copyright (c) 2026, Minh Quy and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from elearning.elearning.doctype.test.test import get_test_data
+from elearning.elearning.doctype.test_attempt.test_attempt import start_or_resume_test_attempt
+from elearning.utils import test_utils
+
+
+def create_question(content, question_type="Essay", options=None, answer_key=None):
+	question = frappe.get_doc({
+		"doctype": "Question",
+		"content": content,
+		"question_type": question_type,
+		"hint": f"Gợi ý: {content}",
+		"answer_key": answer_key
+	})
+	for option_text, is_correct in options or []:
+		question.append("options", {"option_text": option_text, "is_correct": is_correct})
+	return question.insert(ignore_permissions=True)
+
+
+def create_test(questions, title="Payload Test", is_active=1):
+	test = frappe.get_doc({
+		"doctype": "Test",
+		"title": title,
+		"time_limit_minutes": 45,
+		"is_active": is_active
+	})
+	for position, question in enumerate(questions):
+		test.append("questions", {"question": question.name, "points": position + 1})
+	return test.insert(ignore_permissions=True)
+
+
+class TestTestPayload(FrappeTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.questions = [
+			create_question("Giải phương trình x + 1 = 3", answer_key="2"),
+			create_question("Chọn số nguyên tố", "Multiple Choice", [("4", 0), ("7", 1), ("9", 0)])
+		]
+		self.test = create_test(self.questions)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_payload_has_questions_in_order_without_answers(self):
+		data = get_test_data(self.test.name)
+
+		self.assertEqual(data["id"], self.test.name)
+		self.assertEqual(data["time_limit_minutes"], 45)
+		self.assertEqual(
+			[question["question_id"] for question in data["questions"]],
+			[question.name for question in self.questions]
+		)
+		self.assertEqual([question["point_value"] for question in data["questions"]], [1, 2])
+
+		options = data["questions"][1]["options"]
+		self.assertEqual([option["label"] for option in options], ["A", "B", "C"])
+		self.assertEqual([option["text"] for option in options], ["4", "7", "9"])
+		self.assertEqual(options[1]["id"], self.questions[1].options[1].name)
+		self.assertIsNone(data["questions"][0]["options"])
+
+		# Answer keys never reach the test-taking UI
+		self.assertNotIn("is_correct", frappe.as_json(data))
+		self.assertNotIn("answer_key", frappe.as_json(data))
+
+	def test_payload_is_compiled_once(self):
+		get_test_data(self.test.name)
+
+		# Later students get the compiled payload without touching the database
+		with self.assertQueryCount(0):
+			get_test_data(self.test.name)
+
+		# Another process only has to read the payload from Redis
+		test_utils._local_payloads.clear()
+		frappe.local.cache = {}
+		with self.assertQueryCount(0):
+			self.assertEqual(len(get_test_data(self.test.name)["questions"]), 2)
+
+	def test_test_update_invalidates_payload(self):
+		get_test_data(self.test.name)
+
+		self.test.reload()
+		self.test.questions[0].points = 5
+		self.test.title = "Payload Test (sửa)"
+		self.test.save(ignore_permissions=True)
+
+		data = get_test_data(self.test.name)
+		self.assertEqual(data["title"], "Payload Test (sửa)")
+		self.assertEqual(data["questions"][0]["point_value"], 5)
+
+	def test_rebuild_racing_an_update_is_not_served(self):
+		stale = test_utils.build_compiled_test(self.test.name)
+
+		def build_then_update(test_id):
+			# The update commits while this reader is still compiling the old data
+			frappe.db.set_value("Test", test_id, "title", "Payload Test (sửa)")
+			test_utils.invalidate_test_payload(test_id)
+			return stale
+
+		with patch.object(test_utils, "build_compiled_test", side_effect=build_then_update):
+			self.assertEqual(get_test_data(self.test.name)["title"], "Payload Test")
+
+		self.assertEqual(get_test_data(self.test.name)["title"], "Payload Test (sửa)")
+		test_utils._local_payloads.clear()
+		self.assertEqual(get_test_data(self.test.name)["title"], "Payload Test (sửa)")
+
+	def test_clearing_version_key_invalidates_payload(self):
+		get_test_data(self.test.name)
+		frappe.db.set_value("Test", self.test.name, "title", "Payload Test (sửa)")
+
+		# Code that clears the cache of a test the way it always has
+		frappe.cache().delete_key(f"test_questions_{self.test.name}")
+
+		self.assertEqual(get_test_data(self.test.name)["title"], "Payload Test (sửa)")
+
+	def test_process_cache_is_bounded(self):
+		with patch.object(test_utils, "LOCAL_PAYLOAD_LIMIT", 1):
+			other = create_test(self.questions, title="Other Payload Test")
+			get_test_data(self.test.name)
+			get_test_data(other.name)
+
+		self.assertEqual(list(test_utils._local_payloads), [(frappe.local.site, other.name)])
+
+	def test_question_update_invalidates_payload(self):
+		get_test_data(self.test.name)
+
+		question = frappe.get_doc("Question", self.questions[0].name)
+		question.content = "Giải phương trình x + 2 = 3"
+		question.save(ignore_permissions=True)
+
+		self.assertEqual(get_test_data(self.test.name)["questions"][0]["content"], "Giải phương trình x + 2 = 3")
+
+	def test_inactive_test_cannot_be_started(self):
+		inactive = create_test(self.questions, title="Inactive Payload Test", is_active=0)
+
+		with self.assertRaises(frappe.ValidationError):
+			get_test_data(inactive.name)
+		with self.assertRaises(frappe.ValidationError):
+			start_or_resume_test_attempt(inactive.name)
+
+	def test_start_uses_compiled_payload(self):
+		get_test_data(self.test.name)
+
+		result = start_or_resume_test_attempt(self.test.name)
+
+		self.assertEqual(result["questions"], get_test_data(self.test.name)["questions"])
+		self.assertEqual(result["test"]["title"], "Payload Test")
+		self.assertEqual(result["attempt"]["remaining_time_seconds"], 45 * 60)
@@ -0,0 +1,474 @@
+# Copyright (c) 2026, Minh Quy and Contributors
+# See license.txt
+
+import json
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from elearning.elearning.doctype.llm_response_cache.test_llm_response_cache import LLMStub
+from elearning.elearning.doctype.test.test_test import create_question, create_test
+from elearning.elearning.doctype.test_attempt.test_attempt import (
+	get_attempt_result_details,
+	process_test_feedback,
+	save_attempt_progress,
+	start_or_resume_test_attempt,
+	submit_test_attempt,
+)
+from elearning.utils import answer_buffer, llm_client
+from elearning.utils.llm_client import LLMClient
+from elearning.utils.test_utils import get_grading_index
+
+MODULE = "elearning.elearning.doctype.test_attempt.test_attempt"
+
+
+def submission(answers, **extra):
+	return json.dumps({
+		"answers": {item: {"userAnswer": answer, "timeSpent": 30} for item, answer in answers.items()},
+		"timeLeft": 600,
+		**extra
+	})
+
+
+class TestTestAttemptGrading(FrappeTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.questions = [
+			create_question(f"Câu {position}: chọn số nguyên tố", "Multiple Choice", [("4", 0), (str(position * 2 + 3), 1)])
+			for position in range(20)
+		] + [create_question("Trình bày lời giải", answer_key="x = 2")]
+		self.test = create_test(self.questions, title="Grading Test")
+		self.test.passing_score = 5
+		self.test.save(ignore_permissions=True)
+
+		self.items = [item.name for item in self.test.questions]
+		self.correct_options = [question.options[1].name for question in self.questions[:20]]
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def start(self):
+		return start_or_resume_test_attempt(self.test.name)["attempt"]["id"]
+
+	def submit(self, attempt_id, answers, **extra):
+		with patch("frappe.enqueue") as enqueue:
+			result = submit_test_attempt(attempt_id, submission(answers, **extra))
+		return result, enqueue
+
+	def test_grading_index_matches_questions(self):
+		grading_index = get_grading_index(self.test.name)
+
+		self.assertEqual(grading_index["passing_score"], 5)
+		self.assertEqual(grading_index["items"][self.items[0]]["correct_option"], self.correct_options[0])
+		self.assertEqual(grading_index["items"][self.items[0]]["points"], 1)
+		self.assertEqual(grading_index["items"][self.items[20]]["answer_key"], "x = 2")
+		self.assertEqual(grading_index["items"][self.items[20]]["question_type"], "Essay")
+
+	def test_submission_is_graded_from_index(self):
+		attempt_id = self.start()
+		answers = {item: option for item, option in zip(self.items[:10], self.correct_options[:10])}
+		answers[self.items[10]] = self.correct_options[0]
+		answers["unknown-item"] = "whatever"
+
+		result, _ = self.submit(attempt_id, answers, lastViewedTestQuestionId=self.items[3])
+
+		# Items 1-10 are worth 1-10 points, item 11 (11 points) is answered wrong
+		self.assertEqual(result["score"], sum(range(1, 11)))
+		self.assertTrue(result["passed"])
+		self.assertEqual(result["status"], "Completed")
+
+		attempt = frappe.get_doc("Test Attempt", attempt_id)
+		self.assertEqual(attempt.status, "Completed")
+		self.assertEqual(attempt.last_viewed_question, self.questions[3].name)
+		self.assertEqual([answer.test_question_item for answer in attempt.answers], self.items[:11])
+		self.assertEqual([answer.is_correct for answer in attempt.answers], [1] * 10 + [0])
+		self.assertEqual(attempt.answers[10].points_awarded, 0)
+		self.assertEqual(attempt.answers[0].time_spent_seconds, 30)
+
+	def test_submission_replaces_saved_progress(self):
+		attempt_id = self.start()
+		attempt = frappe.get_doc("Test Attempt", attempt_id)
+		attempt.append("answers", {
+			"question": self.questions[0].name,
+			"test_question_item": self.items[0],
+			"user_answer": "draft"
+		})
+		attempt.save(ignore_permissions=True)
+
+		self.submit(attempt_id, {self.items[0]: self.correct_options[0]})
+
+		answers = frappe.get_all("Attempt Answer Item", filters={"parent": attempt_id}, fields=["user_answer", "is_correct"])
+		self.assertEqual(answers, [{"user_answer": self.correct_options[0], "is_correct": 1}])
+
+	def test_answer_to_deleted_question_is_not_scored(self):
+		attempt_id = self.start()
+		frappe.delete_doc("Question", self.questions[1].name, force=True, ignore_permissions=True)
+
+		result, _ = self.submit(attempt_id, {
+			self.items[0]: self.correct_options[0],
+			self.items[1]: self.correct_options[1]
+		})
+
+		# 1 of 1 gradable points, the deleted question's 2 points are not possible points
+		self.assertEqual(result["score"], 1)
+		self.assertTrue(result["passed"])
+		self.assertIsNone(get_grading_index(self.test.name)["items"][self.items[1]]["question_type"])
+
+		answers = frappe.get_all(
+			"Attempt Answer Item",
+			filters={"parent": attempt_id},
+			fields=["test_question_item", "points_awarded"],
+			order_by="idx"
+		)
+		self.assertEqual([answer.test_question_item for answer in answers], self.items[:2])
+		self.assertEqual(answers[1].points_awarded, 0)
+
+	def count_submit_queries(self, answer_count):
+		attempt_id = self.start()
+		answers = {item: option for item, option in zip(self.items[:answer_count], self.correct_options)}
+
+		with patch.object(frappe.db, "sql", wraps=frappe.db.sql) as sql:
+			self.submit(attempt_id, answers)
+		return sql.call_count
+
+	def test_submission_query_count_is_constant(self):
+		get_grading_index(self.test.name)
+
+		# Lock, delete, insert, update and commit, however many questions were answered
+		self.assertEqual(self.count_submit_queries(20), self.count_submit_queries(1))
+
+	def test_completed_attempt_cannot_be_submitted_again(self):
+		attempt_id = self.start()
+		self.submit(attempt_id, {})
+
+		with self.assertRaises(frappe.ValidationError):
+			self.submit(attempt_id, {})
+
+
+class TestTestAttemptFeedback(FrappeTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.questions = [
+			create_question("Chọn số nguyên tố", "Multiple Choice", [("4", 0), ("7", 1)]),
+			create_question("Trình bày lời giải")
+		]
+		self.test = create_test(self.questions, title="Feedback Test")
+		self.items = [item.name for item in self.test.questions]
+
+		llm_client.clear_api_key()
+		self.client_patch = patch.object(llm_client, "_client", LLMClient())
+		self.client_patch.start()
+
+	def tearDown(self):
+		self.client_patch.stop()
+		llm_client.clear_api_key()
+		frappe.db.rollback()
+
+	def submit(self):
+		attempt_id = start_or_resume_test_attempt(self.test.name)["attempt"]["id"]
+		with patch("frappe.enqueue") as enqueue:
+			result = submit_test_attempt(attempt_id, submission({
+				self.items[0]: self.questions[0].options[1].name,
+				self.items[1]: "Không biết"
+			}))
+		return attempt_id, result, enqueue
+
+	def test_submit_returns_before_feedback(self):
+		with LLMStub() as stub:
+			attempt_id, result, enqueue = self.submit()
+
+		self.assertFalse(stub.requests)
+		self.assertEqual(result["score"], 1)
+		self.assertEqual(result["feedback_status"], "Pending")
+
+		self.assertEqual(enqueue.call_args.args[0], f"{MODULE}.process_test_feedback")
+		self.assertEqual(enqueue.call_args.kwargs["attempt_id"], attempt_id)
+		self.assertEqual(enqueue.call_args.kwargs["job_id"], f"test_attempt_feedback|{attempt_id}")
+		self.assertTrue(enqueue.call_args.kwargs["deduplicate"])
+
+		details = get_attempt_result_details(attempt_id)
+		self.assertTrue(details["feedback_pending"])
+		self.assertIsNone(details["feedback"])
+
+	def test_feedback_job_stores_llm_feedback(self):
+		attempt_id, _, _ = self.submit()
+
+		with LLMStub() as stub, patch("frappe.publish_realtime") as publish_realtime:
+			stub.respond(text='```json\n{"feedback": "Cần luyện tự luận", "recommendation": "Làm thêm bài tập"}\n```')
+			process_test_feedback(attempt_id)
+			# A job that runs again for the same attempt does not call the LLM again
+			process_test_feedback(attempt_id)
+
+		self.assertEqual(len(stub.requests), 1)
+		prompt = stub.requests[0].body["contents"][0]["parts"][0]["text"]
+		self.assertIn(self.questions[1].name, prompt)
+		self.assertIn('"question_type": "Essay"', prompt)
+
+		details = get_attempt_result_details(attempt_id)
+		self.assertFalse(details["feedback_pending"])
+		self.assertEqual(details["feedback_status"], "Ready")
+		self.assertEqual(details["feedback"], "Cần luyện tự luận")
+		self.assertEqual(details["recommendation"], "Làm thêm bài tập")
+		self.assertEqual(publish_realtime.call_args.args[0], "test_attempt_feedback")
+
+	def test_feedback_skips_deleted_questions(self):
+		attempt_id, _, _ = self.submit()
+		frappe.delete_doc("Question", self.questions[1].name, force=True, ignore_permissions=True)
+
+		with LLMStub() as stub, patch("frappe.publish_realtime"):
+			stub.respond(text='{"feedback": "Tốt", "recommendation": "Tiếp tục"}')
+			process_test_feedback(attempt_id)
+
+		prompt = stub.requests[0].body["contents"][0]["parts"][0]["text"]
+		self.assertIn(self.questions[0].name, prompt)
+		self.assertNotIn(self.questions[1].name, prompt)
+
+	def test_feedback_job_marks_failure(self):
+		attempt_id, _, _ = self.submit()
+
+		with LLMStub() as stub:
+			stub.respond(status=400, payload={"error": "bad request"})
+			process_test_feedback(attempt_id)
+
+		details = get_attempt_result_details(attempt_id)
+		self.assertFalse(details["feedback_pending"])
+		self.assertEqual(details["feedback_status"], "Failed")
+		self.assertIsNone(details["feedback"])
+
+
+class TestTestAttemptProgress(FrappeTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.questions = [create_question(f"Câu tự luận {position}") for position in range(20)]
+		self.test = create_test(self.questions, title="Autosave Test")
+		self.items = [item.name for item in self.test.questions]
+		self.attempt_id = start_or_resume_test_attempt(self.test.name)["attempt"]["id"]
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def save(self, answers, revision=None, **extra):
+		progress = {
+			"answers": {item: {"userAnswer": answer} for item, answer in answers.items()},
+			"remainingTimeSeconds": 1200,
+			**extra
+		}
+		if revision is not None:
+			progress["revision"] = revision
+		return save_attempt_progress(self.attempt_id, json.dumps(progress))
+
+	def get_saved_answers(self):
+		return {
+			answer.test_question_item: answer.user_answer
+			for answer in frappe.get_all(
+				"Attempt Answer Item",
+				filters={"parent": self.attempt_id},
+				fields=["test_question_item", "user_answer"]
+			)
+		}
+
+	def test_delta_saves_upsert_changed_answers(self):
+		self.assertTrue(self.save({self.items[0]: "a", self.items[1]: "b"}, revision=1)["success"])
+		result = self.save({self.items[1]: "b2", self.items[2]: "c"}, revision=2, lastViewedTestQuestionId=self.items[2])
+
+		self.assertEqual(result, {"success": True, "revision": 2})
+		self.assertEqual(self.get_saved_answers(), {self.items[0]: "a", self.items[1]: "b2", self.items[2]: "c"})
+
+		attempt = frappe.get_doc("Test Attempt", self.attempt_id)
+		self.assertEqual(attempt.progress_revision, 2)
+		self.assertEqual(attempt.remaining_time_seconds, 1200)
+		self.assertEqual(attempt.last_viewed_question, self.questions[2].name)
+		# Rows keep the position of their question in the test
+		self.assertEqual([answer.test_question_item for answer in attempt.answers], self.items[:3])
+
+		resumed = start_or_resume_test_attempt(self.test.name)
+		self.assertEqual(resumed["attempt"]["progress_revision"], 2)
+		self.assertEqual(resumed["saved_answers"][self.items[1]]["userAnswer"], "b2")
+
+	def test_stale_revision_is_rejected(self):
+		self.save({self.items[0]: "new"}, revision=5)
+
+		result = self.save({self.items[0]: "old", self.items[1]: "old"}, revision=4)
+
+		self.assertEqual(result, {"success": False, "stale": True, "revision": 5})
+		self.assertEqual(self.get_saved_answers(), {self.items[0]: "new"})
+		self.assertEqual(frappe.db.get_value("Test Attempt", self.attempt_id, "progress_revision"), 5)
+
+	def test_save_without_revision_is_applied(self):
+		self.save({self.items[0]: "a"}, revision=3)
+
+		self.assertTrue(self.save({self.items[0]: "b"})["success"])
+		self.assertEqual(self.get_saved_answers(), {self.items[0]: "b"})
+		self.assertEqual(frappe.db.get_value("Test Attempt", self.attempt_id, "progress_revision"), 3)
+
+	def count_save_queries(self, answers, revision):
+		with patch.object(frappe.db, "sql", wraps=frappe.db.sql) as sql:
+			self.save(answers, revision=revision)
+		return sql.call_count
+
+	def test_save_query_count_is_constant(self):
+		get_grading_index(self.test.name)
+
+		one = self.count_save_queries({self.items[0]: "a"}, 1)
+		many = self.count_save_queries({item: "b" for item in self.items}, 2)
+
+		self.assertEqual(one, many)
+		self.assertEqual(len(self.get_saved_answers()), 20)
+
+
+class TestTestAttemptWriteBehind(FrappeTestCase):
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.questions = [create_question(f"Câu tự luận {position}") for position in range(5)]
+		self.test = create_test(self.questions, title="Write-behind Test")
+		self.items = [item.name for item in self.test.questions]
+		self.attempt_id = start_or_resume_test_attempt(self.test.name)["attempt"]["id"]
+		answer_buffer.discard(self.attempt_id)
+
+		self.conf = patch.dict(frappe.conf, {"test_progress_write_behind": 1})
+		self.conf.start()
+
+	def tearDown(self):
+		self.conf.stop()
+		answer_buffer.discard(self.attempt_id)
+		frappe.db.rollback()
+
+	def save(self, answers, revision, **extra):
+		return save_attempt_progress(self.attempt_id, json.dumps({
+			"answers": {item: {"userAnswer": answer} for item, answer in answers.items()},
+			"remainingTimeSeconds": 900,
+			"revision": revision,
+			**extra
+		}))
+
+	def get_saved_answers(self):
+		return {
+			answer.test_question_item: answer.user_answer
+			for answer in frappe.get_all(
+				"Attempt Answer Item",
+				filters={"parent": self.attempt_id},
+				fields=["test_question_item", "user_answer"]
+			)
+		}
+
+	def test_buffered_save_does_not_write_database(self):
+		get_grading_index(self.test.name)
+
+		with patch.object(frappe.db, "sql", wraps=frappe.db.sql) as sql:
+			result = self.save({self.items[0]: "a", self.items[1]: "b"}, revision=1)
+
+		self.assertEqual(result, {"success": True, "revision": 1})
+		self.assertFalse([call for call in sql.call_args_list if not call.args[0].lstrip().lower().startswith("select")])
+		self.assertEqual(self.get_saved_answers(), {})
+
+		answer_buffer.flush_attempt(self.attempt_id)
+
+		self.assertEqual(self.get_saved_answers(), {self.items[0]: "a", self.items[1]: "b"})
+		attempt = frappe.db.get_value(
+			"Test Attempt", self.attempt_id, ["progress_revision", "remaining_time_seconds"], as_dict=True
+		)
+		self.assertEqual(attempt, {"progress_revision": 1, "remaining_time_seconds": 900})
+		self.assertEqual(answer_buffer.read_buffer(self.attempt_id), {})
+
+	def test_stale_revision_is_rejected_by_buffer(self):
+		self.save({self.items[0]: "new"}, revision=5)
+
+		result = self.save({self.items[0]: "old"}, revision=4)
+
+		self.assertEqual(result, {"success": False, "stale": True, "revision": 5})
+		self.assertEqual(answer_buffer.get_buffered_progress(self.attempt_id)["answers"][self.items[0]]["user_answer"], "new")
+
+	def test_resume_flushes_buffer(self):
+		self.save({self.items[0]: "a"}, revision=1, lastViewedTestQuestionId=self.items[0])
+		self.save({self.items[0]: "a2", self.items[1]: "b"}, revision=2)
+
+		resumed = start_or_resume_test_attempt(self.test.name)
+
+		self.assertEqual(resumed["attempt"]["progress_revision"], 2)
+		self.assertEqual(resumed["attempt"]["remaining_time_seconds"], 900)
+		self.assertEqual(resumed["saved_answers"][self.items[0]]["userAnswer"], "a2")
+		self.assertEqual(self.get_saved_answers(), {self.items[0]: "a2", self.items[1]: "b"})
+
+	def test_failed_flush_keeps_buffer(self):
+		self.save({self.items[0]: "a"}, revision=1)
+
+		with patch("elearning.utils.answer_buffer.bulk.bulk_upsert", side_effect=frappe.db.OperationalError):
+			answer_buffer.flush_dirty_attempts()
+			# Resume serves the buffered answers while the database is not writable
+			resumed = start_or_resume_test_attempt(self.test.name)
+
+		self.assertEqual(resumed["saved_answers"][self.items[0]]["userAnswer"], "a")
+		self.assertEqual(resumed["attempt"]["remaining_time_seconds"], 900)
+		self.assertEqual(self.get_saved_answers(), {})
+
+		answer_buffer.flush_dirty_attempts()
+
+		self.assertEqual(self.get_saved_answers(), {self.items[0]: "a"})
+		self.assertEqual(answer_buffer.read_buffer(self.attempt_id), {})
+
+	def test_flush_interrupted_after_commit_writes_again(self):
+		self.save({self.items[0]: "a"}, revision=1)
+
+		with patch.object(answer_buffer, "release_flushed", side_effect=ConnectionError):
+			with self.assertRaises(ConnectionError):
+				answer_buffer.flush_attempt(self.attempt_id)
+
+		# The buffer is still there, flushing it again does not duplicate the rows
+		self.assertTrue(answer_buffer.read_buffer(self.attempt_id))
+		answer_buffer.flush_attempt(self.attempt_id)
+
+		self.assertEqual(self.get_saved_answers(), {self.items[0]: "a"})
+		self.assertEqual(answer_buffer.read_buffer(self.attempt_id), {})
+
+	def test_save_during_flush_is_kept(self):
+		self.save({self.items[0]: "a", self.items[1]: "b"}, revision=1)
+		release_flushed = answer_buffer.release_flushed
+
+		def save_then_release(attempt_id, snapshot):
+			self.save({self.items[0]: "a2"}, revision=2)
+			release_flushed(attempt_id, snapshot)
+
+		with patch.object(answer_buffer, "release_flushed", side_effect=save_then_release):
+			answer_buffer.flush_attempt(self.attempt_id)
+
+		self.assertEqual(self.get_saved_answers(), {self.items[0]: "a", self.items[1]: "b"})
+		self.assertEqual(list(answer_buffer.get_buffered_progress(self.attempt_id)["answers"]), [self.items[0]])
+
+		answer_buffer.flush_attempt(self.attempt_id)
+
+		self.assertEqual(self.get_saved_answers(), {self.items[0]: "a2", self.items[1]: "b"})
+		self.assertEqual(frappe.db.get_value("Test Attempt", self.attempt_id, "progress_revision"), 2)
+
+	def test_other_user_cannot_flush_attempt(self):
+		self.save({self.items[0]: "a"}, revision=1)
+		other_user = "write-behind-other@example.com"
+		if not frappe.db.exists("User", other_user):
+			frappe.get_doc({
+				"doctype": "User",
+				"email": other_user,
+				"first_name": "Other",
+				"send_welcome_email": 0
+			}).insert(ignore_permissions=True)
+
+		frappe.set_user(other_user)
+		try:
+			with patch.object(answer_buffer, "flush_attempt") as flush_attempt:
+				with self.assertRaises(frappe.PermissionError):
+					submit_test_attempt(self.attempt_id, submission({}))
+		finally:
+			frappe.set_user("Administrator")
+
+		flush_attempt.assert_not_called()
+		self.assertTrue(answer_buffer.read_buffer(self.attempt_id))
+
+	def test_submit_discards_buffer(self):
+		self.save({self.items[0]: "draft"}, revision=1)
+
+		with patch("frappe.enqueue"):
+			submit_test_attempt(self.attempt_id, submission({self.items[0]: "final"}))
+
+		self.assertEqual(self.get_saved_answers(), {self.items[0]: "final"})
+		self.assertEqual(answer_buffer.read_buffer(self.attempt_id), {})
+		self.assertIsNone(frappe.cache().get(answer_buffer.get_revision_key(self.attempt_id)))
+		self.assertFalse(answer_buffer.flush_attempt(self.attempt_id))
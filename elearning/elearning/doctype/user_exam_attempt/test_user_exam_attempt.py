@@ -1,9 +1,558 @@
 # Copyright (c) 2025, Minh Quy and Contributors
 # See license.txt
 
-# import frappe
+import json
+import re
+from unittest.mock import patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from elearning.benchmarks.exam_start import insert_exam_attempt_per_row
+from elearning.elearning.doctype.user_exam_attempt.user_exam_attempt import (
+	AI_FEEDBACK_BATCH_SIZE,
+	AI_FEEDBACK_MAX_OUTPUT_TOKENS,
+	UserExamAttempt,
+	complete_exam_attempt,
+	get_exam_answer_feedback,
+	get_exam_attempt_details,
+	get_exam_history_count_key,
+	get_fast_grading_stats,
+	get_fast_grading_stats_key,
+	get_user_exam_history,
+	grade_answer_locally,
+	insert_exam_attempt,
+	parse_ai_feedback,
+	parse_batch_ai_feedback,
+	process_answer_feedback,
+	process_attempt_feedback,
+	start_exam_attempt,
+	submit_exam_answer_and_get_feedback,
+	submit_self_assessment_and_init_srs,
+)
+from elearning.elearning.doctype.user_srs_progress.test_user_srs_progress import (
+	create_flashcard,
+	create_topic,
+)
+
+MODULE = "elearning.elearning.doctype.user_exam_attempt.user_exam_attempt"
+
+DETAIL_FIELDS = ["idx", "flashcard", "user_answer", "user_self_assessment", "parenttype", "parentfield"]
+
+
+class FakeLLM:
+	"""Local stand-in for the Gemini call that records prompts and can fail a number of times"""
+
+	RESPONSE = "Phần đúng: Nêu đúng định nghĩa.\nPhần chưa đúng: Thiếu điều kiện.\nPhần nên bổ sung: Thêm ví dụ."
+
+	def __init__(self, failures=0):
+		self.failures = failures
+		self.calls = []
+
+	def __call__(self, system_prompt, user_prompt):
+		self.calls.append(user_prompt)
+		if len(self.calls) <= self.failures:
+			raise ConnectionError("LLM unavailable")
+		return self.RESPONSE
+
+
+class FakeBatchLLM:
+	"""Local stand-in for batch feedback requests, answers every "### Câu <id>" except skipped ids"""
+
+	def __init__(self, skip_ids=()):
+		self.skip_ids = set(skip_ids)
+		self.calls = []
+		self.generation_configs = []
+
+	def __call__(self, parts, model, generation_config=None, timeout=None):
+		self.calls.append(parts)
+		self.generation_configs.append(generation_config)
+		ids = [int(answer_id) for answer_id in re.findall(r"^### Câu (\d+)$", parts[1], re.MULTILINE)]
+		return json.dumps([
+			{
+				"id": answer_id,
+				"what_was_correct": f"Đúng {answer_id}",
+				"what_was_incorrect": f"Sai {answer_id}",
+				"what_to_include": f"Bổ sung {answer_id}"
+			}
+			for answer_id in ids if answer_id not in self.skip_ids
+		], ensure_ascii=False)
+
 
 class TestUserExamAttempt(FrappeTestCase):
-	pass
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.user = "Administrator"
+		self.topic = create_topic("Exam Attempt Test Topic").name
+		self.flashcards = [create_flashcard(self.topic).name for _ in range(5)]
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_details(self, attempt_name):
+		return frappe.get_all(
+			"User Exam Attempt Detail",
+			filters={"parent": attempt_name},
+			fields=DETAIL_FIELDS,
+			order_by="idx"
+		)
+
+	def test_bulk_attempt_matches_per_row_insert(self):
+		expected = insert_exam_attempt_per_row(self.user, self.topic, self.flashcards)
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards)
+
+		self.assertTrue(attempt.name.startswith("UEA-"))
+		self.assertEqual(self.get_details(attempt.name), self.get_details(expected.name))
+
+		doc = frappe.get_doc("User Exam Attempt", attempt.name)
+		self.assertEqual((doc.user, doc.topic), (self.user, self.topic))
+		self.assertEqual([detail.flashcard for detail in doc.attempt_details], self.flashcards)
+		self.assertTrue(all(detail.user_self_assessment == "Chưa hiểu" for detail in doc.attempt_details))
+
+	def test_bulk_attempt_query_count_is_constant(self):
+		flashcards = self.flashcards + [create_flashcard(self.topic).name for _ in range(45)]
+
+		# Series reservation (select and update) plus one insert for the attempt and one for the details
+		with self.assertQueryCount(4):
+			insert_exam_attempt(self.user, self.topic, flashcards)
+
+	def test_bulk_attempt_names_follow_series(self):
+		first = insert_exam_attempt(self.user, self.topic, self.flashcards)
+		second = frappe.get_doc({
+			"doctype": "User Exam Attempt",
+			"user": self.user,
+			"topic": self.topic,
+			"start_time": frappe.utils.now()
+		}).insert(ignore_permissions=True)
+
+		self.assertEqual(int(second.name.split("-")[-1]), int(first.name.split("-")[-1]) + 1)
+
+	def test_lazy_attempt_stores_only_flashcard_order(self):
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards, lazy=True)
+
+		self.assertFalse(self.get_details(attempt.name))
+		doc = frappe.get_doc("User Exam Attempt", attempt.name)
+		self.assertEqual(frappe.parse_json(doc.flashcard_order), self.flashcards)
+		self.assertEqual(doc.get_analytics()["total_questions"], len(self.flashcards))
+
+	def test_lazy_attempt_materializes_touched_cards(self):
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards, lazy=True)
+
+		submit_exam_answer_and_get_feedback(attempt.name, self.flashcards[2], "", is_skipped=1)
+		submit_self_assessment_and_init_srs(attempt.name, self.flashcards[2], "Khá ổn")
+		submit_self_assessment_and_init_srs(attempt.name, self.flashcards[4], "Rất rõ")
+
+		details = self.get_details(attempt.name)
+		self.assertEqual([detail.flashcard for detail in details], [self.flashcards[2], self.flashcards[4]])
+		self.assertEqual([detail.idx for detail in details], [3, 5])
+		self.assertEqual([detail.user_self_assessment for detail in details], ["Khá ổn", "Rất rõ"])
+
+		other_flashcard = create_flashcard(self.topic).name
+		self.assertRaises(
+			frappe.ValidationError,
+			submit_self_assessment_and_init_srs, attempt.name, other_flashcard, "Khá ổn"
+		)
+
+	def test_lazy_attempt_details_match_eager_shape(self):
+		eager = insert_exam_attempt(self.user, self.topic, self.flashcards)
+		lazy = insert_exam_attempt(self.user, self.topic, self.flashcards, lazy=True)
+		for attempt in (eager, lazy):
+			submit_self_assessment_and_init_srs(attempt.name, self.flashcards[1], "Mơ hồ")
+
+		def strip_names(details):
+			return [{key: value for key, value in detail.items() if key != "name"} for detail in details]
+
+		eager_details = get_exam_attempt_details(eager.name)["attempt"]
+		lazy_details = get_exam_attempt_details(lazy.name)["attempt"]
+
+		self.assertEqual(lazy_details["total_questions"], eager_details["total_questions"])
+		self.assertEqual([detail["flashcard"] for detail in lazy_details["details"]], self.flashcards)
+		self.assertEqual(
+			sorted(strip_names(lazy_details["details"]), key=lambda detail: detail["flashcard"]),
+			sorted(strip_names(eager_details["details"]), key=lambda detail: detail["flashcard"])
+		)
+
+	def test_start_exam_attempt_lazy_mode_is_opt_in(self):
+		eager = start_exam_attempt(self.topic)["attempt"]
+		lazy = start_exam_attempt(self.topic, lazy=1)["attempt"]
+
+		self.assertEqual(len(self.get_details(eager["name"])), len(self.flashcards))
+		self.assertFalse(self.get_details(lazy["name"]))
+		self.assertEqual(
+			[card.name for card in lazy["flashcards"]],
+			frappe.parse_json(frappe.db.get_value("User Exam Attempt", lazy["name"], "flashcard_order"))
+		)
+
+	def submit_answer(self, attempt_name, flashcard_name, answer, llm):
+		with patch(f"{MODULE}.call_feedback_llm", llm), patch("frappe.enqueue") as enqueue:
+			result = submit_exam_answer_and_get_feedback(attempt_name, flashcard_name, answer)
+		return result, enqueue
+
+	def run_feedback_job(self, enqueue, llm):
+		with (
+			patch(f"{MODULE}.call_feedback_llm", llm),
+			patch(f"{MODULE}.get_feedback_backoff", return_value=0),
+			patch.dict(frappe.conf, {"gemini_api_key": "test-key"})
+		):
+			process_answer_feedback(**enqueue.call_args.kwargs)
+
+	def test_answer_is_saved_before_feedback_is_generated(self):
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards)
+		llm = FakeLLM()
+
+		result, enqueue = self.submit_answer(attempt.name, self.flashcards[0], "Định nghĩa", llm)
+
+		self.assertEqual(result["feedback_status"], "Pending")
+		self.assertFalse(llm.calls)
+		self.assertEqual(enqueue.call_args.args[0], f"{MODULE}.process_answer_feedback")
+		self.assertTrue(enqueue.call_args.kwargs["enqueue_after_commit"])
+		self.assertEqual(get_exam_answer_feedback(attempt.name, self.flashcards[0])["feedback_status"], "Pending")
+		self.assertEqual(
+			frappe.db.get_value("User Exam Attempt Detail", enqueue.call_args.kwargs["detail_name"], "user_answer"),
+			"Định nghĩa"
+		)
+
+	def test_feedback_job_stores_result_and_notifies_user(self):
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards)
+		llm = FakeLLM()
+		_, enqueue = self.submit_answer(attempt.name, self.flashcards[0], "Định nghĩa", llm)
+
+		with patch("frappe.publish_realtime") as publish_realtime:
+			self.run_feedback_job(enqueue, llm)
+
+		feedback = get_exam_answer_feedback(attempt.name, self.flashcards[0])
+		self.assertEqual(feedback["feedback_status"], "Ready")
+		for field, value in parse_ai_feedback(FakeLLM.RESPONSE).items():
+			self.assertEqual(feedback[field], value)
+
+		self.assertEqual(publish_realtime.call_args.args[0], "exam_answer_feedback")
+		self.assertEqual(publish_realtime.call_args.args[1], feedback)
+		self.assertEqual(publish_realtime.call_args.kwargs["user"], self.user)
+
+	def test_feedback_job_retries_with_backoff(self):
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards)
+		llm = FakeLLM(failures=2)
+		_, enqueue = self.submit_answer(attempt.name, self.flashcards[0], "Định nghĩa", llm)
+
+		self.run_feedback_job(enqueue, llm)
+
+		self.assertEqual(len(llm.calls), 3)
+		self.assertEqual(get_exam_answer_feedback(attempt.name, self.flashcards[0])["feedback_status"], "Ready")
+
+	def test_feedback_job_gives_up_after_max_tries(self):
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards)
+		llm = FakeLLM(failures=10)
+		_, enqueue = self.submit_answer(attempt.name, self.flashcards[0], "Định nghĩa", llm)
+
+		self.run_feedback_job(enqueue, llm)
+
+		feedback = get_exam_answer_feedback(attempt.name, self.flashcards[0])
+		self.assertEqual(len(llm.calls), 3)
+		self.assertEqual(feedback["feedback_status"], "Failed")
+		self.assertIn("LLM unavailable", feedback["ai_feedback_what_was_incorrect"])
+
+	def test_feedback_job_skips_superseded_answer(self):
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards)
+		llm = FakeLLM()
+		_, first_job = self.submit_answer(attempt.name, self.flashcards[0], "Câu trả lời cũ", llm)
+		self.submit_answer(attempt.name, self.flashcards[0], "Câu trả lời mới", llm)
+
+		self.run_feedback_job(first_job, llm)
+
+		self.assertFalse(llm.calls)
+		self.assertEqual(get_exam_answer_feedback(attempt.name, self.flashcards[0])["feedback_status"], "Pending")
+
+	def assert_graded(self, flashcard, user_answer, method, is_correct):
+		grading = grade_answer_locally(flashcard, user_answer)
+		self.assertIsNotNone(grading, user_answer)
+		self.assertEqual((grading.method, grading.is_correct), (method, is_correct), user_answer)
+
+	def test_local_grading_methods(self):
+		fill_in = frappe._dict({"flashcard_type": "Fill in the Blank", "answer": "Hà Nội"})
+		self.assert_graded(fill_in, "  Hà   Nội. ", "exact", True)
+		self.assertIsNone(grade_answer_locally(fill_in, "Huế"))
+		# Case matters in math (sets, points, variables), the LLM decides
+		self.assertIsNone(grade_answer_locally(fill_in, "hà nội"))
+		self.assertIsNone(grade_answer_locally(frappe._dict({"answer": "A"}), "a"))
+
+		number = frappe._dict({"flashcard_type": "Fill in the Blank", "answer": "0.5"})
+		self.assert_graded(number, "0,5", "numeric", True)
+		self.assert_graded(number, "\\frac{1}{2}", "numeric", True)
+		self.assert_graded(number, "0.5000000001", "numeric", True)
+		self.assert_graded(number, "0.6", "numeric", False)
+		self.assertIsNone(grade_answer_locally(number, "một nửa"))
+		# "1.000" may be one thousand, the LLM decides
+		self.assertIsNone(grade_answer_locally(frappe._dict({"answer": "1000"}), "1.000"))
+
+		solution = frappe._dict({"answer": "x = 4"})
+		self.assert_graded(solution, "x=4,0", "numeric", True)
+		self.assert_graded(solution, "4", "numeric", True)
+		self.assert_graded(solution, "x = 5", "numeric", False)
+		self.assertIsNone(grade_answer_locally(solution, "y = 4"))
+
+		formula = frappe._dict({"flashcard_type": "Concept/Theorem/Formula", "answer": "$a^2 + b^2 = c^2$"})
+		self.assert_graded(formula, "b^2+a^2 = c^2", "symbolic", True)
+		self.assertIsNone(grade_answer_locally(formula, "a^2 - b^2 = c^2"))
+
+		# Subtraction-only expressions are formulas whether or not they contain digits
+		self.assert_graded(frappe._dict({"answer": "a-b"}), "-b + a", "symbolic", True)
+		self.assert_graded(frappe._dict({"answer": "3-2"}), "-2 + 3", "symbolic", True)
+		self.assertIsNone(grade_answer_locally(frappe._dict({"answer": "a-b"}), "b-a"))
+
+	def test_local_grading_of_several_values(self):
+		# Lists and values split by spaces are not read as one decimal number
+		self.assertIsNone(grade_answer_locally(frappe._dict({"answer": "2, 1"}), "1, 2"))
+		self.assert_graded(frappe._dict({"answer": "1, 2"}), "1,2", "symbolic", True)
+		self.assertIsNone(grade_answer_locally(frappe._dict({"answer": "35"}), "3 5"))
+		self.assertIsNone(grade_answer_locally(frappe._dict({"answer": "1 2"}), "12"))
+		self.assertIsNone(grade_answer_locally(frappe._dict({"answer": "-1; 3"}), "-1"))
+
+	def test_local_grading_of_ordering_steps(self):
+		flashcard = frappe._dict({
+			"flashcard_type": "Ordering Steps",
+			"ordering_steps_items": [
+				{"step_content": "Bước A", "correct_order": 1},
+				{"step_content": "Bước B", "correct_order": 2},
+				{"step_content": "Bước C", "correct_order": 3}
+			]
+		})
+
+		self.assert_graded(flashcard, "1, 2, 3", "permutation", True)
+		self.assert_graded(flashcard, "Bước A\nBước B\nBước C", "permutation", True)
+		self.assert_graded(flashcard, "1 -> 3 -> 2", "permutation", False)
+		self.assertIn(
+			"bước thứ 2",
+			grade_answer_locally(flashcard, "1 -> 3 -> 2").feedback["ai_feedback_what_was_incorrect"]
+		)
+		# Not a permutation of all steps
+		self.assertIsNone(grade_answer_locally(flashcard, "1, 2"))
+		self.assertIsNone(grade_answer_locally(flashcard, "Bước A rồi đến bước C"))
+
+	def test_locally_graded_answer_skips_llm(self):
+		frappe.cache().delete(get_fast_grading_stats_key())
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards)
+		llm = FakeLLM()
+
+		# create_flashcard uses "Answer" as the answer
+		result, enqueue = self.submit_answer(attempt.name, self.flashcards[0], " answer ", llm)
+		self.assertEqual(result["feedback_status"], "Ready")
+		self.assertTrue(result["ai_feedback_what_was_correct"])
+		enqueue.assert_not_called()
+		self.assertEqual(
+			get_exam_answer_feedback(attempt.name, self.flashcards[0])["ai_feedback_what_was_correct"],
+			result["ai_feedback_what_was_correct"]
+		)
+
+		result, enqueue = self.submit_answer(attempt.name, self.flashcards[1], "Định nghĩa", llm)
+		self.assertEqual(result["feedback_status"], "Pending")
+		enqueue.assert_called_once()
+
+		self.assertFalse(llm.calls)
+		stats = get_fast_grading_stats()
+		self.assertEqual(stats["by_method"]["exact"], 1)
+		self.assertEqual(stats["escalated"], 1)
+		self.assertEqual(stats["short_circuit_ratio"], 0.5)
+
+	def run_attempt_feedback_job(self, attempt_name, llm):
+		with (
+			patch("elearning.utils.llm_client.generate_content", llm),
+			patch(f"{MODULE}.get_feedback_backoff", return_value=0),
+			patch.dict(frappe.conf, {"gemini_api_key": "test-key"}),
+			patch("frappe.enqueue") as enqueue,
+			patch("frappe.publish_realtime")
+		):
+			process_attempt_feedback(attempt_name)
+		return enqueue
+
+	def test_batch_attempt_generates_feedback_on_completion(self):
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards, batch_feedback=True)
+		llm = FakeLLM()
+
+		for position, flashcard in enumerate(self.flashcards):
+			result, enqueue = self.submit_answer(attempt.name, flashcard, f"Định nghĩa {position}", llm)
+			self.assertEqual(result["feedback_status"], "Pending")
+			enqueue.assert_not_called()
+
+		with patch("frappe.enqueue") as enqueue:
+			complete_exam_attempt(attempt.name)
+		self.assertEqual(enqueue.call_args.args[0], f"{MODULE}.process_attempt_feedback")
+		self.assertEqual(enqueue.call_args.kwargs["attempt_name"], attempt.name)
+
+		batch_llm = FakeBatchLLM()
+		with patch(f"{MODULE}.AI_FEEDBACK_BATCH_SIZE", 3):
+			self.run_attempt_feedback_job(attempt.name, batch_llm)
+
+		self.assertFalse(llm.calls)
+		# 5 answers in batches of 3
+		self.assertEqual(len(batch_llm.calls), 2)
+		for position, flashcard in enumerate(self.flashcards):
+			feedback = get_exam_answer_feedback(attempt.name, flashcard)
+			self.assertEqual(feedback["feedback_status"], "Ready")
+			self.assertEqual(feedback["ai_feedback_what_was_correct"], f"Đúng {position % 3 + 1}")
+
+	def test_batch_feedback_falls_back_to_single_answers(self):
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards, batch_feedback=True)
+		for position, flashcard in enumerate(self.flashcards[:3]):
+			self.submit_answer(attempt.name, flashcard, f"Định nghĩa {position}", FakeLLM())
+
+		enqueue = self.run_attempt_feedback_job(attempt.name, FakeBatchLLM(skip_ids=[2]))
+
+		self.assertEqual(get_exam_answer_feedback(attempt.name, self.flashcards[0])["feedback_status"], "Ready")
+		self.assertEqual(get_exam_answer_feedback(attempt.name, self.flashcards[1])["feedback_status"], "Pending")
+		self.assertEqual(enqueue.call_count, 1)
+		self.assertEqual(enqueue.call_args.kwargs["user_answer"], "Định nghĩa 1")
+
+	def test_full_batch_stays_within_output_cap(self):
+		flashcards = self.flashcards + [create_flashcard(self.topic).name for _ in range(AI_FEEDBACK_BATCH_SIZE)]
+		attempt = insert_exam_attempt(self.user, self.topic, flashcards, batch_feedback=True)
+		for position, flashcard in enumerate(flashcards):
+			self.submit_answer(attempt.name, flashcard, f"Định nghĩa {position}", FakeLLM())
+
+		batch_llm = FakeBatchLLM()
+		self.run_attempt_feedback_job(attempt.name, batch_llm)
+
+		self.assertEqual(len(batch_llm.calls), 2)
+		self.assertEqual(len(re.findall(r"^### Câu", batch_llm.calls[0][1], re.MULTILINE)), AI_FEEDBACK_BATCH_SIZE)
+		for generation_config in batch_llm.generation_configs:
+			self.assertLessEqual(generation_config["maxOutputTokens"], AI_FEEDBACK_MAX_OUTPUT_TOKENS)
+
+	def test_missing_api_key_fails_feedback_in_both_paths(self):
+		answer = f"Định nghĩa {frappe.generate_hash(length=8)}"
+		single = insert_exam_attempt(self.user, self.topic, self.flashcards)
+		_, enqueue = self.submit_answer(single.name, self.flashcards[0], answer, FakeLLM())
+		batch = insert_exam_attempt(self.user, self.topic, self.flashcards, batch_feedback=True)
+		self.submit_answer(batch.name, self.flashcards[0], answer, FakeLLM())
+
+		with (
+			patch("elearning.utils.llm_client.get_api_key", return_value=None),
+			patch("frappe.enqueue"),
+			patch("frappe.publish_realtime")
+		):
+			process_answer_feedback(**enqueue.call_args.kwargs)
+			process_attempt_feedback(batch.name)
+
+		for attempt in (single, batch):
+			self.assertEqual(get_exam_answer_feedback(attempt.name, self.flashcards[0])["feedback_status"], "Failed")
+
+	def test_parse_batch_feedback(self):
+		feedback = parse_batch_ai_feedback(
+			'```json\n[{"id": 1, "what_was_correct": "A", "what_was_incorrect": "B", "what_to_include": "C"}, {"id": "x"}]\n```'
+		)
+		self.assertEqual(feedback, {1: {
+			"ai_feedback_what_was_correct": "A",
+			"ai_feedback_what_was_incorrect": "B",
+			"ai_feedback_what_to_include": "C"
+		}})
+		self.assertEqual(parse_batch_ai_feedback("not json"), {})
+
+	def test_attempt_details_query_count_is_constant(self):
+		flashcards = self.flashcards + [
+			create_flashcard(self.topic, "Ordering Steps", ["Step A", "Step B"]).name for _ in range(15)
+		]
+		attempt = insert_exam_attempt(self.user, self.topic, flashcards)
+
+		# Attempt with topic name, details joined with flashcards, ordering steps
+		with self.assertQueryCount(3):
+			details = get_exam_attempt_details(attempt.name)["attempt"]["details"]
+
+		self.assertEqual([detail["flashcard"] for detail in details], flashcards)
+		self.assertEqual(
+			[step["step_content"] for step in details[-1]["ordering_steps_items"]],
+			["Step A", "Step B"]
+		)
+		self.assertNotIn("ordering_steps_items", details[0])
+
+	def test_attempt_details_pagination(self):
+		for lazy in (False, True):
+			attempt = insert_exam_attempt(self.user, self.topic, self.flashcards, lazy=lazy)
+
+			page = get_exam_attempt_details(attempt.name, start=1, page_length=2)["attempt"]
+
+			self.assertEqual([detail["flashcard"] for detail in page["details"]], self.flashcards[1:3])
+			self.assertEqual(page["total_questions"], len(self.flashcards))
+			self.assertEqual((page["start"], page["page_length"]), (1, 2))
+			self.assertFalse(get_exam_attempt_details(attempt.name, start=5, page_length=2)["attempt"]["details"])
+
+	def test_attempt_details_projection(self):
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards, lazy=True)
+		submit_exam_answer_and_get_feedback(attempt.name, self.flashcards[1], "", is_skipped=1)
+
+		details = get_exam_attempt_details(attempt.name, fields='["user_answer", "ai_feedback_status"]')["attempt"]["details"]
+
+		self.assertEqual(set(details[0]), {"name", "flashcard", "user_answer", "ai_feedback_status"})
+		self.assertEqual(details[0]["user_answer"], "")
+		self.assertRaises(
+			frappe.ValidationError,
+			get_exam_attempt_details, attempt.name, fields=["user"]
+		)
+
+	def create_completed_attempts(self, count):
+		names = []
+		for position in range(count):
+			attempt = insert_exam_attempt(self.user, self.topic, self.flashcards[:position % 3 + 1])
+			# Pairs of attempts share a start time so the name breaks the tie
+			frappe.db.set_value("User Exam Attempt", attempt.name, {
+				"start_time": f"2030-01-{position // 2 + 1:02d} 10:00:00",
+				"completion_timestamp": f"2030-01-{position // 2 + 1:02d} 10:30:00",
+				"time_spent_seconds": 1800
+			})
+			names.append(attempt.name)
+		return names
+
+	def test_exam_history_keyset_pagination(self):
+		self.create_completed_attempts(7)
+		everything = get_user_exam_history(self.topic, limit=100)["attempts"]
+
+		pages = []
+		cursor = None
+		while True:
+			page = get_user_exam_history(self.topic, limit=3, cursor=cursor, count_mode="none")
+			pages.append([attempt.name for attempt in page["attempts"]])
+			cursor = page["next_cursor"]
+			if not cursor:
+				break
+
+		self.assertEqual(sum(pages, []), [attempt.name for attempt in everything])
+		self.assertEqual([len(page) for page in pages], [3, 3, 1])
+		self.assertEqual(
+			[(attempt.start_time, attempt.name) for attempt in everything],
+			sorted(((attempt.start_time, attempt.name) for attempt in everything), reverse=True)
+		)
+		self.assertTrue(all(attempt.topic_name == "Exam Attempt Test Topic" for attempt in everything))
+
+	def test_exam_history_uses_stored_question_counts(self):
+		names = self.create_completed_attempts(3)
+		self.assertEqual(
+			frappe.db.get_value("User Exam Attempt", names[2], "total_questions"), 3
+		)
+
+		frappe.cache().delete_value(get_exam_history_count_key(self.user, self.topic))
+		self.assertEqual(get_user_exam_history(self.topic, count_mode="cached")["total_count"], 3)
+
+		# Page query only: no per-row topic or count lookups and the count comes from the cache
+		with self.assertQueryCount(1):
+			history = get_user_exam_history(self.topic, limit=3, count_mode="cached")
+
+		self.assertEqual(history["total_count"], 3)
+		self.assertEqual(
+			{attempt.name: attempt.total_questions for attempt in history["attempts"]},
+			dict(zip(names, [1, 2, 3]))
+		)
+
+	def test_loading_attempt_reads_parent_and_details_only(self):
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards)
+
+		with self.assertQueryCount(2):
+			frappe.get_doc("User Exam Attempt", attempt.name)
+
+	def test_exam_statistics_calculated_once_on_completion(self):
+		attempt = insert_exam_attempt(self.user, self.topic, self.flashcards)
+
+		with patch.object(UserExamAttempt, "calculate_exam_statistics") as calculate_exam_statistics:
+			complete_exam_attempt(attempt.name)
+
+			completed = frappe.get_doc("User Exam Attempt", attempt.name)
+			completed.time_spent_seconds = 60
+			completed.save(ignore_permissions=True)
+
+		calculate_exam_statistics.assert_called_once()
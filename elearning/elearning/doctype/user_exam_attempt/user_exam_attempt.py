@@ -6,23 +6,24 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import now_datetime, cint, flt, now, get_datetime, add_to_date
 import json
+import hashlib
 import os
-import google.generativeai as genai
 import time
 import re
 import random
+import math
+import redis
+from redis.exceptions import RedisError
+from elearning.elearning.doctype.user_srs_progress.user_srs_progress import upsert_srs_progress
+from elearning.utils import bulk, flashcard_cache, llm_cache, llm_client
+from elearning.utils.child_tables import get_child_rows
 
 class UserExamAttempt(Document):
-	def __init__(self, *args, **kwargs):
-		super(UserExamAttempt, self).__init__(*args, **kwargs)
-		self._original_completion_timestamp = None
-		if self.get("name"):
-			self._original_completion_timestamp = frappe.db.get_value("User Exam Attempt", self.name, "completion_timestamp")
-	
 	def validate(self):
 		"""Validate exam attempt on saving"""
 		self.validate_user()
 		self.validate_topic()
+		self.set_total_questions()
 		
 	def validate_user(self):
 		"""Ensure user exists"""
@@ -34,25 +35,36 @@ class UserExamAttempt(Document):
 		if not frappe.db.exists("Topics", self.topic):
 			frappe.throw(_("Topic does not exist"))
 	
+	def set_total_questions(self):
+		"""Keep the denormalized question count in line with the attempt's cards"""
+		flashcard_order = get_attempt_flashcard_order(self)
+		self.total_questions = len(flashcard_order) if flashcard_order is not None else len(self.attempt_details or [])
+	
 	def on_update(self):
 		"""Actions to perform when the document is updated"""
 		# Update statistics when completion_timestamp is set for the first time
-		if self.completion_timestamp and not self._original_completion_timestamp:
+		if self.completion_timestamp and not self.was_completed_before_save():
 			self.calculate_exam_statistics()
 	
+	def was_completed_before_save(self):
+		"""Whether the stored attempt was already completed before this save"""
+		previous = self.get_doc_before_save()
+		return bool(previous and previous.completion_timestamp)
+	
 	def calculate_exam_statistics(self):
 		"""Log completion of the exam attempt"""
 		# Log completion for analytics
 		frappe.logger().info(f"Exam completed: {self.name} by {self.user} for topic {self.topic}")
 		
 		# Get total number of questions for logging purposes
-		total_questions = frappe.db.count("User Exam Attempt Detail", {"parent": self.name})
+		total_questions = get_attempt_question_count(self)
 		frappe.logger().info(f"Total questions for attempt {self.name}: {total_questions}")
 	
 	def get_analytics(self):
 		"""Return analytics data for this attempt"""
+		flashcard_order = get_attempt_flashcard_order(self)
 		analytics = {
-			"total_questions": len(self.attempt_details) if self.attempt_details else 0,
+			"total_questions": len(flashcard_order) if flashcard_order is not None else len(self.attempt_details or []),
 			"completion_time": self.completion_timestamp,
 			"topic": self.topic,
 			"created": self.creation
@@ -69,12 +81,16 @@ def get_current_user():
 	return user
 
 @frappe.whitelist()
-def start_exam_attempt(topic_name):
+def start_exam_attempt(topic_name, lazy=0, batch_feedback=0):
 	"""
 	Start a new exam attempt for a specific topic
 	
 	Args:
 		topic_name (str): Name of the topic
+		lazy (int, optional): Only store the flashcard order and create detail rows
+			when a card is first answered or assessed
+		batch_feedback (int, optional): Generate the AI feedback of all answers together
+			when the attempt is completed instead of after every answer
 		
 	Returns:
 		dict: Information about the created exam attempt
@@ -99,57 +115,29 @@ def start_exam_attempt(topic_name):
 		flashcard_arrange_mode = settings_list[0].flashcard_arrange_mode
 		flashcard_type_filter = settings_list[0].study_exam_flashcard_type_filter
 	
-	# Get flashcards for this topic
-	filters = {"topic": topic_name}
-	
-	# Apply flashcard type filter if specified
-	if flashcard_type_filter != "All":
-		filters["flashcard_type"] = flashcard_type_filter
-	
-	flashcards = frappe.get_all(
-		"Flashcard",
-		filters=filters,
-		fields=["name", "question", "answer", "explanation", "flashcard_type", "hint", "solution_with_error"]
+	# Get flashcards for this topic, newest first, with ordering steps attached
+	flashcards = flashcard_cache.get_topic_flashcards(
+		topic_name,
+		flashcard_type_filter,
+		fields=["name", "question", "answer", "explanation", "flashcard_type", "hint", "solution_with_error"],
+		newest_first=True
 	)
 	
 	if not flashcards:
 		frappe.throw(_("No flashcards found for this topic"))
 	
-	# Process additional data for specific flashcard types
-	for flashcard in flashcards:
-		if flashcard.get("flashcard_type") == "Ordering Steps":
-			ordering_steps = frappe.get_all(
-				"Ordering Step Item",
-				filters={"parent": flashcard.get("name")},
-				fields=["step_content", "correct_order"],
-				order_by="correct_order"
-			)
-			flashcard["ordering_steps_items"] = ordering_steps
-	
 	# Shuffle flashcards if random mode is selected
 	if flashcard_arrange_mode == "random":
 		random.shuffle(flashcards)
 	
-	# Create exam attempt
-	attempt = frappe.new_doc("User Exam Attempt")
-	attempt.user = user_id
-	attempt.topic = topic_name
-	attempt.start_time = now()
-	attempt.insert(ignore_permissions=True)
-	
-	# Create exam attempt details for each flashcard
-	for flashcard in flashcards:
-		detail = frappe.new_doc("User Exam Attempt Detail")
-		detail.parent = attempt.name
-		detail.parenttype = "User Exam Attempt"
-		detail.parentfield = "attempt_details"
-		detail.flashcard = flashcard.name
-		detail.user_answer = ""
-		detail.is_correct = 0
-		detail.is_skipped = 0
-		detail.user_self_assessment = "Chưa hiểu"
-		detail.ai_feedback = ""
-		detail.insert(ignore_permissions=True)
+	# Create exam attempt with one detail row per flashcard
+	attempt = insert_exam_attempt(
+		user_id,
+		topic_name,
+		[flashcard.name for flashcard in flashcards],
+		lazy=cint(lazy),
+		batch_feedback=cint(batch_feedback)
+	)
 	
 	frappe.db.commit()
 	
@@ -164,10 +152,158 @@ def start_exam_attempt(topic_name):
 		}
 	}
 
+# Values of a detail row before the student answers or assesses the card
+DEFAULT_DETAIL_VALUES = {
+	"user_answer": "",
+	"user_self_assessment": "Chưa hiểu"
+}
+
+def insert_exam_attempt(user_id, topic_name, flashcard_names, lazy=False, batch_feedback=False):
+	"""
+	Insert an exam attempt and its detail rows with two multi-row INSERT statements
+	
+	Document validation and naming are skipped: the attempt name comes from the UEA-
+	naming series and detail rows get random hash names like regular child rows.
+	Callers must check the topic and flashcards beforehand.
+	
+	Args:
+		user_id (str): User ID
+		topic_name (str): Name of the topic
+		flashcard_names (list): Flashcards of the attempt in display order
+		lazy (bool): Store the flashcard order instead of detail rows, see get_or_create_attempt_detail
+		batch_feedback (bool): Generate AI feedback on completion, see process_attempt_feedback
+		
+	Returns:
+		frappe._dict: The attempt's name, topic and start_time
+	"""
+	attempt = frappe._dict({
+		"name": bulk.reserve_series_names("UEA-", 5, 1)[0],
+		"naming_series": "UEA-.#####",
+		"user": user_id,
+		"topic": topic_name,
+		"start_time": now(),
+		"time_spent_seconds": 0,
+		"total_questions": len(flashcard_names),
+		"flashcard_order": json.dumps(list(flashcard_names), separators=(",", ":")) if lazy else None,
+		"batch_feedback": 1 if batch_feedback else 0
+	})
+	bulk.bulk_insert("User Exam Attempt", [attempt])
+	
+	if not lazy:
+		bulk.bulk_insert("User Exam Attempt Detail", [
+			get_default_detail_row(attempt.name, flashcard_name, idx, frappe.generate_hash(length=10))
+			for idx, flashcard_name in enumerate(flashcard_names, start=1)
+		])
+	
+	return frappe._dict({
+		"name": attempt.name,
+		"topic": attempt.topic,
+		"start_time": attempt.start_time
+	})
+
+def get_default_detail_row(attempt_name, flashcard_name, idx, detail_name):
+	"""Detail row of a flashcard that has not been answered or assessed yet"""
+	return {
+		"name": detail_name,
+		"parent": attempt_name,
+		"parenttype": "User Exam Attempt",
+		"parentfield": "attempt_details",
+		"idx": idx,
+		"flashcard": flashcard_name,
+		**DEFAULT_DETAIL_VALUES
+	}
+
+def get_attempt_flashcard_order(attempt):
+	"""
+	Ordered flashcards of a lazy attempt
+	
+	Args:
+		attempt (dict|Document): Attempt with flashcard_order
+		
+	Returns:
+		list: Flashcard names, or None when the attempt stores all its detail rows
+	"""
+	if not attempt.get("flashcard_order"):
+		return None
+	return json.loads(attempt.get("flashcard_order"))
+
+def get_lazy_detail_name(attempt_name, flashcard_name):
+	"""Deterministic detail name, so concurrent first touches of a card create one row"""
+	return hashlib.sha1(f"{attempt_name}|{flashcard_name}".encode()).hexdigest()[:10]
+
+def get_or_create_attempt_detail(attempt, flashcard_name):
+	"""
+	Get the detail row of a flashcard, creating it on first touch in lazy attempts
+	
+	Args:
+		attempt (Document): The exam attempt
+		flashcard_name (str): Name of the flashcard
+		
+	Returns:
+		str: Name of the User Exam Attempt Detail row
+	"""
+	detail_name = frappe.db.get_value(
+		"User Exam Attempt Detail",
+		{"parent": attempt.name, "flashcard": flashcard_name}
+	)
+	if detail_name:
+		return detail_name
+	
+	flashcard_order = get_attempt_flashcard_order(attempt)
+	if not flashcard_order or flashcard_name not in flashcard_order:
+		frappe.throw(_("This flashcard is not part of the exam attempt"))
+	
+	detail_name = get_lazy_detail_name(attempt.name, flashcard_name)
+	bulk.bulk_insert(
+		"User Exam Attempt Detail",
+		[get_default_detail_row(attempt.name, flashcard_name, flashcard_order.index(flashcard_name) + 1, detail_name)],
+		ignore_duplicates=True
+	)
+	return detail_name
+
+def get_attempt_question_count(attempt):
+	"""
+	Number of questions of an attempt, including cards of a lazy attempt without a detail row
+	
+	Uses the stored total_questions and only counts for attempts created before it existed.
+	
+	Args:
+		attempt (dict|Document): Attempt with name, total_questions and flashcard_order
+		
+	Returns:
+		int: Number of questions
+	"""
+	if attempt.get("total_questions"):
+		return cint(attempt.get("total_questions"))
+	
+	flashcard_order = get_attempt_flashcard_order(attempt)
+	if flashcard_order is not None:
+		return len(flashcard_order)
+	return frappe.db.count("User Exam Attempt Detail", {"parent": attempt.get("name")})
+
+# Background AI feedback: tries per answer and the exponential backoff between them
+AI_FEEDBACK_FIELDS = ["ai_feedback_what_was_correct", "ai_feedback_what_was_incorrect", "ai_feedback_what_to_include"]
+AI_FEEDBACK_MAX_TRIES = 3
+AI_FEEDBACK_BACKOFF_SECONDS = 2
+AI_FEEDBACK_JOB_TIMEOUT = 300
+
+# Output tokens allowed per answer, and the output cap of AI_FEEDBACK_MODEL
+AI_FEEDBACK_OUTPUT_TOKENS = 1024
+AI_FEEDBACK_MAX_OUTPUT_TOKENS = 8192
+
+# Answers sent to the LLM in one prompt by process_attempt_feedback, sized so a batch
+# stays within the model's output cap
+AI_FEEDBACK_BATCH_SIZE = AI_FEEDBACK_MAX_OUTPUT_TOKENS // AI_FEEDBACK_OUTPUT_TOKENS
+
 @frappe.whitelist()
 def submit_exam_answer_and_get_feedback(attempt_name, flashcard_name, user_answer, is_skipped=0):
 	"""
-	Submit answer for a flashcard in an exam attempt and get AI feedback
+	Submit answer for a flashcard in an exam attempt and queue its AI feedback
+	
+	The answer is saved right away. Answers that grade_answer_locally can decide get
+	their feedback in the response, the feedback of the others is generated by a
+	background job. The client polls get_exam_answer_feedback or listens for the
+	"exam_answer_feedback" realtime event.
 	
 	Args:
 		attempt_name (str): Name of the exam attempt
@@ -176,7 +312,7 @@ def submit_exam_answer_and_get_feedback(attempt_name, flashcard_name, user_answe
 		is_skipped (int): Whether the question was skipped
 		
 	Returns:
-		dict: Result with AI feedback
+		dict: Result with the feedback status, feedback fields are empty until it is ready
 	"""
 	user_id = get_current_user()
 	
@@ -192,23 +328,18 @@ def submit_exam_answer_and_get_feedback(attempt_name, flashcard_name, user_answe
 	if not frappe.db.exists("Flashcard", flashcard_name):
 		frappe.throw(_("Flashcard does not exist"))
 	
-	flashcard = frappe.get_doc("Flashcard", flashcard_name)
-	
-	# Find the detail record
-	detail_list = frappe.get_all(
-		"User Exam Attempt Detail",
-		filters={"parent": attempt_name, "flashcard": flashcard_name},
-		fields=["name"]
-	)
+	# Find the detail record, lazy attempts create it on first touch
+	detail = frappe.get_doc("User Exam Attempt Detail", get_or_create_attempt_detail(attempt, flashcard_name))
 	
-	if not detail_list:
-		frappe.throw(_("This flashcard is not part of the exam attempt"))
-	
-	detail = frappe.get_doc("User Exam Attempt Detail", detail_list[0].name)
+	# Feedback of a previous answer no longer applies
+	detail.ai_feedback_what_was_correct = ""
+	detail.ai_feedback_what_was_incorrect = ""
+	detail.ai_feedback_what_to_include = ""
 	
 	# Mark as skipped if requested
-	if is_skipped:
+	if cint(is_skipped):
 		detail.user_answer = ""
+		detail.ai_feedback_status = ""
 		detail.save(ignore_permissions=True)
 		frappe.db.commit()
 		
@@ -216,34 +347,319 @@ def submit_exam_answer_and_get_feedback(attempt_name, flashcard_name, user_answe
 			"success": True,
 			"message": _("Question skipped"),
 			"is_skipped": True,
+			"feedback_status": "",
 			"ai_feedback_what_was_correct": "",
 			"ai_feedback_what_was_incorrect": "",
 			"ai_feedback_what_to_include": ""
 		}
 	
-	# Save user answer
 	detail.user_answer = user_answer
 	
-	# Generate AI feedback using Gemini
-	ai_feedback = generate_ai_feedback(flashcard, user_answer)
-	
-	# Store feedback in the appropriate fields
-	detail.ai_feedback_what_was_correct = ai_feedback.get("ai_feedback_what_was_correct", "")
-	detail.ai_feedback_what_was_incorrect = ai_feedback.get("ai_feedback_what_was_incorrect", "")
-	detail.ai_feedback_what_to_include = ai_feedback.get("ai_feedback_what_to_include", "")
+	# Answers that can be graded locally get their feedback right away
+	flashcard = flashcard_cache.get_flashcards_by_name(attempt.topic, [flashcard_name])[flashcard_name]
+	grading = grade_answer_locally(flashcard, user_answer)
+	if grading:
+		detail.update(grading.feedback)
+		detail.ai_feedback_status = "Ready"
+		detail.save(ignore_permissions=True)
+		frappe.db.commit()
+		
+		return {
+			"success": True,
+			"message": _("Answer submitted successfully"),
+			"is_skipped": False,
+			"feedback_status": "Ready",
+			**grading.feedback
+		}
 	
+	# Hand the feedback to a background worker, batch attempts get it on completion
+	detail.ai_feedback_status = "Pending"
 	detail.save(ignore_permissions=True)
+	
+	if not attempt.batch_feedback:
+		frappe.enqueue(
+			"elearning.elearning.doctype.user_exam_attempt.user_exam_attempt.process_answer_feedback",
+			queue="default",
+			timeout=AI_FEEDBACK_JOB_TIMEOUT,
+			enqueue_after_commit=True,
+			detail_name=detail.name,
+			user_answer=user_answer
+		)
 	frappe.db.commit()
 	
 	return {
 		"success": True,
 		"message": _("Answer submitted successfully"),
 		"is_skipped": False,
-		"ai_feedback_what_was_correct": detail.ai_feedback_what_was_correct,
-		"ai_feedback_what_was_incorrect": detail.ai_feedback_what_was_incorrect,
-		"ai_feedback_what_to_include": detail.ai_feedback_what_to_include
+		"feedback_status": "Pending",
+		"ai_feedback_what_was_correct": "",
+		"ai_feedback_what_was_incorrect": "",
+		"ai_feedback_what_to_include": ""
 	}
 
+@frappe.whitelist()
+def get_exam_answer_feedback(attempt_name, flashcard_name):
+	"""
+	Poll the AI feedback of an answer submitted with submit_exam_answer_and_get_feedback
+	
+	Args:
+		attempt_name (str): Name of the exam attempt
+		flashcard_name (str): Name of the flashcard
+		
+	Returns:
+		dict: feedback_status ("Pending", "Ready", "Failed" or "" when nothing was submitted)
+			and the feedback fields
+	"""
+	user_id = get_current_user()
+	
+	if frappe.db.get_value("User Exam Attempt", attempt_name, "user") != user_id:
+		frappe.throw(_("This exam attempt does not belong to you"))
+	
+	detail = frappe.db.get_value(
+		"User Exam Attempt Detail",
+		{"parent": attempt_name, "flashcard": flashcard_name},
+		["ai_feedback_status"] + AI_FEEDBACK_FIELDS,
+		as_dict=True
+	) or frappe._dict()
+	
+	return get_answer_feedback_response(attempt_name, flashcard_name, detail)
+
+def get_answer_feedback_response(attempt_name, flashcard_name, detail):
+	"""Feedback payload shared by the polling endpoint and the realtime event"""
+	return {
+		"success": True,
+		"attempt_name": attempt_name,
+		"flashcard": flashcard_name,
+		"feedback_status": detail.get("ai_feedback_status") or "",
+		**{field: detail.get(field) or "" for field in AI_FEEDBACK_FIELDS}
+	}
+
+def get_feedback_backoff(attempt):
+	"""Seconds to wait after a failed try: 2s, 4s, 8s... with up to 25% jitter"""
+	delay = AI_FEEDBACK_BACKOFF_SECONDS * (2 ** (attempt - 1))
+	return delay * (1 + random.random() * 0.25)
+
+def request_with_retries(request):
+	"""Call request up to AI_FEEDBACK_MAX_TRIES times with backoff, raise the last error"""
+	for attempt in range(1, AI_FEEDBACK_MAX_TRIES + 1):
+		try:
+			return request()
+		except Exception:
+			if attempt == AI_FEEDBACK_MAX_TRIES:
+				raise
+			time.sleep(get_feedback_backoff(attempt))
+
+def process_answer_feedback(detail_name, user_answer):
+	"""
+	Background job: generate and store the AI feedback of one exam answer
+	
+	LLM failures are retried with exponential backoff. When every try fails the error
+	feedback is stored with status "Failed". Nothing is written if the student has
+	changed the answer in the meantime, the job queued for the new answer covers it.
+	
+	Args:
+		detail_name (str): Name of the User Exam Attempt Detail
+		user_answer (str): Answer the feedback is generated for
+	"""
+	detail = frappe.db.get_value(
+		"User Exam Attempt Detail", detail_name, ["parent", "flashcard", "user_answer"], as_dict=True
+	)
+	if not detail or detail.user_answer != user_answer:
+		return
+	
+	flashcard = frappe.get_doc("Flashcard", detail.flashcard)
+	
+	try:
+		feedback = request_with_retries(lambda: request_ai_feedback(flashcard, user_answer))
+		# Same status as process_attempt_feedback gives answers without a configured API key
+		status = "Failed" if feedback == AI_FEEDBACK_NOT_CONFIGURED else "Ready"
+	except Exception as e:
+		frappe.log_error(
+			f"Gemini API error after {AI_FEEDBACK_MAX_TRIES} tries for {detail_name}: {str(e)}",
+			"AI Feedback Generation Error"
+		)
+		feedback = get_ai_feedback_error(e)
+		status = "Failed"
+	
+	# Lock the row and make sure the answer did not change while the LLM was running
+	if frappe.db.get_value("User Exam Attempt Detail", detail_name, "user_answer", for_update=True) != user_answer:
+		frappe.db.rollback()
+		return
+	
+	frappe.db.set_value(
+		"User Exam Attempt Detail",
+		detail_name,
+		{**{field: feedback.get(field, "") for field in AI_FEEDBACK_FIELDS}, "ai_feedback_status": status}
+	)
+	frappe.db.commit()
+	
+	frappe.publish_realtime(
+		"exam_answer_feedback",
+		get_answer_feedback_response(detail.parent, detail.flashcard, {**feedback, "ai_feedback_status": status}),
+		user=frappe.db.get_value("User Exam Attempt", detail.parent, "user")
+	)
+
+def build_batch_ai_feedback_prompt(system_prompt, user_prompts):
+	"""
+	Build one prompt asking for the feedback of several answers as JSON
+	
+	Args:
+		system_prompt (str): The single-answer system prompt
+		user_prompts (list): User prompts of the answers, see build_ai_feedback_prompt
+		
+	Returns:
+		tuple: (system_prompt, user_prompt)
+	"""
+	batch_system_prompt = system_prompt + """
+		Bạn sẽ nhận nhiều câu hỏi cùng lúc, mỗi câu bắt đầu bằng "### Câu <id>".
+		Hãy đánh giá từng câu một cách độc lập và trả về DUY NHẤT một mảng JSON, mỗi câu một phần tử:
+		[{"id": <id>, "what_was_correct": "...", "what_was_incorrect": "...", "what_to_include": "..."}]
+	"""
+	batch_user_prompt = "\n\n".join(
+		f"### Câu {position}\n{user_prompt}" for position, user_prompt in enumerate(user_prompts, start=1)
+	)
+	return batch_system_prompt, batch_user_prompt
+
+def parse_batch_ai_feedback(feedback_text):
+	"""
+	Read the per-answer feedback from a batch response
+	
+	Args:
+		feedback_text (str): Raw response text, a JSON array optionally inside a code block
+		
+	Returns:
+		dict: Answer position (starting at 1) mapped to the three ai_feedback_* components,
+			answers missing from the response are left out
+	"""
+	text = (feedback_text or "").strip()
+	code_block = re.search(r"```(?:json)?\s*([\s\S]+?)\s*```", text, re.IGNORECASE)
+	if code_block:
+		text = code_block.group(1)
+	
+	try:
+		items = json.loads(text)
+	except ValueError:
+		return {}
+	if isinstance(items, dict):
+		items = items.get("results") or []
+	
+	feedback = {}
+	for item in items if isinstance(items, list) else []:
+		if not isinstance(item, dict) or not cint(item.get("id")):
+			continue
+		feedback[cint(item.get("id"))] = {
+			"ai_feedback_what_was_correct": str(item.get("what_was_correct") or ""),
+			"ai_feedback_what_was_incorrect": str(item.get("what_was_incorrect") or ""),
+			"ai_feedback_what_to_include": str(item.get("what_to_include") or "")
+		}
+	return feedback
+
+def request_batch_ai_feedback(prompts):
+	"""
+	Get the feedback of several answers with one LLM request
+	
+	Args:
+		prompts (list): (system_prompt, user_prompt) of each answer
+		
+	Returns:
+		dict: Answer position (starting at 1) mapped to its feedback, see parse_batch_ai_feedback
+	"""
+	system_prompt, user_prompt = build_batch_ai_feedback_prompt(
+		prompts[0][0], [user_prompt for _system_prompt, user_prompt in prompts]
+	)
+	feedback_text = llm_client.generate_content(
+		[system_prompt, user_prompt],
+		AI_FEEDBACK_MODEL,
+		generation_config={
+			"temperature": 0.2,
+			"topP": 0.8,
+			"topK": 40,
+			"maxOutputTokens": min(AI_FEEDBACK_MAX_OUTPUT_TOKENS, AI_FEEDBACK_OUTPUT_TOKENS * len(prompts)),
+			"responseMimeType": "application/json"
+		}
+	)
+	return parse_batch_ai_feedback(feedback_text)
+
+def process_attempt_feedback(attempt_name):
+	"""
+	Background job: generate the AI feedback of every pending answer of a batch attempt
+	
+	Cached feedback is used first. The remaining answers are sent AI_FEEDBACK_BATCH_SIZE
+	at a time in one prompt each, and all detail rows are written with one bulk update.
+	Answers missing from a batch response, or of a batch that failed, fall back to
+	process_answer_feedback.
+	
+	Args:
+		attempt_name (str): Name of the completed User Exam Attempt
+	"""
+	attempt = frappe.db.get_value("User Exam Attempt", attempt_name, ["user", "topic"], as_dict=True)
+	details = frappe.get_all(
+		"User Exam Attempt Detail",
+		filters={"parent": attempt_name, "ai_feedback_status": "Pending"},
+		fields=["name", "flashcard", "user_answer"],
+		order_by="idx"
+	)
+	if not attempt or not details:
+		return
+	
+	flashcards = flashcard_cache.get_flashcards_by_name(attempt.topic, [detail.flashcard for detail in details])
+	
+	updates = []
+	uncached = []
+	for detail in details:
+		prompt = build_ai_feedback_prompt(flashcards[detail.flashcard], llm_cache.normalize_answer(detail.user_answer))
+		cache_inputs = {"model": AI_FEEDBACK_MODEL, "system_prompt": prompt[0], "user_prompt": prompt[1]}
+		feedback = llm_cache.get_response("exam_answer_feedback", cache_inputs)
+		if feedback:
+			updates.append({"name": detail.name, **feedback, "ai_feedback_status": "Ready"})
+		else:
+			uncached.append((detail, prompt, cache_inputs))
+	
+	fallback = []
+	if uncached and not llm_client.get_api_key():
+		updates.extend(
+			{"name": detail.name, **AI_FEEDBACK_NOT_CONFIGURED, "ai_feedback_status": "Failed"}
+			for detail, _prompt, _cache_inputs in uncached
+		)
+		uncached = []
+	
+	for start in range(0, len(uncached), AI_FEEDBACK_BATCH_SIZE):
+		batch = uncached[start:start + AI_FEEDBACK_BATCH_SIZE]
+		try:
+			results = request_with_retries(
+				lambda: request_batch_ai_feedback([prompt for _detail, prompt, _cache_inputs in batch])
+			)
+		except Exception as e:
+			frappe.log_error(f"Gemini batch feedback error for {attempt_name}: {str(e)}", "AI Feedback Generation Error")
+			results = {}
+		
+		for position, (detail, _prompt, cache_inputs) in enumerate(batch, start=1):
+			feedback = results.get(position)
+			if feedback:
+				llm_cache.set_response("exam_answer_feedback", cache_inputs, feedback)
+				updates.append({"name": detail.name, **feedback, "ai_feedback_status": "Ready"})
+			else:
+				fallback.append(detail)
+	
+	bulk.bulk_update("User Exam Attempt Detail", updates, AI_FEEDBACK_FIELDS + ["ai_feedback_status"])
+	
+	for detail in fallback:
+		frappe.enqueue(
+			"elearning.elearning.doctype.user_exam_attempt.user_exam_attempt.process_answer_feedback",
+			queue="default",
+			timeout=AI_FEEDBACK_JOB_TIMEOUT,
+			enqueue_after_commit=True,
+			detail_name=detail.name,
+			user_answer=detail.user_answer
+		)
+	frappe.db.commit()
+	
+	frappe.publish_realtime(
+		"exam_attempt_feedback",
+		{"attempt_name": attempt_name, "ready": len(updates), "pending": len(fallback)},
+		user=attempt.user
+	)
+
 @frappe.whitelist()
 def submit_self_assessment_and_init_srs(attempt_name, flashcard_name, self_assessment_value):
 	"""
@@ -284,17 +700,8 @@ def submit_self_assessment_and_init_srs(attempt_name, flashcard_name, self_asses
 	if not frappe.db.exists("Flashcard", flashcard_name):
 		frappe.throw(_("Flashcard does not exist"))
 	
-	# Find the detail record
-	detail_list = frappe.get_all(
-		"User Exam Attempt Detail",
-		filters={"parent": attempt_name, "flashcard": flashcard_name},
-		fields=["name"]
-	)
-	
-	if not detail_list:
-		frappe.throw(_("This flashcard is not part of the exam attempt"))
-	
-	detail = frappe.get_doc("User Exam Attempt Detail", detail_list[0].name)
+	# Find the detail record, lazy attempts create it on first touch
+	detail = frappe.get_doc("User Exam Attempt Detail", get_or_create_attempt_detail(attempt, flashcard_name))
 	
 	# Update self-assessment
 	detail.user_self_assessment = self_assessment_value
@@ -336,40 +743,18 @@ def submit_self_assessment_and_init_srs(attempt_name, flashcard_name, self_asses
 	# Get SRS values for this self-assessment
 	srs_initial = srs_values.get(self_assessment_value)
 	
-	# Check if SRS progress already exists
-	progress_list = frappe.get_all(
-		"User SRS Progress",
-		filters={"user": user_id, "flashcard": flashcard_name},
-		fields=["name"]
-	)
-	
 	now_dt = get_datetime(now())
 	next_review = add_to_date(now_dt, days=int(srs_initial["interval_days"]))
 	
-	if progress_list:
-		# Update existing progress
-		progress = frappe.get_doc("User SRS Progress", progress_list[0].name)
-		progress.status = srs_initial["status"]
-		progress.interval_days = srs_initial["interval_days"]
-		progress.ease_factor = srs_initial["ease_factor"]
-		progress.repetitions = srs_initial["repetitions"]
-		progress.learning_step = srs_initial["learning_step"]
-		progress.last_review_timestamp = now_dt
-		progress.next_review_timestamp = next_review
-	else:
-		# Create new progress
-		progress = frappe.new_doc("User SRS Progress")
-		progress.user = user_id
-		progress.flashcard = flashcard_name
-		progress.status = srs_initial["status"]
-		progress.interval_days = srs_initial["interval_days"]
-		progress.ease_factor = srs_initial["ease_factor"]
-		progress.repetitions = srs_initial["repetitions"]
-		progress.learning_step = srs_initial["learning_step"]
-		progress.last_review_timestamp = now_dt
-		progress.next_review_timestamp = next_review
-	
-	progress.save(ignore_permissions=True)
+	# Initialize or overwrite SRS progress, keyed by the unique (user, flashcard) constraint
+	progress = frappe._dict(
+		srs_initial,
+		name=frappe.db.get_value("User SRS Progress", {"user": user_id, "flashcard": flashcard_name}),
+		flashcard=flashcard_name,
+		last_review_timestamp=now_dt,
+		next_review_timestamp=next_review
+	)
+	upsert_srs_progress(user_id, [progress])
 	frappe.db.commit()
 	
 	return {
@@ -412,13 +797,22 @@ def complete_exam_attempt(attempt_name):
 	# Update attempt
 	attempt.time_spent_seconds = time_spent_seconds
 	attempt.completion_timestamp = now()
+	# Statistics are calculated by on_update on the first completion
 	attempt.save(ignore_permissions=True)
 	
-	# Log completion
-	attempt.calculate_exam_statistics()
+	frappe.db.after_commit.add(lambda: invalidate_exam_history_count(attempt.user, attempt.topic))
+	
+	if attempt.batch_feedback:
+		frappe.enqueue(
+			"elearning.elearning.doctype.user_exam_attempt.user_exam_attempt.process_attempt_feedback",
+			queue="default",
+			timeout=AI_FEEDBACK_JOB_TIMEOUT,
+			enqueue_after_commit=True,
+			attempt_name=attempt.name
+		)
 	
 	# Count total questions
-	total_questions = frappe.db.count("User Exam Attempt Detail", {"parent": attempt_name})
+	total_questions = get_attempt_question_count(attempt)
 	
 	return {
 		"success": True,
@@ -433,158 +827,257 @@ def complete_exam_attempt(attempt_name):
 		}
 	}
 
+# Fields of get_exam_attempt_details rows mapped to their column in the details query
+ATTEMPT_DETAIL_COLUMNS = {
+	"name": "detail.name",
+	"flashcard": "flashcard.name",
+	"question": "flashcard.question",
+	"answer": "flashcard.answer",
+	"explanation": "flashcard.explanation",
+	"flashcard_type": "flashcard.flashcard_type",
+	"user_answer": "detail.user_answer",
+	"ai_feedback_what_was_correct": "detail.ai_feedback_what_was_correct",
+	"ai_feedback_what_was_incorrect": "detail.ai_feedback_what_was_incorrect",
+	"ai_feedback_what_to_include": "detail.ai_feedback_what_to_include",
+	"ai_feedback_status": "detail.ai_feedback_status",
+	"user_self_assessment": "detail.user_self_assessment",
+	"hint": "flashcard.hint"
+}
+
+# Returned when no projection is requested, ordering_steps_items is added for "Ordering Steps" cards
+DEFAULT_ATTEMPT_DETAIL_FIELDS = [
+	"name", "flashcard", "question", "answer", "explanation", "flashcard_type", "user_answer",
+	"ai_feedback_what_was_correct", "ai_feedback_what_was_incorrect", "ai_feedback_what_to_include",
+	"user_self_assessment", "hint", "ordering_steps_items"
+]
+
+def get_attempt_detail_fields(fields):
+	"""Validate a field projection of get_exam_attempt_details, name and flashcard are always included"""
+	if not fields:
+		return DEFAULT_ATTEMPT_DETAIL_FIELDS
+	
+	if isinstance(fields, str):
+		fields = frappe.parse_json(fields)
+	
+	invalid = [field for field in fields if field not in ATTEMPT_DETAIL_COLUMNS and field != "ordering_steps_items"]
+	if invalid:
+		frappe.throw(_("Invalid fields: {0}").format(", ".join(invalid)))
+	
+	return ["name", "flashcard"] + [field for field in fields if field not in ("name", "flashcard")]
+
+def load_attempt_detail_rows(attempt, fields, start, page_length):
+	"""
+	Load a page of detail rows together with their flashcard fields in one query
+	
+	Lazy attempts page over their flashcard order, cards without a detail row get default values.
+	
+	Returns:
+		list: Rows with the requested columns plus flashcard_type, in attempt order
+	"""
+	columns = {field: ATTEMPT_DETAIL_COLUMNS[field] for field in fields if field in ATTEMPT_DETAIL_COLUMNS}
+	columns["flashcard_type"] = ATTEMPT_DETAIL_COLUMNS["flashcard_type"]
+	select = ", ".join(f"{column} AS `{field}`" for field, column in columns.items())
+	
+	flashcard_order = get_attempt_flashcard_order(attempt)
+	if flashcard_order is None:
+		limit = "LIMIT %(page_length)s OFFSET %(start)s" if page_length else ""
+		rows = frappe.db.sql(f"""
+			SELECT {select}, detail.flashcard AS `_detail_flashcard`
+			FROM `tabUser Exam Attempt Detail` detail
+			LEFT JOIN `tabFlashcard` flashcard ON flashcard.name = detail.flashcard
+			WHERE detail.parent = %(attempt)s
+			ORDER BY detail.idx
+			{limit}
+		""", {"attempt": attempt.name, "start": start, "page_length": page_length}, as_dict=True)
+		
+		for row in rows:
+			if row.flashcard is None:
+				frappe.throw(_("Flashcard {0} not found").format(row._detail_flashcard), frappe.DoesNotExistError)
+			del row["_detail_flashcard"]
+		return rows
+	
+	page = flashcard_order[start:start + page_length] if page_length else flashcard_order[start:]
+	if not page:
+		return []
+	
+	rows = frappe.db.sql(f"""
+		SELECT {select}, detail.name IS NOT NULL AS `_has_detail`
+		FROM `tabFlashcard` flashcard
+		LEFT JOIN `tabUser Exam Attempt Detail` detail
+			ON detail.parent = %(attempt)s AND detail.flashcard = flashcard.name
+		WHERE flashcard.name IN %(flashcards)s
+	""", {"attempt": attempt.name, "flashcards": tuple(page)}, as_dict=True)
+	rows_by_flashcard = {row.flashcard: row for row in rows}
+	
+	page_rows = []
+	for flashcard_name in page:
+		row = rows_by_flashcard.get(flashcard_name)
+		if not row:
+			frappe.throw(_("Flashcard {0} not found").format(flashcard_name), frappe.DoesNotExistError)
+		
+		if not row.pop("_has_detail"):
+			# Card not touched yet, see get_or_create_attempt_detail
+			row.update({
+				field: value for field, value in {
+					"name": get_lazy_detail_name(attempt.name, flashcard_name),
+					**DEFAULT_DETAIL_VALUES
+				}.items() if field in row
+			})
+		page_rows.append(row)
+	return page_rows
+
 @frappe.whitelist()
-def get_exam_attempt_details(attempt_name):
+def get_exam_attempt_details(attempt_name, fields=None, start=0, page_length=None):
 	"""
 	Get details of an exam attempt
 	
+	Details and their flashcards are read with one joined query and the ordering steps of
+	the page with at most one more, so the cost does not grow with the number of cards.
+	
 	Args:
 		attempt_name (str): Name of the exam attempt
+		fields (list|str, optional): Detail fields to return (JSON list accepted),
+			defaults to DEFAULT_ATTEMPT_DETAIL_FIELDS
+		start (int, optional): Index of the first detail to return
+		page_length (int, optional): Number of details to return, all when not given
 		
 	Returns:
 		dict: Detailed information about the exam attempt
 	"""
 	user_id = get_current_user()
-	
-	# Check if attempt exists and belongs to user
-	attempt = frappe.get_doc("User Exam Attempt", attempt_name)
+	fields = get_attempt_detail_fields(fields)
+	start = max(cint(start), 0)
+	page_length = max(cint(page_length), 0)
+	
+	# Attempt with its topic name
+	attempt = frappe.db.sql("""
+		SELECT attempt.name, attempt.user, attempt.topic, attempt.start_time, attempt.completion_timestamp,
+			attempt.time_spent_seconds, attempt.total_questions, attempt.flashcard_order, topic.topic_name
+		FROM `tabUser Exam Attempt` attempt
+		LEFT JOIN `tabTopics` topic ON topic.name = attempt.topic
+		WHERE attempt.name = %s
+	""", (attempt_name,), as_dict=True)
+	if not attempt:
+		frappe.throw(_("User Exam Attempt {0} not found").format(attempt_name), frappe.DoesNotExistError)
+	attempt = attempt[0]
+	
+	# Check if attempt belongs to user
 	if attempt.user != user_id:
 		frappe.throw(_("This exam attempt does not belong to you"))
 	
-	# Get all flashcards
-	detail_records = frappe.get_all(
-		"User Exam Attempt Detail",
-		filters={"parent": attempt_name},
-		fields=["name", "flashcard", "user_answer", "ai_feedback_what_was_correct", "ai_feedback_what_was_incorrect", "ai_feedback_what_to_include", "user_self_assessment"]
-	)
+	rows = load_attempt_detail_rows(attempt, fields, start, page_length)
 	
-	# Get all flashcard details
-	details = []
-	for record in detail_records:
-		flashcard = frappe.get_doc("Flashcard", record.flashcard)
-		
-		detail_data = {
-			"name": record.name,
-			"flashcard": record.flashcard,
-			"question": flashcard.question,
-			"answer": flashcard.answer,
-			"explanation": flashcard.explanation,
-			"flashcard_type": flashcard.flashcard_type,
-			"user_answer": record.user_answer,
-			"ai_feedback_what_was_correct": record.ai_feedback_what_was_correct,
-			"ai_feedback_what_was_incorrect": record.ai_feedback_what_was_incorrect,
-			"ai_feedback_what_to_include": record.ai_feedback_what_to_include,
-			"user_self_assessment": record.user_self_assessment,
-			"hint": flashcard.hint
-		}
-		
-		# Add ordering steps if applicable
-		if flashcard.flashcard_type == "Ordering Steps":
-			ordering_steps = frappe.get_all(
-				"Ordering Step Item",
-				filters={"parent": flashcard.name},
-				fields=["step_content", "correct_order"],
-				order_by="correct_order"
-			)
-			detail_data["ordering_steps_items"] = ordering_steps
-		
-		details.append(detail_data)
+	if "ordering_steps_items" in fields:
+		steps_by_flashcard = get_child_rows(
+			"Ordering Step Item",
+			[row.flashcard for row in rows if row.flashcard_type == "Ordering Steps"],
+			["step_content", "correct_order"],
+			order_by="correct_order"
+		)
+		for row in rows:
+			if row.flashcard_type == "Ordering Steps":
+				row["ordering_steps_items"] = steps_by_flashcard.get(row.flashcard, [])
+	
+	details = [{field: row[field] for field in fields if field in row} for row in rows]
 	
 	# Format time spent in a readable format
 	time_spent_mins = int(attempt.time_spent_seconds / 60) if attempt.time_spent_seconds else 0
 	time_spent_secs = int(attempt.time_spent_seconds % 60) if attempt.time_spent_seconds else 0
 	formatted_time = f"{time_spent_mins}m {time_spent_secs}s"
 	
-	# Get topic name
-	topic_name = frappe.db.get_value("Topics", attempt.topic, "topic_name")
-	
 	return {
 		"success": True,
 		"attempt": {
 			"name": attempt.name,
 			"topic": attempt.topic,
-			"topic_name": topic_name,
+			"topic_name": attempt.topic_name,
 			"start_time": attempt.start_time,
 			"completion_timestamp": attempt.completion_timestamp,
-			"total_questions": len(details),
+			"total_questions": get_attempt_question_count(attempt),
 			"time_spent_seconds": attempt.time_spent_seconds,
 			"formatted_time": formatted_time,
+			"start": start,
+			"page_length": page_length or len(details),
 			"details": details
 		}
 	}
 
+# Exam history counts served by get_user_exam_history(count_mode="cached")
+EXAM_HISTORY_COUNT_TTL_SECONDS = 10 * 60
+
+def get_exam_history_count_key(user, topic_name=None):
+	return f"exam_history_count|{user}|{topic_name or ''}"
+
+def invalidate_exam_history_count(user, topic_name):
+	"""Drop the cached history counts a newly completed attempt of the topic belongs to"""
+	frappe.cache().delete_value([
+		get_exam_history_count_key(user),
+		get_exam_history_count_key(user, topic_name)
+	])
+
+def encode_history_cursor(attempt):
+	return f"{attempt.start_time}|{attempt.name}"
+
+def decode_history_cursor(cursor):
+	start_time, separator, name = (cursor or "").rpartition("|")
+	if not separator or not start_time or not name:
+		frappe.throw(_("Invalid cursor"))
+	return get_datetime(start_time), name
+
 @frappe.whitelist()
-def get_user_exam_history(topic_name=None, limit=10, offset=0):
+def get_user_exam_history(topic_name=None, limit=10, offset=0, cursor=None, count_mode="exact"):
 	"""
-	Get user's exam history
+	Get user's exam history, newest first
+	
+	Pages are read with a keyset on (start_time, name): pass the next_cursor of a page
+	to get the following one. offset is still accepted for older clients.
 	
 	Args:
 		topic_name (str, optional): Filter by topic name
 		limit (int, optional): Limit number of results
-		offset (int, optional): Offset for pagination
+		offset (int, optional): Offset for pagination, ignored when a cursor is given
+		cursor (str, optional): next_cursor of the previous page
+		count_mode (str, optional): "exact" counts matching attempts, "cached" reuses a
+			count cached for a few minutes and "none" skips counting (total_count is None)
 		
 	Returns:
-		dict: User's exam history
+		dict: User's exam history with total_count and next_cursor (None on the last page)
 	"""
 	user_id = get_current_user()
+	limit = cint(limit) or 10
 	
-	# Build query using only columns that exist in the doctype
+	conditions = ["attempt.user = %(user)s", "attempt.completion_timestamp IS NOT NULL"]
 	if topic_name:
-		query = """
-			SELECT name, topic, start_time, completion_timestamp as end_time, 
-			       time_spent_seconds
-			FROM `tabUser Exam Attempt`
-			WHERE user = %s 
-			AND completion_timestamp IS NOT NULL
-			AND topic = %s
-			ORDER BY start_time DESC
-			LIMIT %s OFFSET %s
-		"""
-		attempts = frappe.db.sql(query, (user_id, topic_name, cint(limit), cint(offset)), as_dict=True)
-		
-		# Count total records matching criteria
-		count_query = """
-			SELECT COUNT(*) as count
-			FROM `tabUser Exam Attempt`
-			WHERE user = %s 
-			AND completion_timestamp IS NOT NULL
-			AND topic = %s
-		"""
-		count_result = frappe.db.sql(count_query, (user_id, topic_name), as_dict=True)
-		total_count = count_result[0].count if count_result else 0
+		conditions.append("attempt.topic = %(topic)s")
+	
+	values = {"user": user_id, "topic": topic_name, "limit": limit + 1, "offset": 0}
+	if cursor:
+		values["cursor_start_time"], values["cursor_name"] = decode_history_cursor(cursor)
+		conditions.append("""(attempt.start_time < %(cursor_start_time)s
+			OR (attempt.start_time = %(cursor_start_time)s AND attempt.name < %(cursor_name)s))""")
 	else:
-		query = """
-			SELECT name, topic, start_time, completion_timestamp as end_time, 
-			       time_spent_seconds
-			FROM `tabUser Exam Attempt`
-			WHERE user = %s 
-			AND completion_timestamp IS NOT NULL
-			ORDER BY start_time DESC
-			LIMIT %s OFFSET %s
-		"""
-		attempts = frappe.db.sql(query, (user_id, cint(limit), cint(offset)), as_dict=True)
-		
-		# Count total records matching criteria
-		count_query = """
-			SELECT COUNT(*) as count
-			FROM `tabUser Exam Attempt`
-			WHERE user = %s 
-			AND completion_timestamp IS NOT NULL
-		"""
-		count_result = frappe.db.sql(count_query, (user_id,), as_dict=True)
-		total_count = count_result[0].count if count_result else 0
-	
-	# Get topic names and count total questions
-	topics = {}
+		values["offset"] = cint(offset)
+	
+	# One row more than requested tells whether there is a next page
+	attempts = frappe.db.sql(f"""
+		SELECT attempt.name, attempt.topic, topic.topic_name, attempt.start_time,
+			attempt.completion_timestamp AS end_time, attempt.time_spent_seconds,
+			attempt.total_questions, attempt.flashcard_order
+		FROM `tabUser Exam Attempt` attempt
+		LEFT JOIN `tabTopics` topic ON topic.name = attempt.topic
+		WHERE {" AND ".join(conditions)}
+		ORDER BY attempt.start_time DESC, attempt.name DESC
+		LIMIT %(limit)s OFFSET %(offset)s
+	""", values, as_dict=True)
+	
+	next_cursor = None
+	if len(attempts) > limit:
+		attempts = attempts[:limit]
+		next_cursor = encode_history_cursor(attempts[-1])
+	
 	for attempt in attempts:
-		if attempt.topic not in topics:
-			topic_doc = frappe.get_doc("Topics", attempt.topic)
-			topics[attempt.topic] = topic_doc.topic_name
-		
-		attempt["topic_name"] = topics[attempt.topic]
-		
-		# Count the number of questions for this attempt
-		attempt["total_questions"] = frappe.db.count("User Exam Attempt Detail", {"parent": attempt.name})
+		attempt["total_questions"] = get_attempt_question_count(attempt)
+		attempt.pop("flashcard_order", None)
 		
 		# Format time spent in a more readable format
 		time_spent_mins = int(attempt.time_spent_seconds / 60)
@@ -593,8 +1086,62 @@ def get_user_exam_history(topic_name=None, limit=10, offset=0):
 	
 	return {
 		"success": True,
-		"total_count": total_count,
-		"attempts": attempts
+		"total_count": get_exam_history_count(user_id, topic_name, count_mode),
+		"attempts": attempts,
+		"next_cursor": next_cursor
+	}
+
+def get_exam_history_count(user, topic_name, count_mode):
+	"""
+	Number of completed attempts of a user, optionally for one topic
+	
+	Args:
+		user (str): User ID
+		topic_name (str): Topic filter or None
+		count_mode (str): "exact", "cached" or "none", see get_user_exam_history
+		
+	Returns:
+		int: Number of attempts, None with count_mode "none"
+	"""
+	if count_mode == "none":
+		return None
+	
+	if count_mode == "cached":
+		count = frappe.cache().get_value(get_exam_history_count_key(user, topic_name))
+		if count is not None:
+			return count
+	
+	filters = {"user": user, "completion_timestamp": ["is", "set"]}
+	if topic_name:
+		filters["topic"] = topic_name
+	count = frappe.db.count("User Exam Attempt", filters)
+	
+	if count_mode == "cached":
+		frappe.cache().set_value(
+			get_exam_history_count_key(user, topic_name), count, expires_in_sec=EXAM_HISTORY_COUNT_TTL_SECONDS
+		)
+	return count
+
+AI_FEEDBACK_MODEL = "gemini-1.5-pro"
+
+# Feedback stored when the AI feedback cannot be generated
+AI_FEEDBACK_NOT_CONFIGURED = {
+	"ai_feedback_what_was_correct": "Chức năng phản hồi AI không khả dụng.",
+	"ai_feedback_what_was_incorrect": "Vui lòng cấu hình Gemini API key trong site_config.json hoặc Elearning Settings.",
+	"ai_feedback_what_to_include": "Liên hệ quản trị viên để được hỗ trợ."
+}
+
+AI_FEEDBACK_EMPTY_RESPONSE = {
+	"ai_feedback_what_was_correct": "Chúng tôi nhận được phản hồi trống từ hệ thống AI.",
+	"ai_feedback_what_was_incorrect": "Điều này có thể do lọc nội dung hoặc lỗi nội bộ.",
+	"ai_feedback_what_to_include": "Vui lòng thử lại hoặc liên hệ hỗ trợ."
+}
+
+def get_ai_feedback_error(error):
+	return {
+		"ai_feedback_what_was_correct": "Chúng tôi gặp lỗi khi tạo phản hồi.",
+		"ai_feedback_what_was_incorrect": f"Lỗi: {str(error)}",
+		"ai_feedback_what_to_include": "Vui lòng thử lại sau hoặc liên hệ hỗ trợ."
 	}
 
 def generate_ai_feedback(flashcard, user_answer):
@@ -612,24 +1159,83 @@ def generate_ai_feedback(flashcard, user_answer):
 			- ai_feedback_what_to_include: What could be included/improved
 	"""
 	try:
-		# Check if Gemini API key is configured
-		api_key = frappe.conf.get("gemini_api_key")
-		if not api_key:
-			api_key = frappe.db.get_single_value("Elearning Settings", "gemini_api_key")
-			
-		if not api_key:
-			return {
-				"ai_feedback_what_was_correct": "Chức năng phản hồi AI không khả dụng.",
-				"ai_feedback_what_was_incorrect": "Vui lòng cấu hình Gemini API key trong site_config.json hoặc Elearning Settings.",
-				"ai_feedback_what_to_include": "Liên hệ quản trị viên để được hỗ trợ."
-			}
-		
-		# Initialize Gemini API
-		genai.configure(api_key=api_key)
-		model = genai.GenerativeModel('gemini-1.5-pro')
-		
-		# Create system prompt for AI feedback generation
-		system_prompt = """
+		return request_ai_feedback(flashcard, user_answer)
+	except Exception as e:
+		frappe.log_error(f"Gemini API error: {str(e)}", "AI Feedback Generation Error")
+		return get_ai_feedback_error(e)
+
+def request_ai_feedback(flashcard, user_answer):
+	"""
+	Generate AI feedback like generate_ai_feedback, but raise when the LLM call fails
+	
+	Feedback is cached by the content of the prompt, so the same answer to the same
+	flashcard is only sent to the LLM once.
+	
+	Args:
+		flashcard (Document): Flashcard document
+		user_answer (str): User's answer
+		
+	Returns:
+		dict: AI feedback with the three ai_feedback_* components
+	"""
+	system_prompt, user_prompt = build_ai_feedback_prompt(flashcard, llm_cache.normalize_answer(user_answer))
+	cache_inputs = {"model": AI_FEEDBACK_MODEL, "system_prompt": system_prompt, "user_prompt": user_prompt}
+	
+	feedback = llm_cache.get_response("exam_answer_feedback", cache_inputs)
+	if feedback:
+		return feedback
+	
+	# Check if Gemini API key is configured
+	if not llm_client.get_api_key():
+		return AI_FEEDBACK_NOT_CONFIGURED.copy()
+	
+	feedback_text = call_feedback_llm(system_prompt, user_prompt)
+	
+	if not feedback_text:
+		return AI_FEEDBACK_EMPTY_RESPONSE.copy()
+	
+	feedback = parse_ai_feedback(feedback_text)
+	llm_cache.set_response("exam_answer_feedback", cache_inputs, feedback)
+	return feedback
+
+def call_feedback_llm(system_prompt, user_prompt):
+	"""
+	Send a feedback prompt to Gemini
+	
+	Args:
+		system_prompt (str): Instructions for the model
+		user_prompt (str): Question and answer to assess
+		
+	Returns:
+		str: Raw response text
+	"""
+	# Configure generation parameters
+	generation_config = {
+		"temperature": 0.2,
+		"topP": 0.8,
+		"topK": 40,
+		"maxOutputTokens": AI_FEEDBACK_OUTPUT_TOKENS,
+	}
+	
+	return llm_client.generate_content(
+		[system_prompt, user_prompt],
+		AI_FEEDBACK_MODEL,
+		generation_config=generation_config
+	)
+
+def build_ai_feedback_prompt(flashcard, user_answer):
+	"""
+	Build the system and user prompts for the feedback of one answer
+	
+	Args:
+		flashcard (Document): Flashcard document
+		user_answer (str): User's answer
+		
+	Returns:
+		tuple: (system_prompt, user_prompt)
+	"""
+	# Create system prompt for AI feedback generation
+	system_prompt = """
 		Bạn là trợ lý AI giáo dục phân tích câu trả lời của học sinh.
 		Hãy cung cấp phản hồi cụ thể, mang tính xây dựng về câu trả lời của học sinh so với câu trả lời đúng.
 		
@@ -647,205 +1253,471 @@ def generate_ai_feedback(flashcard, user_answer):
 		Nếu không thể tạo phản hồi do lỗi, hãy cung cấp thông báo lỗi đơn giản.
 		
 		QUAN TRỌNG: Phản hồi của bạn PHẢI bằng tiếng Việt.
-		"""
-		
-		# Construct the user prompt based on flashcard type
-		user_prompt = ""
-		
-		if flashcard.flashcard_type == "Concept/Theorem/Formula":
-			user_prompt = f"""Câu hỏi: {flashcard.question}
+	"""
+	
+	# Construct the user prompt based on flashcard type
+	user_prompt = ""
+	
+	if flashcard.flashcard_type == "Concept/Theorem/Formula":
+		user_prompt = f"""Câu hỏi: {flashcard.question}
 Đáp án đúng: {flashcard.answer}
 Câu trả lời của học sinh: {user_answer}
 
 Đây là câu hỏi về khái niệm/định lý/công thức. Hãy đánh giá câu trả lời của học sinh so với đáp án đúng."""
-		
-		elif flashcard.flashcard_type == "Fill in the Blank":
-			user_prompt = f"""Câu hỏi: {flashcard.question}
+	
+	elif flashcard.flashcard_type == "Fill in the Blank":
+		user_prompt = f"""Câu hỏi: {flashcard.question}
 Đáp án đúng: {flashcard.answer}
 Câu trả lời của học sinh: {user_answer}
 
 Đây là câu hỏi điền vào chỗ trống. Hãy đánh giá câu trả lời của học sinh so với đáp án đúng."""
-		
-		elif flashcard.flashcard_type == "Ordering Steps":
-			# For ordering steps, we construct a representation of the correct order
-			correct_steps = frappe.get_all(
+	
+	elif flashcard.flashcard_type == "Ordering Steps":
+		# For ordering steps, we construct a representation of the correct order
+		if flashcard.get("ordering_steps_items") is not None:
+			correct_steps = sorted(flashcard.get("ordering_steps_items"), key=lambda step: cint(step.get("correct_order")))
+		else:
+			correct_steps = get_child_rows(
 				"Ordering Step Item",
-				filters={"parent": flashcard.name},
-				fields=["step_content", "correct_order"],
+				[flashcard.name],
+				["step_content", "correct_order"],
 				order_by="correct_order"
-			)
-			
-			correct_steps_text = "\n".join([f"{idx+1}. {step.step_content}" for idx, step in enumerate(correct_steps)])
-			user_prompt = f"""Câu hỏi: {flashcard.question}
+			).get(flashcard.name, [])
+		
+		correct_steps_text = "\n".join([f"{idx+1}. {step.step_content}" for idx, step in enumerate(correct_steps)])
+		user_prompt = f"""Câu hỏi: {flashcard.question}
 Thứ tự các bước đúng:
 {correct_steps_text}
 Câu trả lời của học sinh: {user_answer}
 
 Đây là câu hỏi sắp xếp các bước theo thứ tự đúng. Hãy đánh giá câu trả lời của học sinh."""
-		
-		elif flashcard.flashcard_type == "What's the Next Step?":
-			user_prompt = f"""Câu hỏi: {flashcard.question}
+	
+	elif flashcard.flashcard_type == "What's the Next Step?":
+		user_prompt = f"""Câu hỏi: {flashcard.question}
 Bước tiếp theo đúng: {flashcard.answer}
 Câu trả lời của học sinh: {user_answer}
 
 Đây là câu hỏi về bước tiếp theo trong giải quyết vấn đề. Hãy đánh giá liệu học sinh đã xác định đúng bước tiếp theo chưa."""
-		
-		elif flashcard.flashcard_type == "Short Answer/Open-ended":
-			user_prompt = f"""Câu hỏi: {flashcard.question}
+	
+	elif flashcard.flashcard_type == "Short Answer/Open-ended":
+		user_prompt = f"""Câu hỏi: {flashcard.question}
 Đáp án mẫu: {flashcard.answer}
 Câu trả lời của học sinh: {user_answer}
 
 Đây là câu hỏi mở. Hãy đánh giá câu trả lời của học sinh so với đáp án mẫu, xem xét các cách tiếp cận thay thế hợp lệ."""
-		
-		elif flashcard.flashcard_type == "Identify the Error":
-			user_prompt = f"""Câu hỏi: {flashcard.question}
+	
+	elif flashcard.flashcard_type == "Identify the Error":
+		user_prompt = f"""Câu hỏi: {flashcard.question}
 Giải pháp có lỗi: {flashcard.solution_with_error}
 Cách xác định lỗi đúng: {flashcard.answer}
 Câu trả lời của học sinh: {user_answer}
 
 Đây là câu hỏi xác định lỗi. Hãy đánh giá liệu học sinh đã xác định đúng lỗi chưa."""
-		
-		else:  # Default for other types
-			user_prompt = f"""Câu hỏi: {flashcard.question}
+	
+	else:  # Default for other types
+		user_prompt = f"""Câu hỏi: {flashcard.question}
 Đáp án đúng: {flashcard.answer}
 Câu trả lời của học sinh: {user_answer}
 
 Hãy đánh giá câu trả lời của học sinh so với đáp án đúng."""
+	
+	return system_prompt, user_prompt
+
+def parse_ai_feedback(feedback_text):
+	"""
+	Split a Gemini response into the three feedback components
+	
+	Args:
+		feedback_text (str): Raw response text
 		
-		# Configure generation parameters
-		generation_config = {
-			"temperature": 0.2,
-			"top_p": 0.8,
-			"top_k": 40,
-			"max_output_tokens": 1024,
-		}
-		
-		try:
-			# Generate content with the model
-			response = model.generate_content(
-				[system_prompt, user_prompt],
-				generation_config=generation_config
-			)
+	Returns:
+		dict: AI feedback with the three ai_feedback_* components
+	"""
+	# Split into sections with section headers in Vietnamese
+	what_was_correct = ""
+	what_was_incorrect = ""
+	what_to_include = ""
+	
+	# Simple parsing of sections (Vietnamese sections)
+	if "Phần đúng" in feedback_text:
+		sections = feedback_text.split("Phần")
+		for section in sections:
+			if section.strip().startswith("đúng"):
+				next_heading_pos = section.find("Phần", 10)
+				if next_heading_pos > 0:
+					what_was_correct = section[5:next_heading_pos].strip()
+				else:
+					what_was_correct = section[5:].strip()
 			
-			if response.text:
-				# Parse the response into the three components
-				feedback_text = response.text
-				
-				# Split into sections with section headers in Vietnamese
-				what_was_correct = ""
-				what_was_incorrect = ""
-				what_to_include = ""
-				
-				# Simple parsing of sections (Vietnamese sections)
-				if "Phần đúng" in feedback_text:
-					sections = feedback_text.split("Phần")
-					for section in sections:
-						if section.strip().startswith("đúng"):
-							next_heading_pos = section.find("Phần", 10)
-							if next_heading_pos > 0:
-								what_was_correct = section[5:next_heading_pos].strip()
-							else:
-								what_was_correct = section[5:].strip()
-						
-						elif section.strip().startswith("chưa đúng"):
-							next_heading_pos = section.find("Phần", 10)
-							if next_heading_pos > 0:
-								what_was_incorrect = section[10:next_heading_pos].strip()
-							else:
-								what_was_incorrect = section[10:].strip()
-				
-				if "Phần nên bổ sung" in feedback_text:
-					what_to_include_pos = feedback_text.find("Phần nên bổ sung")
-					if what_to_include_pos > 0:
-						what_to_include = feedback_text[what_to_include_pos + 16:].strip()
-				
-				# If Vietnamese sections not found, try with English headers as fallback
-				if not what_was_correct and not what_was_incorrect and not what_to_include:
-					if "What was correct" in feedback_text:
-						sections = feedback_text.split("What was")
-						for section in sections:
-							if section.strip().startswith("correct"):
-								next_heading_pos = section.find("What", 10)
-								if next_heading_pos > 0:
-									what_was_correct = section[8:next_heading_pos].strip()
-								else:
-									what_was_correct = section[8:].strip()
-							
-							elif section.strip().startswith("incorrect"):
-								next_heading_pos = section.find("What", 10)
-								if next_heading_pos > 0:
-									what_was_incorrect = section[10:next_heading_pos].strip()
-								else:
-									what_was_incorrect = section[10:].strip()
-					
-					if "What to include" in feedback_text:
-						what_to_include_pos = feedback_text.find("What to include")
-						if what_to_include_pos > 0:
-							what_to_include = feedback_text[what_to_include_pos + 15:].strip()
+			elif section.strip().startswith("chưa đúng"):
+				next_heading_pos = section.find("Phần", 10)
+				if next_heading_pos > 0:
+					what_was_incorrect = section[10:next_heading_pos].strip()
+				else:
+					what_was_incorrect = section[10:].strip()
+	
+	if "Phần nên bổ sung" in feedback_text:
+		what_to_include_pos = feedback_text.find("Phần nên bổ sung")
+		if what_to_include_pos > 0:
+			what_to_include = feedback_text[what_to_include_pos + 16:].strip()
+	
+	# If Vietnamese sections not found, try with English headers as fallback
+	if not what_was_correct and not what_was_incorrect and not what_to_include:
+		if "What was correct" in feedback_text:
+			sections = feedback_text.split("What was")
+			for section in sections:
+				if section.strip().startswith("correct"):
+					next_heading_pos = section.find("What", 10)
+					if next_heading_pos > 0:
+						what_was_correct = section[8:next_heading_pos].strip()
+					else:
+						what_was_correct = section[8:].strip()
 				
-				# If sections still couldn't be parsed, try simple rule-based extraction
-				if not what_was_correct and not what_was_incorrect and not what_to_include:
-					lines = feedback_text.split("\n")
-					current_section = None
-					
-					for line in lines:
-						if "đúng" in line.lower() and not current_section:
-							current_section = "correct"
-							continue
-						elif "chưa đúng" in line.lower() or "sai" in line.lower() and current_section == "correct":
-							current_section = "incorrect"
-							continue
-						elif "bổ sung" in line.lower() or "cải thiện" in line.lower() and current_section == "incorrect":
-							current_section = "include"
-							continue
-						
-						if current_section == "correct" and line.strip():
-							what_was_correct += line + "\n"
-						elif current_section == "incorrect" and line.strip():
-							what_was_incorrect += line + "\n"
-						elif current_section == "include" and line.strip():
-							what_to_include += line + "\n"
-				
-				# If all parsing attempts failed, use the full text
-				if not what_was_correct and not what_was_incorrect and not what_to_include:
-					return {
-						"ai_feedback_what_was_correct": "Chúng tôi gặp khó khăn khi phân tích phản hồi AI.",
-						"ai_feedback_what_was_incorrect": "Phản hồi đầy đủ: " + feedback_text,
-						"ai_feedback_what_to_include": "Vui lòng thử lại hoặc kiểm tra định dạng câu trả lời của bạn."
-					}
-				
-				# Trim and clean up
-				what_was_correct = what_was_correct.strip()
-				what_was_incorrect = what_was_incorrect.strip()
-				what_to_include = what_to_include.strip()
-				
-				return {
-					"ai_feedback_what_was_correct": what_was_correct or "Không có phần nào được xác định là đúng.",
-					"ai_feedback_what_was_incorrect": what_was_incorrect or "Không có phần nào được xác định là chưa đúng.",
-					"ai_feedback_what_to_include": what_to_include or "Không có đề xuất cụ thể cho việc cải thiện."
-				}
-			else:
-				return {
-					"ai_feedback_what_was_correct": "Chúng tôi nhận được phản hồi trống từ hệ thống AI.",
-					"ai_feedback_what_was_incorrect": "Điều này có thể do lọc nội dung hoặc lỗi nội bộ.",
-					"ai_feedback_what_to_include": "Vui lòng thử lại hoặc liên hệ hỗ trợ."
-				}
-		
-		except Exception as api_error:
-			frappe.log_error(f"Gemini API error: {str(api_error)}", "AI Feedback Generation Error")
-			return {
-				"ai_feedback_what_was_correct": "Chúng tôi gặp lỗi khi tạo phản hồi.",
-				"ai_feedback_what_was_incorrect": f"Lỗi: {str(api_error)}",
-				"ai_feedback_what_to_include": "Vui lòng thử lại sau hoặc liên hệ hỗ trợ."
-			}
+				elif section.strip().startswith("incorrect"):
+					next_heading_pos = section.find("What", 10)
+					if next_heading_pos > 0:
+						what_was_incorrect = section[10:next_heading_pos].strip()
+					else:
+						what_was_incorrect = section[10:].strip()
+		
+		if "What to include" in feedback_text:
+			what_to_include_pos = feedback_text.find("What to include")
+			if what_to_include_pos > 0:
+				what_to_include = feedback_text[what_to_include_pos + 15:].strip()
+	
+	# If sections still couldn't be parsed, try simple rule-based extraction
+	if not what_was_correct and not what_was_incorrect and not what_to_include:
+		lines = feedback_text.split("\n")
+		current_section = None
+		
+		for line in lines:
+			if "đúng" in line.lower() and not current_section:
+				current_section = "correct"
+				continue
+			elif "chưa đúng" in line.lower() or "sai" in line.lower() and current_section == "correct":
+				current_section = "incorrect"
+				continue
+			elif "bổ sung" in line.lower() or "cải thiện" in line.lower() and current_section == "incorrect":
+				current_section = "include"
+				continue
+			
+			if current_section == "correct" and line.strip():
+				what_was_correct += line + "\n"
+			elif current_section == "incorrect" and line.strip():
+				what_was_incorrect += line + "\n"
+			elif current_section == "include" and line.strip():
+				what_to_include += line + "\n"
+	
+	# If all parsing attempts failed, use the full text
+	if not what_was_correct and not what_was_incorrect and not what_to_include:
+		return {
+			"ai_feedback_what_was_correct": "Chúng tôi gặp khó khăn khi phân tích phản hồi AI.",
+			"ai_feedback_what_was_incorrect": "Phản hồi đầy đủ: " + feedback_text,
+			"ai_feedback_what_to_include": "Vui lòng thử lại hoặc kiểm tra định dạng câu trả lời của bạn."
+		}
 	
-	except Exception as e:
-		frappe.log_error(f"AI feedback generation error: {str(e)}", "AI Feedback Generation Error")
+	# Trim and clean up
+	what_was_correct = what_was_correct.strip()
+	what_was_incorrect = what_was_incorrect.strip()
+	what_to_include = what_to_include.strip()
+	
+	return {
+		"ai_feedback_what_was_correct": what_was_correct or "Không có phần nào được xác định là đúng.",
+		"ai_feedback_what_was_incorrect": what_was_incorrect or "Không có phần nào được xác định là chưa đúng.",
+		"ai_feedback_what_to_include": what_to_include or "Không có đề xuất cụ thể cho việc cải thiện."
+	}
+
+# Deterministic grading: answers that can be checked locally get templated feedback
+# right away, only ambiguous answers are sent to the LLM
+NUMERIC_RELATIVE_TOLERANCE = 1e-6
+NUMERIC_ABSOLUTE_TOLERANCE = 1e-9
+
+FAST_GRADING_METHODS = ["exact", "numeric", "symbolic", "permutation"]
+
+MATH_DELIMITERS = re.compile(r"^(?:\$\$?|\\\(|\\\[)(.*?)(?:\$\$?|\\\)|\\\])$", re.DOTALL)
+NUMBER = re.compile(r"[+-]?(?:\d+(?:[.,]\d+)?|[.,]\d+)")
+# "1.000" or "1,000,000" could be a grouped integer or a decimal depending on the locale
+GROUPED_NUMBER = re.compile(r"[+-]?\d{1,3}(?:[.,]\d{3})+")
+FRACTION = re.compile(r"([+-]?)\\frac\{([^{}]+)\}\{([^{}]+)\}")
+STEP_NUMBERS = re.compile(r"\d+(?:\s*(?:,|;|->|→|>|-|\s)\s*\d+)*")
+
+def get_fast_grading_stats_key():
+	return frappe.cache().make_key("exam_fast_grading_stats")
+
+def normalize_text(text):
+	"""Answer text ignoring spacing and trailing punctuation, case is kept since it matters in math"""
+	return llm_cache.normalize_answer(text).rstrip(".;!")
+
+def strip_math_delimiters(text):
+	expression = llm_cache.normalize_answer(text)
+	match = MATH_DELIMITERS.match(expression)
+	while match:
+		expression = match.group(1).strip()
+		match = MATH_DELIMITERS.match(expression)
+	return expression
+
+def parse_number(text):
+	"""
+	Parse an answer that is a single number, optionally assigned to a variable
+	
+	Accepts "3.5", "3,5", "-2", "1/2", "\\frac{1}{2}", "x = 4" and the same inside math
+	delimiters. Numbers with ambiguous digit grouping such as "1.000" are not parsed, nor
+	are answers with several values such as "1, 2" or "3 5".
+	
+	Returns:
+		tuple: The variable ("x" for "x = 4", None for a plain number) and the number,
+			or None if the answer is not a single number
+	"""
+	expression = re.sub(r"\\left|\\right|\\[,;!]", "", strip_math_delimiters(text))
+	expression = re.sub(r"\\[dt]frac", r"\\frac", expression)
+	# Spacing around signs, "/", "=" and braces is layout, any other spacing separates values
+	expression = re.sub(r"\s*([-+/={}])\s*", r"\1", expression).strip()
+	if re.search(r"\s", expression):
+		return None
+	
+	variable = None
+	assignment = re.fullmatch(r"([a-zA-Z]\w*)=(.*)", expression)
+	if assignment:
+		variable, expression = assignment.groups()
+	
+	if GROUPED_NUMBER.fullmatch(expression):
+		return None
+	
+	def to_float(value):
+		return float(value.replace(",", ".")) if NUMBER.fullmatch(value) else None
+	
+	fraction = FRACTION.fullmatch(expression)
+	if fraction:
+		sign, numerator, denominator = fraction.groups()
+		numerator, denominator = to_float(numerator), to_float(denominator)
+	elif expression.count("/") == 1:
+		sign = ""
+		numerator, denominator = (to_float(part) for part in expression.split("/"))
+	else:
+		number = to_float(expression)
+		return (variable, number) if number is not None else None
+	
+	if numerator is None or not denominator:
+		return None
+	return variable, (-1 if sign == "-" else 1) * numerator / denominator
+
+def split_top_level(expression, separators):
+	"""Split an expression on separator characters outside of brackets, "-" stays with its term"""
+	parts = []
+	current = ""
+	depth = 0
+	for char in expression:
+		if char in "({[":
+			depth += 1
+		elif char in ")}]":
+			depth -= 1
+		# A sign right after an operator or an opening bracket belongs to the operand
+		if depth == 0 and char in separators and current and current[-1] not in "^_*/=+-":
+			parts.append(current)
+			current = "-" if char == "-" else ""
+			continue
+		current += char
+	parts.append(current)
+	return parts
+
+def normalize_expression(text):
+	"""
+	Canonical form of a formula: spacing and notation are normalized and the terms of sums
+	and the factors of products are sorted, so "b + a" and "a+b" compare equal
+	"""
+	expression = strip_math_delimiters(text)
+	expression = re.sub(r"\\left|\\right|\\[,;!:]|\\q?quad", "", expression)
+	expression = re.sub(r"\\[dt]frac", r"\\frac", expression)
+	expression = re.sub(r"\\cdot|\\times", "*", expression)
+	# Spacing between two words or numbers is kept, "1 2" is not "12"
+	expression = re.sub(r"(?<=\w)\s+(?=\w)", " ", expression)
+	expression = re.sub(r"(?<!\w)\s+|\s+(?!\w)", "", expression)
+	
+	sides = []
+	for side in split_top_level(expression, "="):
+		terms = [
+			"*".join(sorted(split_top_level(term, "*")))
+			for term in split_top_level(side, "+-")
+		]
+		sides.append("+".join(sorted(terms)))
+	return "=".join(sides)
+
+def looks_like_formula(text):
+	return bool(re.search(r"[\\$=^+\-*/]|\d", text or ""))
+
+def grade_free_text_answer(flashcard, user_answer):
+	expected = flashcard.get("answer") or ""
+	if not expected or not llm_cache.normalize_answer(user_answer):
+		return None
+	
+	if normalize_text(user_answer) == normalize_text(expected):
+		return "exact", True, {}
+	# Differing only in case may be a typo or a different set, point or variable
+	if normalize_text(user_answer).casefold() == normalize_text(expected).casefold():
+		return None
+	
+	expected_parsed = parse_number(expected)
+	if expected_parsed is not None:
+		parsed = parse_number(user_answer)
+		if parsed is None:
+			return None
+		(variable, number), (expected_variable, expected_number) = parsed, expected_parsed
+		# "y = 4" for "x = 4" answers something else, or uses another name for the unknown
+		if variable and expected_variable and variable != expected_variable:
+			return None
+		is_correct = math.isclose(
+			number,
+			expected_number,
+			rel_tol=NUMERIC_RELATIVE_TOLERANCE,
+			abs_tol=NUMERIC_ABSOLUTE_TOLERANCE
+		)
+		return "numeric", is_correct, {}
+	
+	if looks_like_formula(expected) and normalize_expression(user_answer) == normalize_expression(expected):
+		return "symbolic", True, {}
+	
+	return None
+
+def parse_step_order(user_answer, steps):
+	"""
+	Read an ordering answer as a permutation of the steps
+	
+	The answer is either the step numbers as shown to the student ("2, 1, 3", "2 -> 1 -> 3")
+	or the step contents, one per line.
+	
+	Returns:
+		list: Indexes into steps in the order given by the student, None if the answer
+			is not a permutation of all steps
+	"""
+	answer = llm_cache.normalize_answer(user_answer)
+	if STEP_NUMBERS.fullmatch(answer):
+		order = [cint(number) - 1 for number in re.findall(r"\d+", answer)]
+	else:
+		contents = {normalize_text(step.get("step_content")).casefold(): index for index, step in enumerate(steps)}
+		lines = [
+			normalize_text(re.sub(r"^\s*(?:\d+\s*[.):]|[-*•])\s*", "", line)).casefold()
+			for line in (user_answer or "").splitlines() if line.strip()
+		]
+		if len(contents) != len(steps) or any(line not in contents for line in lines):
+			return None
+		order = [contents[line] for line in lines]
+	
+	if sorted(order) != list(range(len(steps))):
+		return None
+	return order
+
+def grade_ordering_answer(flashcard, user_answer):
+	steps = sorted(flashcard.get("ordering_steps_items") or [], key=lambda step: cint(step.get("correct_order")))
+	if not steps:
+		return None
+	
+	order = parse_step_order(user_answer, steps)
+	if order is None:
+		return None
+	
+	correct_positions = sum(1 for position, index in enumerate(order) if position == index)
+	first_error = next((position + 1 for position, index in enumerate(order) if position != index), None)
+	return "permutation", first_error is None, {
+		"correct_positions": correct_positions,
+		"first_error": first_error,
+		"steps": steps
+	}
+
+def get_fast_path_feedback(flashcard, method, is_correct, details):
+	"""Templated feedback for an answer graded by grade_answer_locally"""
+	if is_correct:
+		return {
+			"ai_feedback_what_was_correct": "Câu trả lời của bạn khớp với đáp án đúng.",
+			"ai_feedback_what_was_incorrect": "Không có phần nào chưa đúng.",
+			"ai_feedback_what_to_include": "Không cần bổ sung thêm."
+		}
+	
+	if method == "permutation":
+		correct_order = "\n".join(
+			f"{position}. {step.get('step_content')}" for position, step in enumerate(details["steps"], start=1)
+		)
 		return {
-			"ai_feedback_what_was_correct": "Chúng tôi gặp lỗi trong hệ thống phản hồi.",
-			"ai_feedback_what_was_incorrect": f"Chi tiết lỗi: {str(e)}",
-			"ai_feedback_what_to_include": "Vui lòng thử lại sau hoặc liên hệ hỗ trợ."
+			"ai_feedback_what_was_correct": (
+				f"Bạn đã đặt đúng vị trí {details['correct_positions']}/{len(details['steps'])} bước."
+			),
+			"ai_feedback_what_was_incorrect": f"Thứ tự bắt đầu sai từ bước thứ {details['first_error']}.",
+			"ai_feedback_what_to_include": f"Thứ tự đúng là:\n{correct_order}"
 		}
+	
+	return {
+		"ai_feedback_what_was_correct": "Bạn đã đưa ra một đáp số cụ thể.",
+		"ai_feedback_what_was_incorrect": f"Đáp số chưa đúng, đáp án đúng là {flashcard.get('answer')}.",
+		"ai_feedback_what_to_include": "Hãy kiểm tra lại từng bước tính toán để tìm ra chỗ sai."
+	}
+
+def grade_answer_locally(flashcard, user_answer):
+	"""
+	Grade an answer without the LLM when the result is certain
+	
+	Exact matches, equal numbers (with tolerance), formulas equal up to notation and term
+	order, and orderings given as a permutation of the steps are graded here. Different
+	numbers and wrong permutations are graded as incorrect, any other answer is ambiguous.
+	
+	Args:
+		flashcard (dict): Flashcard with flashcard_type, answer and ordering_steps_items
+		user_answer (str): User's answer
+		
+	Returns:
+		dict: method, is_correct and feedback (the three ai_feedback_* components),
+			or None when the answer has to be assessed by the LLM
+	"""
+	if flashcard.get("flashcard_type") == "Ordering Steps":
+		result = grade_ordering_answer(flashcard, user_answer)
+	else:
+		result = grade_free_text_answer(flashcard, user_answer)
+	
+	record_fast_grading(result[0] if result else "escalated")
+	if not result:
+		return None
+	
+	method, is_correct, details = result
+	return frappe._dict({
+		"method": method,
+		"is_correct": is_correct,
+		"feedback": get_fast_path_feedback(flashcard, method, is_correct, details)
+	})
+
+def record_fast_grading(outcome):
+	try:
+		frappe.cache().hincrby(get_fast_grading_stats_key(), outcome, 1)
+	except RedisError:
+		pass
+
+@frappe.whitelist()
+def get_fast_grading_stats():
+	"""
+	How many exam answers were graded without the LLM
+	
+	Returns:
+		dict: Counts per method, escalated count and short_circuit_ratio (0-1)
+	"""
+	frappe.only_for("System Manager")
+	
+	try:
+		# Raw read: the wrapped hgetall would prefix the key again and unpickle the counts
+		counters = {
+			field.decode(): int(count)
+			for field, count in redis.Redis.hgetall(frappe.cache(), get_fast_grading_stats_key()).items()
+		}
+	except RedisError as e:
+		frappe.logger().warning(f"Fast grading stats unavailable: {e}")
+		counters = {}
+	by_method = {method: counters.get(method, 0) for method in FAST_GRADING_METHODS}
+	graded_locally = sum(by_method.values())
+	escalated = counters.get("escalated", 0)
+	total = graded_locally + escalated
+	
+	return {
+		"by_method": by_method,
+		"graded_locally": graded_locally,
+		"escalated": escalated,
+		"short_circuit_ratio": round(graded_locally / total, 4) if total else 0
+	}
 
 @frappe.whitelist()
 def get_exam_attempt_time_by_month(year=None):
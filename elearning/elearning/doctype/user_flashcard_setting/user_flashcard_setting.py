@@ -6,6 +6,7 @@ import random
 from frappe.model.document import Document
 from frappe import _
 from datetime import datetime, timedelta
+from elearning.utils import srs_due_index
 
 def get_current_user():
     user = frappe.session.user
@@ -161,25 +162,16 @@ def reset_srs_progress_for_topic(topic_name):
     if not frappe.db.exists("Topics", topic_name):
         frappe.throw(_("Topic does not exist"))
     
-    # Get all flashcards for this topic
-    flashcards = frappe.get_all(
-        "Flashcard",
-        filters={"topic": topic_name},
-        fields=["name"]
-    )
+    # Delete SRS progress records of this topic in one statement
+    frappe.db.sql("""
+        DELETE progress FROM `tabUser SRS Progress` progress
+        INNER JOIN `tabFlashcard` flashcard ON flashcard.name = progress.flashcard
+        WHERE progress.user = %(user)s AND flashcard.topic = %(topic)s
+    """, {"user": user_id, "topic": topic_name})
+    deleted_count = frappe.db._cursor.rowcount
     
-    # Delete SRS progress records for these flashcards
-    deleted_count = 0
-    for flashcard in flashcards:
-        srs_progress_list = frappe.get_all(
-            "User SRS Progress",
-            filters={"user": user_id, "flashcard": flashcard.name},
-            fields=["name"]
-        )
-        
-        for progress in srs_progress_list:
-            frappe.delete_doc("User SRS Progress", progress.name, ignore_permissions=True)
-            deleted_count += 1
+    # The delete bypasses document hooks, rebuild the due index on the next read
+    frappe.db.after_commit.add(lambda: srs_due_index.invalidate_index(user_id))
     
     frappe.db.commit()
     
@@ -1,9 +1,557 @@
 # Copyright (c) 2025, Minh Quy and Contributors
 # See license.txt
 
-# import frappe
+import random
+import time
+from unittest.mock import patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, add_to_date, get_datetime, getdate, now_datetime
+
+from elearning.elearning.doctype.user_srs_progress.user_srs_progress import (
+	build_srs_review_queue,
+	forecast_srs_load,
+	get_default_srs_state,
+	get_due_srs_summary,
+	get_next_srs_state,
+	get_user_flashcard_setting,
+	update_srs_progress,
+	update_srs_progress_batch,
+	upsert_srs_progress,
+)
+from elearning.elearning.doctype.user_flashcard_setting.user_flashcard_setting import reset_srs_progress_for_topic
+from elearning.utils import srs_due_index, srs_scheduler
+from elearning.utils.indexes import COMPOSITE_INDEXES, UNIQUE_KEYS, create_indexes
+
+
+def create_topic(topic_name="SRS Test Topic"):
+	return frappe.get_doc({
+		"doctype": "Topics",
+		"topic_name": topic_name,
+		"is_active": 1
+	}).insert(ignore_permissions=True)
+
+
+def create_flashcard(topic, flashcard_type="Concept/Theorem/Formula", steps=None):
+	flashcard = frappe.get_doc({
+		"doctype": "Flashcard",
+		"topic": topic,
+		"flashcard_type": flashcard_type,
+		"question": f"Question {frappe.generate_hash(length=6)}",
+		"answer": "Answer"
+	})
+	for order, step in enumerate(steps or [], start=1):
+		flashcard.append("ordering_steps_items", {"step_content": step, "correct_order": order})
+	return flashcard.insert(ignore_permissions=True)
+
+
+def create_exam_attempt(user, topic, flashcards, self_assessment="Khá ổn"):
+	attempt = frappe.get_doc({
+		"doctype": "User Exam Attempt",
+		"user": user,
+		"topic": topic,
+		"start_time": now_datetime()
+	})
+	for flashcard in flashcards:
+		attempt.append("attempt_details", {
+			"flashcard": flashcard,
+			"user_answer": "",
+			"user_self_assessment": self_assessment
+		})
+	return attempt.insert(ignore_permissions=True)
+
+
+def create_srs_progress(user, flashcard, status, next_review, **values):
+	return frappe.get_doc({
+		"doctype": "User SRS Progress",
+		"user": user,
+		"flashcard": flashcard,
+		"status": status,
+		"interval_days": values.get("interval_days", 1),
+		"ease_factor": values.get("ease_factor", 2.5),
+		"repetitions": values.get("repetitions", 1),
+		"learning_step": values.get("learning_step", 0),
+		"last_review_timestamp": now_datetime(),
+		"next_review_timestamp": next_review
+	}).insert(ignore_permissions=True)
+
+
+def get_srs_review_cards_per_attempt(user_id, topic_name, user_settings):
+	"""Reference implementation: the original per-attempt loop of get_srs_review_cards"""
+	filters = {"topic": topic_name}
+	if user_settings.get("study_exam_flashcard_type_filter") != "All":
+		filters["flashcard_type"] = user_settings.get("study_exam_flashcard_type_filter")
+
+	exam_attempts = frappe.get_all("User Exam Attempt", filters={"user": user_id, "topic": topic_name}, fields=["name"])
+	if not exam_attempts:
+		return "no_exams"
+
+	assessed_flashcards = []
+	for attempt in exam_attempts:
+		assessed_flashcards.extend(frappe.get_all(
+			"User Exam Attempt Detail",
+			filters={"parent": attempt.name, "user_self_assessment": ["!=", ""]},
+			fields=["flashcard", "user_self_assessment"]
+		))
+	if not assessed_flashcards:
+		return "no_assessments"
+
+	filters["name"] = ["in", list(set([detail.flashcard for detail in assessed_flashcards]))]
+	all_flashcards = frappe.get_all(
+		"Flashcard",
+		filters=filters,
+		fields=["name", "question", "answer", "explanation", "flashcard_type", "hint", "solution_with_error"]
+	)
+	for flashcard in all_flashcards:
+		if flashcard.get("flashcard_type") == "Ordering Steps":
+			flashcard["ordering_steps_items"] = frappe.get_all(
+				"Ordering Step Item",
+				filters={"parent": flashcard.get("name")},
+				fields=["step_content", "correct_order"],
+				order_by="correct_order"
+			)
+
+	progress_map = {p.flashcard: p for p in frappe.get_all(
+		"User SRS Progress",
+		filters={"user": user_id, "flashcard": ["in", [card.name for card in all_flashcards]]},
+		fields=["flashcard", "status", "next_review_timestamp", "interval_days", "ease_factor", "repetitions", "learning_step"]
+	)}
+
+	now = now_datetime()
+	queues = {"new": [], "learning": [], "review": [], "lapsed": []}
+	total_counts = {"new": 0, "learning": 0, "review": 0, "lapsed": 0}
+	due_counts = {"new": 0, "learning": 0, "review": 0, "lapsed": 0}
+	for card in all_flashcards:
+		if card.name in progress_map:
+			progress = progress_map[card.name]
+			total_counts[progress.status] += 1
+			if get_datetime(progress.next_review_timestamp) <= now and progress.status != "new":
+				card_with_progress = card.copy()
+				card_with_progress.update({
+					"status": progress.status,
+					"interval_days": progress.interval_days,
+					"ease_factor": progress.ease_factor,
+					"repetitions": progress.repetitions,
+					"learning_step": progress.learning_step
+				})
+				queues[progress.status].append(card_with_progress)
+				due_counts[progress.status] += 1
+		else:
+			card_with_status = card.copy()
+			card_with_status["status"] = "new"
+			queues["new"].append(card_with_status)
+			total_counts["new"] += 1
+
+	random.shuffle(queues["new"])
+	due_counts["new"] = len(queues["new"])
+	if user_settings.get("flashcard_arrange_mode") == "random":
+		random.shuffle(queues["learning"])
+		random.shuffle(queues["review"])
+		random.shuffle(queues["lapsed"])
+
+	upcoming = frappe.db.count(
+		"User SRS Progress",
+		filters=[
+			["user", "=", user_id],
+			["flashcard", "in", [card.name for card in all_flashcards]],
+			["next_review_timestamp", ">", now],
+			["next_review_timestamp", "<=", add_days(now, 2)]
+		]
+	)
+
+	return {
+		"success": True,
+		"cards": queues["learning"] + queues["lapsed"] + queues["review"] + queues["new"],
+		"stats": {
+			**total_counts,
+			"total": sum(total_counts.values()),
+			"due": sum(due_counts.values()),
+			"upcoming": upcoming,
+			"current_review": due_counts
+		}
+	}
 
 
 class TestUserSRSProgress(FrappeTestCase):
-	pass
+	def setUp(self):
+		frappe.set_user("Administrator")
+		self.user = "Administrator"
+		self.topic = create_topic().name
+		srs_due_index.invalidate_index(self.user)
+
+	def tearDown(self):
+		frappe.db.rollback()
+		srs_due_index.invalidate_index(self.user)
+
+	def create_review_history(self):
+		now = now_datetime()
+		flashcards = [create_flashcard(self.topic).name for _ in range(6)]
+		flashcards.append(create_flashcard(self.topic, "Ordering Steps", ["Step A", "Step B", "Step C"]).name)
+
+		# Spread assessments over several attempts, with one card assessed twice
+		create_exam_attempt(self.user, self.topic, flashcards[:3])
+		create_exam_attempt(self.user, self.topic, flashcards[2:5])
+		create_exam_attempt(self.user, self.topic, flashcards[5:])
+
+		create_srs_progress(self.user, flashcards[0], "learning", add_to_date(now, hours=-1), interval_days=0.25)
+		create_srs_progress(self.user, flashcards[1], "review", add_to_date(now, days=-2), interval_days=3)
+		create_srs_progress(self.user, flashcards[2], "lapsed", add_to_date(now, minutes=-5), interval_days=0)
+		create_srs_progress(self.user, flashcards[3], "review", add_to_date(now, days=1), interval_days=3)
+		create_srs_progress(self.user, flashcards[6], "learning", add_to_date(now, hours=-3), learning_step=1)
+		return flashcards
+
+	def assert_matches_reference(self, user_settings, seed=7):
+		random.seed(seed)
+		expected = get_srs_review_cards_per_attempt(self.user, self.topic, user_settings)
+		random.seed(seed)
+		actual = build_srs_review_queue(self.user, self.topic, user_settings)
+		self.assertEqual(actual, expected)
+
+	def test_review_queue_matches_per_attempt_implementation(self):
+		self.create_review_history()
+		user_settings = get_user_flashcard_setting(self.user, self.topic)
+
+		self.assert_matches_reference(user_settings)
+		self.assert_matches_reference({**user_settings, "flashcard_arrange_mode": "random"})
+		self.assert_matches_reference({**user_settings, "study_exam_flashcard_type_filter": "Ordering Steps"})
+
+	def test_review_queue_attaches_ordering_steps(self):
+		self.create_review_history()
+		queue = build_srs_review_queue(self.user, self.topic, get_user_flashcard_setting(self.user, self.topic))
+
+		ordering_cards = [card for card in queue["cards"] if card.flashcard_type == "Ordering Steps"]
+		self.assertEqual(len(ordering_cards), 1)
+		self.assertEqual(
+			[step.step_content for step in ordering_cards[0]["ordering_steps_items"]],
+			["Step A", "Step B", "Step C"]
+		)
+
+	def test_review_queue_empty_states(self):
+		user_settings = get_user_flashcard_setting(self.user, self.topic)
+		self.assertTrue(build_srs_review_queue(self.user, self.topic, user_settings).get("no_exams"))
+
+		frappe.get_doc({
+			"doctype": "User Exam Attempt",
+			"user": self.user,
+			"topic": self.topic,
+			"start_time": now_datetime()
+		}).insert(ignore_permissions=True)
+		self.assertTrue(build_srs_review_queue(self.user, self.topic, user_settings).get("no_assessments"))
+
+	def test_review_queue_query_count_is_constant(self):
+		flashcards = self.create_review_history()
+		user_settings = get_user_flashcard_setting(self.user, self.topic)
+
+		for _ in range(10):
+			create_exam_attempt(self.user, self.topic, flashcards)
+
+		# Cold content cache: flashcards and ordering steps are loaded once
+		with self.assertQueryCount(4):
+			build_srs_review_queue(self.user, self.topic, user_settings)
+
+		with self.assertQueryCount(2):
+			build_srs_review_queue(self.user, self.topic, user_settings)
+
+	def test_due_summary_splits_due_and_upcoming(self):
+		now = now_datetime()
+		flashcards = [create_flashcard(self.topic).name for _ in range(4)]
+		create_srs_progress(self.user, flashcards[0], "review", add_to_date(now, days=-1))
+		create_srs_progress(self.user, flashcards[1], "learning", add_to_date(now, hours=-2))
+		create_srs_progress(self.user, flashcards[2], "review", add_to_date(now, days=1))
+		create_srs_progress(self.user, flashcards[3], "review", add_to_date(now, days=10))
+
+		summary = get_due_srs_summary()
+		topic = next(topic for topic in summary["topics"] if topic["topic_id"] == self.topic)
+
+		self.assertEqual(topic["due_count"], 2)
+		self.assertEqual(topic["upcoming_count"], 1)
+		self.assertEqual([card["is_due"] for card in topic["cards"]], [True, True, False])
+		self.assertEqual(topic["topic_name"], "SRS Test Topic")
+
+	def test_due_index_moves_cards_by_score_range(self):
+		now = now_datetime()
+		flashcard = create_flashcard(self.topic).name
+		create_srs_progress(self.user, flashcard, "review", add_to_date(now, days=1))
+
+		cards = srs_due_index.get_due_cards(self.user, now, add_days(now, 2))[self.topic]
+		self.assertEqual((len(cards["due"]), len(cards["upcoming"])), (0, 1))
+
+		# Once the index is built, later reads never touch the progress table
+		later = add_to_date(now, days=1, minutes=1)
+		with self.assertQueryCount(0):
+			cards = srs_due_index.get_due_cards(self.user, later, add_days(later, 2))[self.topic]
+		self.assertEqual((len(cards["due"]), len(cards["upcoming"])), (1, 0))
+
+	def test_due_index_follows_progress_updates(self):
+		now = now_datetime()
+		flashcard = create_flashcard(self.topic).name
+		progress = create_srs_progress(self.user, flashcard, "review", add_to_date(now, days=1))
+		srs_due_index.get_due_cards(self.user, now, add_days(now, 2))
+
+		progress.next_review_timestamp = add_to_date(now, hours=-1)
+		progress.save(ignore_permissions=True)
+		frappe.db.after_commit.run()
+
+		# The index was updated in place, not rebuilt from the progress table
+		with self.assertQueryCount(0):
+			cards = srs_due_index.get_due_cards(self.user, now, add_days(now, 2))[self.topic]
+		self.assertEqual([card.flashcard for card in cards["due"]], [flashcard])
+		self.assertFalse(cards["upcoming"])
+
+	def test_due_and_upcoming_windows_are_disjoint(self):
+		now = now_datetime()
+		flashcards = [create_flashcard(self.topic).name for _ in range(5)]
+		offsets = [{"days": -3}, {"hours": -1}, {"hours": 5}, {"days": 1}, {"days": 5}]
+		for flashcard, offset in zip(flashcards, offsets):
+			create_srs_progress(self.user, flashcard, "review", add_to_date(now, **offset))
+		create_exam_attempt(self.user, self.topic, flashcards)
+		upcoming_date = add_days(now, 2)
+
+		def assert_disjoint(topic_cards):
+			cards = topic_cards[self.topic]
+			due = {card.flashcard for card in cards["due"]}
+			upcoming = {card.flashcard for card in cards["upcoming"]}
+			self.assertFalse(due & upcoming)
+			self.assertEqual(due, set(flashcards[:2]))
+			self.assertEqual(upcoming, set(flashcards[2:4]))
+
+		# Redis index and the table fallback agree on both windows
+		assert_disjoint(srs_due_index.get_due_cards(self.user, now, upcoming_date))
+		assert_disjoint(srs_due_index.get_due_cards_from_rows(
+			srs_due_index.get_progress_rows(self.user, end=upcoming_date), now, upcoming_date
+		))
+
+		upcoming_rows = srs_due_index.get_progress_rows(self.user, start=now, end=upcoming_date)
+		self.assertEqual({row.flashcard for row in upcoming_rows}, set(flashcards[2:4]))
+
+		stats = build_srs_review_queue(self.user, self.topic, get_user_flashcard_setting(self.user, self.topic))["stats"]
+		self.assertEqual(stats["due"], 2)
+		self.assertEqual(stats["upcoming"], 2)
+
+		summary = get_due_srs_summary()
+		self.assertEqual((summary["due_count"], summary["upcoming_count"], summary["total_count"]), (2, 2, 4))
+
+	def test_progress_has_user_next_review_index(self):
+		indexes = frappe.db.sql("SHOW INDEX FROM `tabUser SRS Progress`", as_dict=True)
+		columns = [index.Column_name for index in indexes if index.Key_name == "user_next_review_timestamp_index"]
+		self.assertEqual(columns, ["user", "next_review_timestamp"])
+
+	def test_composite_indexes_are_created(self):
+		create_indexes()
+
+		registered = [
+			(doctype, "_".join(fields) + "_index", fields)
+			for doctype, field_lists in COMPOSITE_INDEXES.items() for fields in field_lists
+		] + [
+			(doctype, "unique_" + "_".join(fields), fields)
+			for doctype, field_lists in UNIQUE_KEYS.items() for fields in field_lists
+		]
+		for doctype, index_name, fields in registered:
+			indexes = frappe.db.sql(f"SHOW INDEX FROM `tab{doctype}`", as_dict=True)
+			columns = [index.Column_name for index in indexes if index.Key_name == index_name]
+			self.assertEqual(columns, fields, f"{index_name} missing on {doctype}")
+
+		plan = frappe.db.sql("""
+			EXPLAIN SELECT name FROM `tabUser SRS Progress`
+			WHERE user = %s AND flashcard = %s
+		""", (self.user, "FLCD-00001"), as_dict=True)
+		self.assertIn("unique_user_flashcard", plan[0].possible_keys or "")
+
+	def test_progress_is_unique_per_user_and_flashcard(self):
+		flashcard = create_flashcard(self.topic).name
+		create_srs_progress(self.user, flashcard, "review", now_datetime())
+
+		with self.assertRaises(frappe.UniqueValidationError):
+			create_srs_progress(self.user, flashcard, "learning", now_datetime())
+
+	def test_concurrent_first_reviews_do_not_fork_schedule(self):
+		flashcard = create_flashcard(self.topic).name
+		now = now_datetime()
+		srs_due_index.get_due_cards(self.user, now, add_days(now, 30))
+
+		# Two requests that both saw no progress row and compute a schedule independently
+		for rating in ("good", "easy"):
+			state = frappe._dict(get_default_srs_state(now), name=None, flashcard=flashcard)
+			state.update(get_next_srs_state(state, rating, now))
+			upsert_srs_progress(self.user, [state])
+		frappe.db.after_commit.run()
+
+		rows = frappe.get_all(
+			"User SRS Progress",
+			filters={"user": self.user, "flashcard": flashcard},
+			fields=["name", "status", "next_review_timestamp"]
+		)
+		self.assertEqual(len(rows), 1)
+		self.assertEqual(rows[0].status, "review")
+
+		# The index holds the card once, under the name of the stored row
+		cards = srs_due_index.get_due_cards(self.user, now, add_days(now, 30))[self.topic]
+		self.assertEqual([card.name for card in cards["due"] + cards["upcoming"]], [rows[0].name])
+
+	def test_single_rating_query_count(self):
+		flashcard = create_flashcard(self.topic).name
+		create_srs_progress(self.user, flashcard, "review", now_datetime())
+
+		# Flashcard lookup, state read, upsert and commit
+		with self.assertQueryCount(5):
+			update_srs_progress(flashcard, "good")
+
+	def test_reset_deletes_topic_progress_in_one_statement(self):
+		other_topic = create_topic("SRS Reset Other Topic").name
+		flashcards = [create_flashcard(self.topic).name for _ in range(3)]
+		other_flashcard = create_flashcard(other_topic).name
+		for flashcard in flashcards + [other_flashcard]:
+			create_srs_progress(self.user, flashcard, "review", now_datetime())
+
+		result = reset_srs_progress_for_topic(self.topic)
+
+		self.assertEqual(result["deleted_count"], 3)
+		self.assertFalse(frappe.db.exists("User SRS Progress", {"user": self.user, "flashcard": ["in", flashcards]}))
+		self.assertTrue(frappe.db.exists("User SRS Progress", {"user": self.user, "flashcard": other_flashcard}))
+
+	def test_batch_rating_matches_single_card_endpoint(self):
+		flashcards = [create_flashcard(self.topic).name for _ in range(2)]
+		create_srs_progress(self.user, flashcards[1], "review", now_datetime(), interval_days=4, repetitions=3)
+		ratings = [
+			(flashcards[0], "good"),
+			(flashcards[1], "hard"),
+			(flashcards[0], "good"),
+			(flashcards[1], "wrong"),
+			(flashcards[0], "easy")
+		]
+		reviewed_at = get_datetime("2025-06-01 08:00:00")
+
+		with patch(
+			"elearning.elearning.doctype.user_srs_progress.user_srs_progress.now_datetime",
+			return_value=reviewed_at
+		):
+			savepoint = "before_single_card_reviews"
+			frappe.db.savepoint(savepoint)
+			expected = [update_srs_progress(flashcard, rating) for flashcard, rating in ratings]
+			frappe.db.rollback(save_point=savepoint)
+
+		result = update_srs_progress_batch([[flashcard, rating, reviewed_at] for flashcard, rating in ratings])
+
+		self.assertEqual(result["results"], expected)
+		self.assertEqual(frappe.db.count("User SRS Progress", {"user": self.user, "flashcard": ["in", flashcards]}), 2)
+		self.assertEqual(
+			frappe.db.get_value("User SRS Progress", {"user": self.user, "flashcard": flashcards[1]}, "status"),
+			"lapsed"
+		)
+
+	def test_batch_rating_reports_missing_flashcards(self):
+		flashcard = create_flashcard(self.topic).name
+		result = update_srs_progress_batch([
+			{"flashcard": "FLCD-MISSING", "rating": "good"},
+			{"flashcard": flashcard, "rating": "easy"}
+		])
+
+		self.assertFalse(result["results"][0]["success"])
+		self.assertEqual(result["results"][1]["progress"]["status"], "review")
+
+	def test_batch_rating_query_count_is_constant(self):
+		flashcards = [create_flashcard(self.topic).name for _ in range(20)]
+		for flashcard in flashcards[:10]:
+			create_srs_progress(self.user, flashcard, "review", now_datetime())
+
+		# Names of the new rows are read back once after the upsert
+		with self.assertQueryCount(9):
+			update_srs_progress_batch([[flashcard, "good"] for flashcard in flashcards])
+
+	def test_forecast_histograms_scheduled_reviews(self):
+		start_of_today = get_datetime(getdate())
+		flashcards = [create_flashcard(self.topic).name for _ in range(4)]
+		create_srs_progress(self.user, flashcards[0], "review", add_days(start_of_today, -3))
+		create_srs_progress(self.user, flashcards[1], "review", add_to_date(start_of_today, days=1, hours=12))
+		create_srs_progress(self.user, flashcards[2], "review", add_to_date(start_of_today, days=3, hours=12))
+		create_srs_progress(self.user, flashcards[3], "review", add_days(start_of_today, 40))
+
+		forecast = forecast_srs_load(days=7)
+
+		self.assertEqual(forecast["mode"], "scheduled")
+		self.assertEqual([day["total"] for day in forecast["days"]], [1, 1, 0, 1, 0, 0, 0])
+		self.assertEqual(forecast["days"][1]["topics"], {self.topic: 1})
+		self.assertEqual(forecast["topics"][0]["topic_id"], self.topic)
+
+	def test_simulated_forecast_counts_repeat_reviews(self):
+		flashcard = create_flashcard(self.topic).name
+		create_srs_progress(self.user, flashcard, "learning", now_datetime(), interval_days=0, repetitions=0)
+
+		forecast = forecast_srs_load(days=30, simulate=1, expected_ratings={"good": 1})
+
+		# good -> 6 hours, good -> 1 day, then growing review intervals
+		self.assertEqual(forecast["mode"], "simulated")
+		self.assertGreater(forecast["total"], 2)
+
+
+class TestSRSScheduler(FrappeTestCase):
+	def random_states(self, count, seed=11):
+		rng = random.Random(seed)
+		return {
+			"statuses": [rng.choice(["new", "learning", "review", "lapsed"]) for _ in range(count)],
+			"interval_days": [rng.choice([0, 0.25, 0.5, 1, 3, rng.uniform(0, 365)]) for _ in range(count)],
+			"ease_factors": [rng.uniform(1.3, 3.2) for _ in range(count)],
+			"repetitions": [rng.randint(0, 6) for _ in range(count)],
+			"learning_steps": [rng.randint(0, 2) for _ in range(count)],
+			"ratings": [rng.choice(["wrong", "again", "hard", "correct", "good", "easy"]) for _ in range(count)]
+		}
+
+	def test_batched_path_is_bit_identical_to_scalar_path(self):
+		import numpy as np
+
+		states = self.random_states(5000)
+		scalar = [srs_scheduler.next_state(*card) for card in zip(*states.values())]
+		batched = srs_scheduler.next_states(**states)
+
+		self.assertEqual(srs_scheduler.decode_statuses(batched["status"]), [card["status"] for card in scalar])
+		for field in ("interval_days", "ease_factor", "repetitions", "learning_step"):
+			expected = np.array([card[field] for card in scalar], dtype=batched[field].dtype)
+			self.assertEqual(expected.tobytes(), batched[field].tobytes(), field)
+
+		self.assertEqual(
+			srs_scheduler.get_review_offsets_seconds(batched["interval_days"]).tolist(),
+			[srs_scheduler.get_review_offset_seconds(card["interval_days"]) for card in scalar]
+		)
+
+	def test_learning_cards_graduate_after_two_passes(self):
+		state = srs_scheduler.next_state("new", 0, 2.5, 0, 0, "good")
+		self.assertEqual((state["status"], state["interval_days"]), ("learning", 0.25))
+
+		state = srs_scheduler.next_state(state["status"], state["interval_days"], state["ease_factor"],
+			state["repetitions"], state["learning_step"], "good")
+		self.assertEqual((state["status"], state["interval_days"], state["repetitions"]), ("review", 1.0, 1))
+
+	def test_failed_review_lapses_card(self):
+		state = srs_scheduler.next_state("review", 12, 2.4, 4, 0, "wrong")
+		self.assertEqual(state, {
+			"status": "lapsed",
+			"interval_days": 0.0,
+			"ease_factor": 2.4,
+			"repetitions": 0,
+			"learning_step": 0
+		})
+
+	def test_simulation_is_fast_for_large_decks(self):
+		import numpy as np
+
+		rng = np.random.default_rng(0)
+		count = 10000
+		arguments = {
+			"statuses": rng.integers(0, 4, count),
+			"interval_days": rng.uniform(0, 60, count),
+			"ease_factors": rng.uniform(1.3, 3, count),
+			"repetitions": rng.integers(0, 5, count),
+			"learning_steps": rng.integers(0, 2, count),
+			"review_offsets": rng.integers(0, 40 * 86400, count),
+			"groups": rng.integers(0, 10, count),
+			"group_count": 10,
+			"days": 30
+		}
+
+		started = time.perf_counter()
+		counts = srs_scheduler.simulate_review_load(**arguments)
+		elapsed = time.perf_counter() - started
+
+		self.assertEqual(counts.shape, (30, 10))
+		self.assertLess(elapsed, 0.1)
@@ -4,16 +4,26 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import now_datetime, add_days, getdate, get_datetime
+from frappe.utils import now_datetime, add_days, getdate, get_datetime, cint, flt
 from datetime import datetime, timedelta
 import random
 import math
+import json
+from elearning.utils import bulk, flashcard_cache, srs_due_index, srs_scheduler
 
 class UserSRSProgress(Document):
     def before_save(self):
         """Validate before saving"""
         self.validate_user_flashcard()
     
+    def on_update(self):
+        """Keep the due-card index in sync with the schedule"""
+        srs_due_index.update_card(self.user, self.name, self.flashcard, self.next_review_timestamp)
+    
+    def on_trash(self):
+        """Drop the card from the due-card index"""
+        srs_due_index.remove_card(self.user, self.name, self.flashcard)
+    
     def validate_user_flashcard(self):
         """Ensure user and flashcard exist"""
         if not frappe.db.exists("User", self.user):
@@ -42,30 +52,10 @@ def get_due_srs_summary():
     upcoming_days = 2  # Hiển thị thẻ sắp đến hạn trong 2 ngày tới
     upcoming_date = add_days(now, upcoming_days)
     
-    # Get all SRS progress records that are due now
-    due_records = frappe.get_all(
-        "User SRS Progress",
-        filters={
-            "user": user_id,
-            "next_review_timestamp": ["<=", now]
-        },
-        fields=["name", "flashcard", "next_review_timestamp"]
-    )
+    # Due and upcoming cards come from the materialized per-topic index
+    topic_cards = srs_due_index.get_due_cards(user_id, now, upcoming_date)
     
-    # Get upcoming SRS progress records
-    upcoming_records = frappe.get_all(
-        "User SRS Progress",
-        filters={
-            "user": user_id,
-            "next_review_timestamp": [">", now],
-            "next_review_timestamp": ["<=", upcoming_date]
-        },
-        fields=["name", "flashcard", "next_review_timestamp"]
-    )
-    
-    all_records = due_records + upcoming_records
-    
-    if not all_records:
+    if not topic_cards:
         return {
             "success": True,
             "due_count": 0,
@@ -74,63 +64,35 @@ def get_due_srs_summary():
             "topics": []
         }
     
-    # Get flashcard details to group by topic
-    flashcard_names = [record.flashcard for record in all_records]
-    
-    flashcard_topics = frappe.get_all(
-        "Flashcard",
-        filters={"name": ["in", flashcard_names]},
-        fields=["name", "topic"]
-    )
-    
-    # Create a map of flashcard to topic
-    flashcard_to_topic = {fc.name: fc.topic for fc in flashcard_topics}
-    
-    # Group by topic
-    topic_data = {}
-    for record in all_records:
-        topic = flashcard_to_topic.get(record.flashcard)
-        if not topic:
-            continue
-            
-        if topic not in topic_data:
-            topic_data[topic] = {
-                "due_count": 0,
-                "upcoming_count": 0,
-                "cards": []
-            }
-            
-        # Determine if it's due now or upcoming
-        is_due = record.next_review_timestamp <= now
-        
-        if is_due:
-            topic_data[topic]["due_count"] += 1
-        else:
-            topic_data[topic]["upcoming_count"] += 1
-            
-        topic_data[topic]["cards"].append({
-            "id": record.name,
-            "flashcard": record.flashcard,
-            "next_review": record.next_review_timestamp,
-            "is_due": is_due
-        })
-    
     # Get topic names
-    topic_names = {}
-    for topic_id in topic_data.keys():
-        topic_name = frappe.db.get_value("Topics", topic_id, "topic_name")
-        topic_names[topic_id] = topic_name
+    topic_names = {
+        topic.name: topic.topic_name
+        for topic in frappe.get_all(
+            "Topics",
+            filters={"name": ["in", list(topic_cards.keys())]},
+            fields=["name", "topic_name"]
+        )
+    }
     
     # Format response
     topics = []
-    for topic_id, data in topic_data.items():
+    for topic_id, cards in topic_cards.items():
         topics.append({
             "topic_id": topic_id,
             "topic_name": topic_names.get(topic_id, "Unknown Topic"),
-            "due_count": data["due_count"],
-            "upcoming_count": data["upcoming_count"],
-            "total_count": data["due_count"] + data["upcoming_count"],
-            "cards": sorted(data["cards"], key=lambda x: x["next_review"])
+            "due_count": len(cards["due"]),
+            "upcoming_count": len(cards["upcoming"]),
+            "total_count": len(cards["due"]) + len(cards["upcoming"]),
+            "cards": [
+                {
+                    "id": record.name,
+                    "flashcard": record.flashcard,
+                    "next_review": record.next_review_timestamp,
+                    "is_due": is_due
+                }
+                for is_due, records in ((True, cards["due"]), (False, cards["upcoming"]))
+                for record in records
+            ]
         })
     
     # Sort by total count (highest first)
@@ -169,111 +131,84 @@ def get_srs_review_cards(topic_name):
     # Get user flashcard settings
     user_settings = get_user_flashcard_setting(user_id, topic_name)
     
-    # Get all flashcards for this topic
-    filters = {"topic": topic_name}
+    return build_srs_review_queue(user_id, topic_name, user_settings)
+
+def build_srs_review_queue(user_id, topic_name, user_settings):
+    """
+    Build the categorized SRS review queue for a user and topic
     
-    # Apply flashcard type filter if specified
-    if user_settings.get("study_exam_flashcard_type_filter") != "All":
-        filters["flashcard_type"] = user_settings.get("study_exam_flashcard_type_filter")
+    Uses a fixed number of queries regardless of how many exam attempts or
+    flashcards the user has: one summary query over the user's attempts and one
+    joined query for assessed flashcards with their SRS progress. Flashcard content
+    and ordering steps come from the topic content cache.
     
-    # Get all exam attempts for this topic and user
-    exam_attempts = frappe.get_all(
-        "User Exam Attempt", 
-        filters={"user": user_id, "topic": topic_name},
-        fields=["name"]
-    )
+    Args:
+        user_id (str): User ID
+        topic_name (str): Topic name
+        user_settings (dict): User flashcard settings for the topic
+        
+    Returns:
+        dict: List of flashcards to review and stats
+    """
+    # Count exam attempts and self-assessed details in one pass
+    attempt_summary = frappe.db.sql("""
+        SELECT
+            COUNT(DISTINCT attempt.name) AS attempt_count,
+            COUNT(detail.name) AS assessed_count
+        FROM `tabUser Exam Attempt` attempt
+        LEFT JOIN `tabUser Exam Attempt Detail` detail
+            ON detail.parent = attempt.name
+            AND detail.user_self_assessment != ''
+        WHERE attempt.user = %(user)s
+        AND attempt.topic = %(topic)s
+    """, {"user": user_id, "topic": topic_name}, as_dict=True)[0]
     
     # If there are no exam attempts, return empty list with a specific message
-    if not exam_attempts:
-        return {
-            "success": True,
-            "cards": [],
-            "stats": {
-                "new": 0,
-                "learning": 0,
-                "review": 0,
-                "lapsed": 0,
-                "total": 0,
-                "due": 0,
-                "current_review": {
-                    "new": 0,
-                    "learning": 0,
-                    "review": 0,
-                    "lapsed": 0
-                }
-            },
-            "no_exams": True,
-            "message": _("No exam attempts found. Please complete some flashcards in Exam Mode first.")
-        }
-    
-    # Get all self-assessed flashcards from exam attempts
-    assessed_flashcards = []
-    for attempt in exam_attempts:
-        details = frappe.get_all(
-            "User Exam Attempt Detail",
-            filters={
-                "parent": attempt.name,
-                "user_self_assessment": ["!=", ""]  # Only include assessed cards
-            },
-            fields=["flashcard", "user_self_assessment"]
+    if not attempt_summary.attempt_count:
+        return get_empty_review_queue(
+            "no_exams",
+            _("No exam attempts found. Please complete some flashcards in Exam Mode first.")
         )
-        assessed_flashcards.extend(details)
     
     # If no self-assessed flashcards, return empty list with message
-    if not assessed_flashcards:
-        return {
-            "success": True,
-            "cards": [],
-            "stats": {
-                "new": 0,
-                "learning": 0,
-                "review": 0,
-                "lapsed": 0,
-                "total": 0,
-                "due": 0,
-                "current_review": {
-                    "new": 0,
-                    "learning": 0,
-                    "review": 0,
-                    "lapsed": 0
-                }
-            },
-            "no_assessments": True,
-            "message": _("No self-assessed flashcards found. Please complete and assess flashcards in Exam Mode first.")
-        }
-    
-    # Get unique flashcard names from assessed cards
-    assessed_flashcard_names = list(set([detail.flashcard for detail in assessed_flashcards]))
-    
-    # Add filter to only include assessed flashcards
-    filters["name"] = ["in", assessed_flashcard_names]
-    
-    all_flashcards = frappe.get_all(
-        "Flashcard", 
-        filters=filters,
-        fields=["name", "question", "answer", "explanation", "flashcard_type", "hint", "solution_with_error"]
-    )
-    
-    # Process additional data for specific flashcard types
-    for flashcard in all_flashcards:
-        if flashcard.get("flashcard_type") == "Ordering Steps":
-            ordering_steps = frappe.get_all(
-                "Ordering Step Item",
-                filters={"parent": flashcard.get("name")},
-                fields=["step_content", "correct_order"],
-                order_by="correct_order"
-            )
-            flashcard["ordering_steps_items"] = ordering_steps
-    
-    # Get all progress records for these flashcards
-    existing_progress = frappe.get_all(
-        "User SRS Progress",
-        filters={"user": user_id, "flashcard": ["in", [card.name for card in all_flashcards]]},
-        fields=["flashcard", "status", "next_review_timestamp", "interval_days", "ease_factor", "repetitions", "learning_step"]
-    )
+    if not attempt_summary.assessed_count:
+        return get_empty_review_queue(
+            "no_assessments",
+            _("No self-assessed flashcards found. Please complete and assess flashcards in Exam Mode first.")
+        )
     
-    # Create a map for easier access
-    progress_map = {p.flashcard: p for p in existing_progress}
+    # Assessed flashcards of the topic joined with the user's progress
+    rows = frappe.db.sql("""
+        SELECT
+            assessed.flashcard,
+            progress.status, progress.next_review_timestamp, progress.interval_days,
+            progress.ease_factor, progress.repetitions, progress.learning_step
+        FROM (
+            SELECT DISTINCT detail.flashcard
+            FROM `tabUser Exam Attempt Detail` detail
+            INNER JOIN `tabUser Exam Attempt` attempt ON attempt.name = detail.parent
+            WHERE attempt.user = %(user)s
+            AND attempt.topic = %(topic)s
+            AND detail.user_self_assessment != ''
+        ) assessed
+        LEFT JOIN `tabUser SRS Progress` progress
+            ON progress.flashcard = assessed.flashcard
+            AND progress.user = %(user)s
+    """, {"user": user_id, "topic": topic_name}, as_dict=True)
+    
+    assessed_flashcards = {row.flashcard for row in rows}
+    progress_map = {row.flashcard: row for row in rows if row.status}
+    
+    # Flashcard content comes from the topic content cache, newest first, with the type filter applied
+    all_flashcards = [
+        card for card in flashcard_cache.get_topic_flashcards(
+            topic_name,
+            user_settings.get("study_exam_flashcard_type_filter"),
+            fields=["name", "question", "answer", "explanation", "flashcard_type", "hint", "solution_with_error"],
+            newest_first=True
+        )
+        if card.name in assessed_flashcards
+    ]
     
     # Categorize cards
     now = now_datetime()
@@ -298,11 +233,19 @@ def get_srs_review_cards(topic_name):
         "lapsed": 0
     }
     
+    # Check for upcoming cards in the next 2 days
+    upcoming_days = 2
+    upcoming_date = add_days(now, upcoming_days)
+    upcoming_cards_count = 0
+    
     for card in all_flashcards:
         if card.name in progress_map:
             progress = progress_map[card.name]
             total_counts[progress.status] += 1
             
+            if srs_due_index.get_review_window(progress.next_review_timestamp, now, upcoming_date) == "upcoming":
+                upcoming_cards_count += 1
+            
             # Check if due for review
             if get_datetime(progress.next_review_timestamp) <= now:
                 card_with_progress = card.copy()
@@ -347,21 +290,6 @@ def get_srs_review_cards(topic_name):
     # Total cards due
     total_due = sum(due_counts.values())
     
-    # Check for upcoming cards in the next 2 days
-    upcoming_days = 2
-    upcoming_date = add_days(now, upcoming_days)
-    
-    # Get count of upcoming cards 
-    upcoming_cards_count = frappe.db.count(
-        "User SRS Progress",
-        filters={
-            "user": user_id,
-            "flashcard": ["in", [card.name for card in all_flashcards]],
-            "next_review_timestamp": [">", now],
-            "next_review_timestamp": ["<=", upcoming_date]
-        }
-    )
-    
     # Return stats and cards
     return {
         "success": True,
@@ -375,6 +303,49 @@ def get_srs_review_cards(topic_name):
         }
     }
 
+def get_empty_review_queue(reason, message):
+    """
+    Build the empty review queue response returned when there is nothing to review
+    
+    Args:
+        reason (str): Response flag explaining why the queue is empty (e.g. "no_exams")
+        message (str): Message shown to the user
+        
+    Returns:
+        dict: Empty list of flashcards with zeroed stats
+    """
+    return {
+        "success": True,
+        "cards": [],
+        "stats": {
+            "new": 0,
+            "learning": 0,
+            "review": 0,
+            "lapsed": 0,
+            "total": 0,
+            "due": 0,
+            "current_review": {
+                "new": 0,
+                "learning": 0,
+                "review": 0,
+                "lapsed": 0
+            }
+        },
+        reason: True,
+        "message": message
+    }
+
+# Fields written when a review is applied to a User SRS Progress record
+SRS_STATE_FIELDS = [
+    "status",
+    "interval_days",
+    "ease_factor",
+    "repetitions",
+    "learning_step",
+    "last_review_timestamp",
+    "next_review_timestamp"
+]
+
 @frappe.whitelist()
 def update_srs_progress(flashcard_name, user_rating):
     """
@@ -390,37 +361,208 @@ def update_srs_progress(flashcard_name, user_rating):
     user_id = get_current_user()
     
     # Check if flashcard exists
-    if not frappe.db.exists("Flashcard", flashcard_name):
+    flashcard = frappe.db.get_value("Flashcard", flashcard_name, ["name", "topic"], as_dict=True)
+    if not flashcard:
         frappe.throw(_("Flashcard does not exist"))
     
-    # Map user ratings to internal ratings
-    rating_map = {
-        "wrong": "again",  # User got it wrong
-        "again": "again",  # User got it wrong
-        "hard": "hard",    # Remembered with difficulty
-        "correct": "good", # User got it right
-        "good": "good",    # User got it right
-        "easy": "easy"     # User got it perfectly
+    # Get current timestamp
+    now = now_datetime()
+    
+    # Find existing progress or start from the default state
+    state = frappe.db.get_value(
+        "User SRS Progress",
+        {"user": user_id, "flashcard": flashcard_name},
+        ["name", "flashcard"] + SRS_STATE_FIELDS,
+        as_dict=True
+    )
+    if not state:
+        state = frappe._dict(get_default_srs_state(now), name=None, flashcard=flashcard_name)
+    
+    # Update based on the SM-2 algorithm and card status
+    state.update(get_next_srs_state(state, user_rating, now))
+    
+    upsert_srs_progress(user_id, [state], {flashcard_name: flashcard.topic})
+    frappe.db.commit()
+    
+    return get_srs_progress_response(state)
+
+@frappe.whitelist()
+def update_srs_progress_batch(ratings):
+    """
+    Apply many SRS ratings in one request, e.g. a whole review session synced by an offline client
+    
+    All affected progress records are loaded with one query, the ratings are applied
+    in order in memory and the results are written with one bulk upsert and one commit.
+    
+    Args:
+        ratings (list|str): Ordered list (or JSON list) of entries, each either
+            {"flashcard": ..., "rating": ..., "reviewed_at": ...} or [flashcard, rating, reviewed_at].
+            reviewed_at is optional and defaults to the current time.
+        
+    Returns:
+        dict: One result per entry, in input order, shaped like the update_srs_progress response
+    """
+    user_id = get_current_user()
+    
+    if isinstance(ratings, str):
+        try:
+            ratings = json.loads(ratings)
+        except ValueError:
+            frappe.throw(_("Invalid ratings format"))
+    
+    if not isinstance(ratings, list):
+        frappe.throw(_("Invalid ratings format"))
+    
+    entries = [parse_rating_entry(entry) for entry in ratings]
+    flashcard_names = list({entry.flashcard for entry in entries if entry.flashcard})
+    
+    if not flashcard_names:
+        return {"success": True, "results": []}
+    
+    # Check which flashcards exist
+    flashcard_topics = {
+        flashcard.name: flashcard.topic
+        for flashcard in frappe.get_all(
+            "Flashcard",
+            filters={"name": ["in", flashcard_names]},
+            fields=["name", "topic"]
+        )
     }
     
-    # Standardize the rating
-    internal_rating = rating_map.get(user_rating, "again")
+    # Load all affected progress records at once
+    states = {}
+    if flashcard_topics:
+        for row in frappe.get_all(
+            "User SRS Progress",
+            filters={"user": user_id, "flashcard": ["in", list(flashcard_topics)]},
+            fields=["name", "flashcard"] + SRS_STATE_FIELDS
+        ):
+            states.setdefault(row.flashcard, row)
+    
+    results = []
+    changed_flashcards = []
+    for entry in entries:
+        if entry.flashcard not in flashcard_topics:
+            results.append({
+                "success": False,
+                "flashcard": entry.flashcard,
+                "message": _("Flashcard does not exist")
+            })
+            continue
+        
+        reviewed_at = get_datetime(entry.reviewed_at) if entry.reviewed_at else now_datetime()
+        
+        state = states.get(entry.flashcard)
+        if not state:
+            state = frappe._dict(get_default_srs_state(reviewed_at), name=None, flashcard=entry.flashcard)
+            states[entry.flashcard] = state
+        
+        state.update(get_next_srs_state(state, entry.rating, reviewed_at))
+        results.append(get_srs_progress_response(state))
+        
+        if entry.flashcard not in changed_flashcards:
+            changed_flashcards.append(entry.flashcard)
+    
+    upsert_srs_progress(user_id, [states[flashcard] for flashcard in changed_flashcards], flashcard_topics)
     
-    # Quality scores for SM-2 algorithm (0-5)
-    quality_scores = {
-        "again": 0,  # Complete blackout
-        "hard": 1,   # Correct but with serious difficulty
-        "good": 3,   # Correct with some difficulty
-        "easy": 5    # Perfect recall
+    frappe.db.commit()
+    
+    return {
+        "success": True,
+        "results": results
     }
+
+def upsert_srs_progress(user_id, states, flashcard_topics=None):
+    """
+    Write SRS states of a user with one INSERT ... ON DUPLICATE KEY UPDATE
     
-    quality = quality_scores.get(internal_rating, 0)
+    Rows are keyed by the unique (user, flashcard) constraint, so concurrent writes for the
+    same card update one record instead of creating a second one. States without a name are
+    given one from the naming series (the name is only used when the row is actually inserted).
     
-    # Get current timestamp
-    now = now_datetime()
+    Args:
+        user_id (str): User ID
+        states (list): Dicts with flashcard, SRS_STATE_FIELDS and name (None for new records)
+        flashcard_topics (dict, optional): Flashcard mapped to its topic, looked up when missing
+    """
+    if not states:
+        return
+    
+    new_states = [state for state in states if not state.get("name")]
+    for state, name in zip(new_states, bulk.reserve_series_names("USRS-", 5, len(new_states))):
+        state["name"] = name
     
-    # Default values for a new SRS progress
-    defaults = {
+    bulk.bulk_upsert(
+        "User SRS Progress",
+        [
+            {
+                "name": state["name"],
+                "naming_series": "USRS-.#####",
+                "user": user_id,
+                "flashcard": state["flashcard"],
+                **{field: state.get(field) for field in SRS_STATE_FIELDS}
+            }
+            for state in states
+        ],
+        update_fields=SRS_STATE_FIELDS
+    )
+    
+    # A new state may have been merged into a row created concurrently under another name
+    if new_states:
+        stored_names = dict(frappe.get_all(
+            "User SRS Progress",
+            filters={"user": user_id, "flashcard": ["in", [state["flashcard"] for state in new_states]]},
+            fields=["flashcard", "name"],
+            as_list=True
+        ))
+        for state in new_states:
+            state["name"] = stored_names.get(state["flashcard"], state["name"])
+    
+    # The upsert bypasses document hooks, keep the due index in sync explicitly
+    flashcard_topics = flashcard_topics or {}
+    for state in states:
+        srs_due_index.update_card(
+            user_id, state["name"], state["flashcard"], state.get("next_review_timestamp"),
+            topic=flashcard_topics.get(state["flashcard"])
+        )
+
+def parse_rating_entry(entry):
+    """
+    Normalize one entry of a batch rating request
+    
+    Args:
+        entry (dict|list): {"flashcard", "rating", "reviewed_at"} or [flashcard, rating, reviewed_at]
+        
+    Returns:
+        frappe._dict: Entry with flashcard, rating and reviewed_at
+    """
+    if isinstance(entry, dict):
+        return frappe._dict({
+            "flashcard": entry.get("flashcard") or entry.get("flashcard_name"),
+            "rating": entry.get("rating") or entry.get("user_rating"),
+            "reviewed_at": entry.get("reviewed_at")
+        })
+    
+    if isinstance(entry, (list, tuple)) and len(entry) >= 2:
+        return frappe._dict({
+            "flashcard": entry[0],
+            "rating": entry[1],
+            "reviewed_at": entry[2] if len(entry) > 2 else None
+        })
+    
+    frappe.throw(_("Invalid rating entry: {0}").format(entry))
+
+def get_default_srs_state(now):
+    """
+    Default values for a new SRS progress
+    
+    Args:
+        now (datetime): Time the card is first reviewed
+        
+    Returns:
+        dict: Initial SRS state
+    """
+    return {
         "status": "new",
         "interval_days": 0,
         "ease_factor": 2.5,
@@ -429,124 +571,51 @@ def update_srs_progress(flashcard_name, user_rating):
         "last_review_timestamp": now,
         "next_review_timestamp": now
     }
+
+def get_next_srs_state(progress, user_rating, now):
+    """
+    Apply one user rating to an SRS state using the SM-2 scheduler
     
-    # Find existing progress or create new
-    progress_list = frappe.get_all(
-        "User SRS Progress",
-        filters={"user": user_id, "flashcard": flashcard_name},
-        fields=["name"]
+    Args:
+        progress (dict|Document): Current state with status, interval_days, ease_factor,
+            repetitions and learning_step
+        user_rating (str): User's rating (e.g., "correct", "wrong")
+        now (datetime): Time of the review
+        
+    Returns:
+        dict: New values for SRS_STATE_FIELDS
+    """
+    state = srs_scheduler.next_state(
+        progress.get("status"),
+        progress.get("interval_days"),
+        progress.get("ease_factor"),
+        progress.get("repetitions"),
+        progress.get("learning_step"),
+        user_rating
     )
+    state["last_review_timestamp"] = now
+    state["next_review_timestamp"] = srs_scheduler.get_next_review(now, state["interval_days"])
+    return state
+
+def get_srs_progress_response(progress):
+    """
+    Build the response returned after a rating is applied
     
-    if progress_list:
-        # Update existing progress
-        progress = frappe.get_doc("User SRS Progress", progress_list[0].name)
-    else:
-        # Create new progress
-        progress = frappe.new_doc("User SRS Progress")
-        progress.user = user_id
-        progress.flashcard = flashcard_name
-        for key, value in defaults.items():
-            setattr(progress, key, value)
-    
-    # Current values
-    status = progress.status
-    interval = progress.interval_days
-    ease_factor = progress.ease_factor
-    repetitions = progress.repetitions
-    learning_step = progress.learning_step
-    
-    # Update based on the SM-2 algorithm and card status
-    if status == "new" or status == "learning":
-        # Initial learning phase
-        if internal_rating == "again":  # Failed
-            status = "learning"
-            learning_step = 0
-            interval = 0  # Review again in the same session
-        elif internal_rating == "hard":  # Hard but passed
-            learning_step += 1
-            if learning_step >= 2:  # Move to review after passing twice
-                status = "review"
-                repetitions = 1
-                interval = 1  # First interval is 1 day
-            else:
-                status = "learning"
-                interval = 0.5  # 12 hours
-        elif internal_rating == "good":  # Good
-            learning_step += 1
-            if learning_step >= 2:  # Move to review after passing twice
-                status = "review"
-                repetitions = 1
-                interval = 1  # First interval is 1 day
-            else:
-                status = "learning"
-                interval = 0.25  # 6 hours
-        elif internal_rating == "easy":  # Easy
-            status = "review"
-            repetitions = 1
-            interval = 3  # Skip to 3 days for easy cards
-    
-    elif status == "review" or status == "lapsed":
-        # Regular review phase (SM-2 algorithm)
-        if internal_rating == "again":  # Failed review
-            status = "lapsed"
-            repetitions = 0
-            learning_step = 0
-            interval = 0  # Relearn immediately
-        else:
-            # Update ease factor based on quality
-            ease_factor = max(1.3, ease_factor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
-            
-            if internal_rating == "hard":
-                # Hard cards get a shorter interval
-                interval = max(1, interval * 1.2)
-            elif internal_rating == "good":
-                # Standard interval increase
-                if repetitions == 0:
-                    interval = 1
-                elif repetitions == 1:
-                    interval = 3
-                else:
-                    interval = interval * ease_factor
-            elif internal_rating == "easy":
-                # Easy cards get a longer interval
-                if repetitions == 0:
-                    interval = 3
-                else:
-                    interval = interval * ease_factor * 1.3
-            
-            repetitions += 1
-            status = "review"
-    
-    # Update progress
-    progress.status = status
-    progress.interval_days = interval
-    progress.ease_factor = ease_factor
-    progress.repetitions = repetitions
-    progress.learning_step = learning_step
-    progress.last_review_timestamp = now
-    
-    # Calculate next review time based on interval
-    if interval < 1:
-        # Less than a day (convert to hours)
-        hours = int(interval * 24)
-        progress.next_review_timestamp = now + timedelta(hours=hours)
-    else:
-        # Days
-        progress.next_review_timestamp = now + timedelta(days=int(interval))
-    
-    # Save the progress
-    progress.save(ignore_permissions=True)
-    frappe.db.commit()
-    
+    Args:
+        progress (dict|Document): Updated SRS state
+        
+    Returns:
+        dict: Updated SRS progress info
+    """
     return {
         "success": True,
         "message": _("SRS progress updated successfully"),
         "progress": {
-            "status": progress.status,
-            "interval_days": progress.interval_days,
-            "next_review": progress.next_review_timestamp,
-            "ease_factor": progress.ease_factor,
-            "repetitions": progress.repetitions
+            "status": progress.get("status"),
+            "interval_days": progress.get("interval_days"),
+            "next_review": progress.get("next_review_timestamp"),
+            "ease_factor": progress.get("ease_factor"),
+            "repetitions": progress.get("repetitions")
         }
     }
 
@@ -616,3 +685,152 @@ def get_srs_time_by_month(year=None):
         })
     
     return formatted_result
+
+@frappe.whitelist()
+def forecast_srs_load(days=30, simulate=0, expected_ratings=None):
+    """
+    Forecast how many SRS reviews the user will have on each of the next days
+    
+    By default the forecast is a histogram of the cards' current next_review_timestamp
+    built with one aggregate query. In simulated mode every review inside the window is
+    replayed with the SM-2 scheduler using expected ratings, so cards reviewed during
+    the window are counted again when they come back.
+    
+    Args:
+        days (int): Number of days to forecast, starting today (max 365)
+        simulate (int): Whether to project future reviews with the scheduler
+        expected_ratings (dict|str, optional): Probability of each rating ("again", "hard",
+            "good", "easy") used in simulated mode
+        
+    Returns:
+        dict: Reviews per day, per topic and in total
+    """
+    user_id = get_current_user()
+    days = min(max(cint(days), 1), 365)
+    today = getdate()
+    start_of_today = get_datetime(today)
+    window_end = add_days(start_of_today, days)
+    
+    if cint(simulate):
+        if isinstance(expected_ratings, str):
+            try:
+                expected_ratings = json.loads(expected_ratings)
+            except ValueError:
+                frappe.throw(_("Invalid expected ratings format"))
+        topic_ids, counts = get_simulated_srs_load(user_id, start_of_today, days, expected_ratings)
+    else:
+        topic_ids, counts = get_scheduled_srs_load(user_id, start_of_today, window_end, days)
+    
+    topic_names = {}
+    if topic_ids:
+        topic_names = {
+            topic.name: topic.topic_name
+            for topic in frappe.get_all(
+                "Topics",
+                filters={"name": ["in", topic_ids]},
+                fields=["name", "topic_name"]
+            )
+        }
+    
+    forecast_days = []
+    for day_index in range(days):
+        day_topics = {
+            topic_id: counts[day_index][topic_index]
+            for topic_index, topic_id in enumerate(topic_ids)
+            if counts[day_index][topic_index]
+        }
+        forecast_days.append({
+            "date": add_days(today, day_index),
+            "total": sum(day_topics.values()),
+            "topics": day_topics
+        })
+    
+    topics = [
+        {
+            "topic_id": topic_id,
+            "topic_name": topic_names.get(topic_id, "Unknown Topic"),
+            "total": sum(counts[day_index][topic_index] for day_index in range(days))
+        }
+        for topic_index, topic_id in enumerate(topic_ids)
+    ]
+    topics.sort(key=lambda x: x["total"], reverse=True)
+    
+    return {
+        "success": True,
+        "mode": "simulated" if cint(simulate) else "scheduled",
+        "total": sum(day["total"] for day in forecast_days),
+        "days": forecast_days,
+        "topics": topics
+    }
+
+def get_scheduled_srs_load(user_id, start_of_today, window_end, days):
+    """
+    Histogram of scheduled reviews per day and topic from one aggregate query
+    
+    Overdue cards are counted on the first day.
+    
+    Returns:
+        tuple: Topic IDs and a days x topics list of review counts
+    """
+    rows = frappe.db.sql("""
+        SELECT
+            GREATEST(DATEDIFF(progress.next_review_timestamp, %(start)s), 0) AS day_index,
+            flashcard.topic,
+            COUNT(*) AS card_count
+        FROM `tabUser SRS Progress` progress
+        INNER JOIN `tabFlashcard` flashcard ON flashcard.name = progress.flashcard
+        WHERE progress.user = %(user)s
+        AND progress.next_review_timestamp < %(end)s
+        GROUP BY day_index, flashcard.topic
+    """, {"user": user_id, "start": start_of_today, "end": window_end}, as_dict=True)
+    
+    topic_ids = sorted({row.topic for row in rows if row.topic})
+    topic_index = {topic_id: index for index, topic_id in enumerate(topic_ids)}
+    counts = [[0] * len(topic_ids) for _ in range(days)]
+    for row in rows:
+        if row.topic and cint(row.day_index) < days:
+            counts[cint(row.day_index)][topic_index[row.topic]] += cint(row.card_count)
+    
+    return topic_ids, counts
+
+def get_simulated_srs_load(user_id, start_of_today, days, expected_ratings=None):
+    """
+    Project reviews per day and topic by replaying the SM-2 scheduler over all cards
+    
+    Returns:
+        tuple: Topic IDs and a days x topics list of review counts
+    """
+    rows = frappe.db.sql("""
+        SELECT
+            progress.status, progress.interval_days, progress.ease_factor,
+            progress.repetitions, progress.learning_step, progress.next_review_timestamp,
+            flashcard.topic
+        FROM `tabUser SRS Progress` progress
+        INNER JOIN `tabFlashcard` flashcard ON flashcard.name = progress.flashcard
+        WHERE progress.user = %s
+        AND progress.next_review_timestamp IS NOT NULL
+    """, (user_id,))
+    
+    topic_ids = sorted({row[6] for row in rows if row[6]})
+    if not topic_ids:
+        return topic_ids, [[] for _ in range(days)]
+    
+    topic_index = {topic_id: index for index, topic_id in enumerate(topic_ids)}
+    rows = [row for row in rows if row[6]]
+    
+    # Overdue cards are reviewed now
+    now_offset = int((now_datetime() - start_of_today).total_seconds())
+    counts = srs_scheduler.simulate_review_load(
+        srs_scheduler.encode_statuses([row[0] for row in rows]),
+        [flt(row[1]) for row in rows],
+        [flt(row[2]) or 2.5 for row in rows],
+        [cint(row[3]) for row in rows],
+        [cint(row[4]) for row in rows],
+        [max(int((get_datetime(row[5]) - start_of_today).total_seconds()), now_offset) for row in rows],
+        [topic_index[row[6]] for row in rows],
+        len(topic_ids),
+        days,
+        rating_probabilities=expected_ratings
+    )
+    
+    return topic_ids, counts.tolist()
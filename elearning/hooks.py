@@ -84,6 +84,12 @@ app_license = "mit"
 
 # before_install = "elearning.install.before_install"
 # after_install = "elearning.install.after_install"
+after_install = "elearning.utils.indexes.create_indexes"
+
+# Migration
+# ------------
+
+after_migrate = ["elearning.utils.indexes.create_indexes"]
 
 # Uninstallation
 # ------------
@@ -136,14 +142,26 @@ app_license = "mit"
 doc_events = {
     "Test": {
         "on_update": "elearning.utils.test_utils.on_test_update",
+        "on_trash": "elearning.utils.test_utils.on_test_trash",
         "after_insert": "elearning.utils.test_utils.after_test_created"
     },
+    "Question": {
+        "on_update": "elearning.utils.test_utils.on_question_change",
+        "on_trash": "elearning.utils.test_utils.on_question_change"
+    },
     "Test Attempt": {
         "on_update": "elearning.utils.test_utils.on_test_attempt_update",
         "on_submit": "elearning.utils.test_utils.after_test_submitted"
     },
     "User": {
         "after_insert": "elearning.overrides.user.after_insert",
+    },
+    "Flashcard": {
+        "on_update": "elearning.utils.flashcard_cache.on_flashcard_change",
+        "on_trash": "elearning.utils.flashcard_cache.on_flashcard_change"
+    },
+    "Elearning Settings": {
+        "on_update": "elearning.utils.llm_client.on_settings_update"
     }
 }
 
@@ -229,6 +247,17 @@ fixtures = [
 # 	],
 # }
 
+scheduler_events = {
+	"cron": {
+		"* * * * *": [
+			"elearning.utils.answer_buffer.flush_dirty_attempts"
+		]
+	},
+	"daily": [
+		"elearning.utils.llm_cache.prune_persistent_cache"
+	],
+}
+
 # Testing
 # -------
 
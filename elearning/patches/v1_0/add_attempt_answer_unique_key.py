@@ -0,0 +1,21 @@
+import frappe
+from elearning.utils.indexes import create_unique_keys
+
+def execute():
+    """Merge duplicate Attempt Answer Item rows and enforce one row per (parent, test_question_item)"""
+    # Keep the most recently saved answer of every question of an attempt
+    frappe.db.sql("""
+        DELETE answer FROM `tabAttempt Answer Item` answer
+        INNER JOIN `tabAttempt Answer Item` newer
+            ON newer.parent = answer.parent
+            AND newer.test_question_item = answer.test_question_item
+            AND (
+                IFNULL(newer.submitted_at, newer.modified) > IFNULL(answer.submitted_at, answer.modified)
+                OR (
+                    IFNULL(newer.submitted_at, newer.modified) = IFNULL(answer.submitted_at, answer.modified)
+                    AND newer.name > answer.name
+                )
+            )
+    """)
+
+    create_unique_keys()
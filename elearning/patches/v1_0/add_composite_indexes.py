@@ -0,0 +1,4 @@
+from elearning.utils.indexes import create_composite_indexes
+
+def execute():
+    create_composite_indexes()
@@ -0,0 +1,28 @@
+import frappe
+from elearning.utils.indexes import create_unique_keys
+
+def execute():
+    """Merge duplicate User SRS Progress rows and enforce one row per (user, flashcard)"""
+    # Keep the most recently reviewed row of every (user, flashcard) pair
+    frappe.db.sql("""
+        DELETE progress FROM `tabUser SRS Progress` progress
+        INNER JOIN `tabUser SRS Progress` newer
+            ON newer.user = progress.user
+            AND newer.flashcard = progress.flashcard
+            AND (
+                IFNULL(newer.last_review_timestamp, newer.modified) > IFNULL(progress.last_review_timestamp, progress.modified)
+                OR (
+                    IFNULL(newer.last_review_timestamp, newer.modified) = IFNULL(progress.last_review_timestamp, progress.modified)
+                    AND newer.name > progress.name
+                )
+            )
+    """)
+
+    # Superseded by the unique key on the same columns
+    if frappe.db.sql("SHOW INDEX FROM `tabUser SRS Progress` WHERE Key_name = 'user_flashcard_index'"):
+        frappe.db.sql_ddl("ALTER TABLE `tabUser SRS Progress` DROP INDEX `user_flashcard_index`")
+
+    create_unique_keys()
+
+    # Deleted duplicates may still be listed in the due index
+    frappe.cache().delete_keys("srs_due_index_built|")
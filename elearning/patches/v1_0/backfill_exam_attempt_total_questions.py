@@ -0,0 +1,24 @@
+import frappe
+
+def execute():
+    """Fill total_questions of exam attempts created before the column existed"""
+    # Lazy attempts list their cards in flashcard_order
+    frappe.db.sql("""
+        UPDATE `tabUser Exam Attempt`
+        SET total_questions = JSON_LENGTH(flashcard_order)
+        WHERE IFNULL(total_questions, 0) = 0
+        AND IFNULL(flashcard_order, '') != ''
+    """)
+
+    frappe.db.sql("""
+        UPDATE `tabUser Exam Attempt` attempt
+        INNER JOIN (
+            SELECT parent, COUNT(*) AS question_count
+            FROM `tabUser Exam Attempt Detail`
+            WHERE parenttype = 'User Exam Attempt'
+            GROUP BY parent
+        ) detail ON detail.parent = attempt.name
+        SET attempt.total_questions = detail.question_count
+        WHERE IFNULL(attempt.total_questions, 0) = 0
+        AND IFNULL(attempt.flashcard_order, '') = ''
+    """)
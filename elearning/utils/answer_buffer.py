@@ -0,0 +1,236 @@
+import json
+import time
+
+import frappe
+import redis
+from frappe.utils import cint
+from redis.exceptions import RedisError
+from elearning.utils import bulk
+
+# Write-behind buffer for the progress of in-progress test attempts.
+#
+# With "test_progress_write_behind" set in site config, save_attempt_progress only
+# writes to a Redis hash per attempt: one field per answer plus remaining_time_seconds
+# and last_viewed_question. The hash is flushed to the database every minute, on submit
+# and on resume. A flush deletes a field from the hash only if it still holds the value
+# that was written, and only after the database commit. A flush that is interrupted at
+# any point therefore leaves the answers in Redis, and the next flush writes them again.
+#
+# Keys are built with make_key and the values are JSON, so the hash is read with the raw
+# client: Frappe's wrapped hgetall would apply make_key again and unpickle the values.
+
+BUFFER_TTL_SECONDS = 2 * 24 * 60 * 60
+
+# Attempts flushed per run of the scheduled job
+FLUSH_BATCH_SIZE = 1000
+
+ANSWER_FIELD_PREFIX = "answer|"
+
+ANSWER_UPDATE_FIELDS = ["user_answer", "submitted_at", "is_correct", "points_awarded"]
+
+# KEYS: buffer, revision, dirty set
+# ARGV: stored revision, new revision ("" for none), now, ttl, attempt, field/value pairs
+BUFFER_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[2]) or ARGV[1])
+if tonumber(ARGV[1]) > current then
+    current = tonumber(ARGV[1])
+end
+if ARGV[2] ~= '' then
+    local revision = tonumber(ARGV[2])
+    if revision <= current then
+        return {0, current}
+    end
+    current = revision
+    redis.call('SET', KEYS[2], revision, 'EX', ARGV[4])
+end
+for i = 6, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('ZADD', KEYS[3], 'NX', ARGV[3], ARGV[5])
+return {1, current}
+"""
+
+# KEYS: buffer, dirty set
+# ARGV: attempt, field/value pairs that were flushed
+RELEASE_SCRIPT = """
+for i = 2, #ARGV, 2 do
+    if redis.call('HGET', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+local remaining = redis.call('HLEN', KEYS[1])
+if remaining == 0 then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+end
+return remaining
+"""
+
+def is_enabled():
+    return bool(frappe.conf.get("test_progress_write_behind"))
+
+def get_buffer_key(attempt_id):
+    return frappe.cache().make_key(f"test_progress_buffer|{attempt_id}")
+
+def get_revision_key(attempt_id):
+    return frappe.cache().make_key(f"test_progress_revision|{attempt_id}")
+
+def get_dirty_key():
+    return frappe.cache().make_key("test_progress_buffer_dirty")
+
+def buffer_progress(attempt_id, stored_revision, revision, answer_rows, values):
+    """
+    Store progress of an attempt in its buffer instead of the database
+
+    Args:
+        attempt_id (str): Name of the Test Attempt
+        stored_revision (int): progress_revision stored in the database
+        revision (int): Revision of this save, None to skip the revision check
+        answer_rows (list): Attempt Answer Item rows, see save_attempt_progress
+        values (dict): remaining_time_seconds and last_viewed_question to set
+
+    Returns:
+        dict: success and the current revision, stale True when the save was rejected
+
+    Raises:
+        RedisError: The buffer is unavailable, the caller writes to the database instead
+    """
+    fields = {}
+    for row in answer_rows:
+        fields[ANSWER_FIELD_PREFIX + row["test_question_item"]] = json.dumps({
+            "question": row["question"],
+            "idx": row["idx"],
+            "user_answer": row["user_answer"],
+            "submitted_at": str(row["submitted_at"])
+        })
+    for field, value in values.items():
+        if field != "progress_revision":
+            fields[field] = json.dumps(value)
+
+    cache = frappe.cache()
+    accepted, current = cache.register_script(BUFFER_SCRIPT)(
+        keys=[get_buffer_key(attempt_id), get_revision_key(attempt_id), get_dirty_key()],
+        args=[
+            stored_revision,
+            "" if revision is None else revision,
+            time.time(),
+            BUFFER_TTL_SECONDS,
+            attempt_id,
+            *[item for pair in fields.items() for item in pair]
+        ]
+    )
+
+    if not accepted:
+        return {"success": False, "stale": True, "revision": cint(current)}
+    return {"success": True, "revision": cint(current)}
+
+def read_buffer(attempt_id):
+    return {
+        field.decode(): value.decode()
+        for field, value in redis.Redis.hgetall(frappe.cache(), get_buffer_key(attempt_id)).items()
+    }
+
+def parse_buffer(snapshot):
+    progress = {"answers": {}}
+    for field, value in snapshot.items():
+        if field.startswith(ANSWER_FIELD_PREFIX):
+            progress["answers"][field[len(ANSWER_FIELD_PREFIX):]] = json.loads(value)
+        else:
+            progress[field] = json.loads(value)
+    return progress
+
+def get_buffered_progress(attempt_id):
+    """
+    Progress of an attempt that is buffered but not flushed yet
+
+    Args:
+        attempt_id (str): Name of the Test Attempt
+
+    Returns:
+        dict: answers (Test Question Item name mapped to question, idx, user_answer and
+            submitted_at) and the buffered attempt values, e.g. remaining_time_seconds
+    """
+    return parse_buffer(read_buffer(attempt_id))
+
+def flush_attempt(attempt_id):
+    """
+    Write the buffered progress of an attempt to the database and commit
+
+    Progress of an attempt that is no longer in progress is dropped.
+
+    Args:
+        attempt_id (str): Name of the Test Attempt
+
+    Returns:
+        bool: Whether there was buffered progress
+    """
+    snapshot = read_buffer(attempt_id)
+    if not snapshot:
+        frappe.cache().zrem(get_dirty_key(), attempt_id)
+        return False
+
+    progress = parse_buffer(snapshot)
+    buffered_revision = frappe.cache().get(get_revision_key(attempt_id))
+
+    attempt = frappe.db.get_value(
+        "Test Attempt", attempt_id, ["status", "progress_revision"], as_dict=True, for_update=True
+    )
+    if attempt and attempt.status == "In Progress":
+        bulk.bulk_upsert("Attempt Answer Item", [
+            {
+                "name": frappe.generate_hash(length=10),
+                "parent": attempt_id,
+                "parenttype": "Test Attempt",
+                "parentfield": "answers",
+                "idx": answer["idx"],
+                "question": answer["question"],
+                "test_question_item": test_question_item,
+                "user_answer": answer["user_answer"],
+                "submitted_at": answer["submitted_at"],
+                "is_correct": 0,
+                "points_awarded": 0
+            }
+            for test_question_item, answer in progress.pop("answers").items()
+        ], ANSWER_UPDATE_FIELDS)
+
+        if buffered_revision and cint(buffered_revision) > cint(attempt.progress_revision):
+            progress["progress_revision"] = cint(buffered_revision)
+        if progress:
+            frappe.db.set_value("Test Attempt", attempt_id, progress)
+        frappe.db.commit()
+    else:
+        frappe.db.rollback()
+
+    release_flushed(attempt_id, snapshot)
+    return True
+
+def release_flushed(attempt_id, snapshot):
+    """Remove the flushed fields that were not overwritten during the flush"""
+    frappe.cache().register_script(RELEASE_SCRIPT)(
+        keys=[get_buffer_key(attempt_id), get_dirty_key()],
+        args=[attempt_id, *[item for pair in snapshot.items() for item in pair]]
+    )
+
+def discard(attempt_id):
+    """Drop the buffered progress of an attempt, e.g. after it was submitted"""
+    cache = frappe.cache()
+    cache.delete(get_buffer_key(attempt_id), get_revision_key(attempt_id))
+    cache.zrem(get_dirty_key(), attempt_id)
+
+def flush_dirty_attempts():
+    """Scheduled job: flush the buffered progress of every attempt that has some"""
+    if not is_enabled():
+        return
+
+    try:
+        attempt_ids = [member.decode() for member in frappe.cache().zrange(get_dirty_key(), 0, FLUSH_BATCH_SIZE - 1)]
+    except RedisError as e:
+        frappe.logger().warning(f"Test progress buffer unavailable: {e}")
+        return
+
+    for attempt_id in attempt_ids:
+        try:
+            flush_attempt(attempt_id)
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(frappe.get_traceback(), f"Could not flush progress of Test Attempt {attempt_id}")
@@ -0,0 +1,151 @@
+import frappe
+from frappe.utils import cint, now_datetime
+
+# Set-based write helpers for hot paths that would otherwise save documents one by one.
+# They skip document validation and hooks, so callers validate their rows up front.
+
+def reserve_series_names(prefix, digits, count):
+    """
+    Reserve a block of consecutive names from a naming series
+
+    Args:
+        prefix (str): Series key, e.g. "USRS-" for "USRS-.#####"
+        digits (int): Number of digits in the generated names
+        count (int): Number of names to reserve
+
+    Returns:
+        list: Reserved document names in order
+    """
+    if count <= 0:
+        return []
+
+    current = frappe.db.sql(
+        "SELECT `current` FROM `tabSeries` WHERE `name` = %s FOR UPDATE", (prefix,)
+    )
+    if current and current[0][0] is not None:
+        start = cint(current[0][0])
+        frappe.db.sql(
+            "UPDATE `tabSeries` SET `current` = `current` + %s WHERE `name` = %s", (count, prefix)
+        )
+    else:
+        start = 0
+        frappe.db.sql(
+            "INSERT INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)", (prefix, count)
+        )
+
+    return [f"{prefix}{str(start + offset).zfill(digits)}" for offset in range(1, count + 1)]
+
+def get_standard_values():
+    """Values of the standard columns for rows written now by the session user"""
+    timestamp = now_datetime()
+    user = frappe.session.user
+    return {
+        "creation": timestamp,
+        "modified": timestamp,
+        "owner": user,
+        "modified_by": user,
+        "docstatus": 0
+    }
+
+def bulk_insert(doctype, rows, chunk_size=500, ignore_duplicates=False):
+    """
+    Insert many new rows of a doctype with multi-row INSERT statements
+
+    Args:
+        doctype (str): DocType name
+        rows (list): Dicts with the same keys, each including "name"
+        chunk_size (int): Number of rows per statement
+        ignore_duplicates (bool): Skip rows whose name or unique key already exists
+    """
+    if not rows:
+        return
+
+    standard_values = get_standard_values()
+    fields = list(rows[0].keys())
+    fields += [field for field in standard_values if field not in fields]
+
+    frappe.db.bulk_insert(
+        doctype,
+        fields,
+        [[row.get(field, standard_values.get(field)) for field in fields] for row in rows],
+        ignore_duplicates=ignore_duplicates,
+        chunk_size=chunk_size
+    )
+
+def bulk_upsert(doctype, rows, update_fields, chunk_size=500):
+    """
+    Insert or update many rows of a doctype with multi-row INSERT ... ON DUPLICATE KEY UPDATE
+
+    Args:
+        doctype (str): DocType name
+        rows (list): Dicts with the same keys, each including "name"
+        update_fields (list): Fields overwritten when the row already exists
+        chunk_size (int): Number of rows per statement
+
+    Returns:
+        int: Affected row count as reported by the database, 1 per inserted and 2 per updated row
+    """
+    if not rows:
+        return 0
+
+    standard_values = get_standard_values()
+
+    fields = list(rows[0].keys())
+    fields += [field for field in standard_values if field not in fields]
+    columns = ", ".join(f"`{field}`" for field in fields)
+    updates = ", ".join(
+        f"`{field}` = VALUES(`{field}`)"
+        for field in list(update_fields) + ["modified", "modified_by"]
+    )
+    row_placeholder = "(" + ", ".join(["%s"] * len(fields)) + ")"
+
+    affected = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        values = []
+        for row in chunk:
+            values.extend(row.get(field, standard_values.get(field)) for field in fields)
+
+        frappe.db.sql(
+            f"""INSERT INTO `tab{doctype}` ({columns})
+            VALUES {", ".join([row_placeholder] * len(chunk))}
+            ON DUPLICATE KEY UPDATE {updates}""",
+            values
+        )
+        affected += frappe.db._cursor.rowcount
+
+    return affected
+
+def bulk_update(doctype, rows, fields, chunk_size=500):
+    """
+    Set fields of many existing rows with one UPDATE ... CASE statement per chunk
+
+    Args:
+        doctype (str): DocType name
+        rows (list): Dicts with "name" and a value for every field
+        fields (list): Fields to set
+        chunk_size (int): Number of rows per statement
+    """
+    if not rows:
+        return
+
+    standard_values = get_standard_values()
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+
+        values = []
+        for field in fields:
+            for row in chunk:
+                values.extend([row["name"], row.get(field)])
+        values.extend([standard_values["modified"], standard_values["modified_by"]])
+        values.extend(row["name"] for row in chunk)
+
+        assignments = ", ".join(f"`{field}` = CASE `name` {cases} END" for field in fields)
+        frappe.db.sql(
+            f"""UPDATE `tab{doctype}`
+            SET {assignments}, `modified` = %s, `modified_by` = %s
+            WHERE `name` IN ({", ".join(["%s"] * len(chunk))})""",
+            values
+        )
@@ -0,0 +1,55 @@
+import frappe
+
+# Bulk loaders for child table rows, so listings never query a child table once per parent.
+
+def get_child_rows(child_doctype, parents, fields, order_by="idx"):
+    """
+    Load child rows of many parents with one parent IN (...) query
+
+    Args:
+        child_doctype (str): Child table DocType, e.g. "Ordering Step Item"
+        parents (list): Parent document names
+        fields (list): Child fields to return
+        order_by (str): Sort order of the rows within each parent
+
+    Returns:
+        dict: Parent name mapped to its rows in order, parents without rows are omitted
+    """
+    parents = list(dict.fromkeys(parent for parent in parents if parent))
+    if not parents:
+        return {}
+
+    rows_by_parent = {}
+    for row in frappe.get_all(
+        child_doctype,
+        filters={"parent": ["in", parents]},
+        fields=["parent"] + list(fields),
+        order_by=order_by
+    ):
+        parent = row.pop("parent")
+        rows_by_parent.setdefault(parent, []).append(row)
+
+    return rows_by_parent
+
+def attach_ordering_steps(flashcards):
+    """
+    Attach ordering_steps_items to every "Ordering Steps" flashcard with one query
+
+    Args:
+        flashcards (list): Flashcards with name and flashcard_type, modified in place
+
+    Returns:
+        list: The same flashcards
+    """
+    ordering_cards = [card for card in flashcards if card.get("flashcard_type") == "Ordering Steps"]
+    steps_by_parent = get_child_rows(
+        "Ordering Step Item",
+        [card.get("name") for card in ordering_cards],
+        ["step_content", "correct_order"],
+        order_by="correct_order"
+    )
+
+    for card in ordering_cards:
+        card["ordering_steps_items"] = steps_by_parent.get(card.get("name"), [])
+
+    return flashcards
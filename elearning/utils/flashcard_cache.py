@@ -0,0 +1,159 @@
+import frappe
+from frappe.utils import cint
+from redis.exceptions import RedisError
+from elearning.utils.child_tables import attach_ordering_steps
+
+# Per-topic cache of flashcard content with ordering steps attached.
+#
+# Every topic has a version counter. Content is stored under the current version, and
+# invalidation only bumps the counter, so a reader that built content from data read
+# before a change can never overwrite the newer entry. Old versions simply expire.
+
+CONTENT_TTL_SECONDS = 24 * 60 * 60
+
+# Bump when the cached layout changes so entries written by older code are ignored
+CONTENT_FORMAT = 1
+
+FLASHCARD_FIELDS = [
+    "name", "topic", "flashcard_type", "question", "answer",
+    "explanation", "hint", "solution_with_error", "modified"
+]
+
+def get_version_key(topic):
+    return frappe.cache().make_key(f"flashcard_content_version|{topic}")
+
+def get_content_key(topic, version):
+    return f"flashcard_content|{CONTENT_FORMAT}|{topic}|{version}"
+
+def load_flashcards(filters):
+    """
+    Load flashcards from the database with ordering steps attached
+
+    Args:
+        filters (dict): Flashcard filters
+
+    Returns:
+        list: Flashcards ordered by name, "Ordering Steps" cards carry ordering_steps_items
+    """
+    flashcards = frappe.get_all(
+        "Flashcard",
+        filters=filters,
+        fields=FLASHCARD_FIELDS,
+        order_by="name"
+    )
+
+    attach_ordering_steps(flashcards)
+
+    return flashcards
+
+def get_cached_topic_content(topic):
+    """Cached flashcards of a topic, built from the database on a miss"""
+    try:
+        cache = frappe.cache()
+        version = cint(cache.get(get_version_key(topic)))
+        content_key = get_content_key(topic, version)
+
+        flashcards = cache.get_value(content_key)
+        if flashcards is None:
+            flashcards = load_flashcards({"topic": topic})
+            cache.set_value(content_key, flashcards, expires_in_sec=CONTENT_TTL_SECONDS)
+        return flashcards
+    except RedisError as e:
+        frappe.logger().warning(f"Flashcard content cache unavailable for topic {topic}, reading database: {e}")
+        return load_flashcards({"topic": topic})
+
+def copy_flashcard(card, fields=None):
+    """Copy a cached card so callers can modify it, optionally keeping only some fields"""
+    copied = frappe._dict({field: card.get(field) for field in (fields or FLASHCARD_FIELDS)})
+    if "ordering_steps_items" in card:
+        copied["ordering_steps_items"] = [frappe._dict(step) for step in card["ordering_steps_items"]]
+    return copied
+
+def get_topic_flashcards(topic, flashcard_type=None, fields=None, newest_first=False):
+    """
+    Get flashcards of a topic from the content cache
+
+    Args:
+        topic (str): Topic ID
+        flashcard_type (str, optional): Only return this type, "All" or None for every type
+        fields (list, optional): Fields to return, defaults to FLASHCARD_FIELDS
+        newest_first (bool): Order by last modification (newest first) instead of by name
+
+    Returns:
+        list: Copies of the cached flashcards, "Ordering Steps" cards carry ordering_steps_items
+    """
+    flashcards = get_cached_topic_content(topic)
+
+    if flashcard_type and flashcard_type != "All":
+        flashcards = [card for card in flashcards if card.flashcard_type == flashcard_type]
+
+    if newest_first:
+        flashcards = sorted(flashcards, key=lambda card: card.modified, reverse=True)
+
+    return [copy_flashcard(card, fields) for card in flashcards]
+
+def get_flashcards_by_name(topic, names, fields=None):
+    """
+    Get specific flashcards, served from the content cache of their topic
+
+    Cards that are no longer in the topic (moved or deleted) are read from the database.
+
+    Args:
+        topic (str): Topic the flashcards are expected in
+        names (list): Flashcard names
+        fields (list, optional): Fields to return, defaults to FLASHCARD_FIELDS
+
+    Returns:
+        dict: Flashcard name mapped to a copy of the flashcard
+    """
+    cached = {card.name: card for card in get_cached_topic_content(topic)} if topic else {}
+
+    flashcards = {}
+    missing = []
+    for name in set(names):
+        if name in cached:
+            flashcards[name] = copy_flashcard(cached[name], fields)
+        else:
+            missing.append(name)
+
+    if missing:
+        for card in load_flashcards({"name": ["in", missing]}):
+            flashcards[card.name] = copy_flashcard(card, fields)
+
+    return flashcards
+
+def invalidate_topic(topic):
+    """
+    Move a topic to a new content version, now and again once the transaction commits
+
+    Args:
+        topic (str): Topic ID
+    """
+    if not topic:
+        return
+
+    def bump():
+        try:
+            frappe.cache().incr(get_version_key(topic))
+        except RedisError as e:
+            frappe.logger().warning(f"Could not invalidate flashcard content cache for topic {topic}: {e}")
+
+    # Readers in this transaction see the change immediately, readers elsewhere
+    # may rebuild from uncommitted data until the commit bumps the version again
+    bump()
+    frappe.db.after_commit.add(bump)
+
+def on_flashcard_change(doc, method):
+    """
+    Hook handler when a Flashcard is updated or deleted
+
+    Args:
+        doc (Document): The Flashcard document
+        method (str): The method that triggered this hook
+    """
+    invalidate_topic(doc.topic)
+
+    # A card moved to another topic must also leave the old topic's content
+    previous = doc.get_doc_before_save()
+    if previous and previous.topic != doc.topic:
+        invalidate_topic(previous.topic)
@@ -0,0 +1,63 @@
+import frappe
+
+# Composite indexes for the hot lookup paths. Almost every endpoint filters by user
+# plus one more key, which single-column indexes cannot serve.
+#
+# Created by the v1_0 patches and re-checked after install and every migrate.
+COMPOSITE_INDEXES = {
+    "User SRS Progress": [
+        ["user", "next_review_timestamp"]
+    ],
+    "User Flashcard Setting": [
+        ["user", "topic"]
+    ],
+    "User Exam Attempt": [
+        ["user", "topic", "completion_timestamp"],
+        # Exam history pages, keyset pagination on (start_time, name)
+        ["user", "start_time"],
+        ["user", "topic", "start_time"]
+    ],
+    "User Exam Attempt Detail": [
+        ["parent", "flashcard"]
+    ],
+    "Flashcard": [
+        ["topic", "flashcard_type"]
+    ],
+    "Test Attempt": [
+        ["test", "user", "status"]
+    ]
+}
+
+# Unique keys that writes rely on, e.g. upserts with INSERT ... ON DUPLICATE KEY UPDATE.
+# They also serve lookups on the same columns, so no plain index is declared for them.
+UNIQUE_KEYS = {
+    "User SRS Progress": [
+        ["user", "flashcard"]
+    ],
+    "Attempt Answer Item": [
+        ["parent", "test_question_item"]
+    ]
+}
+
+def create_indexes():
+    """Create any missing index or unique key, run after install and every migrate"""
+    create_composite_indexes()
+    create_unique_keys()
+
+def create_composite_indexes():
+    """Create any missing index from COMPOSITE_INDEXES"""
+    for doctype, indexes in COMPOSITE_INDEXES.items():
+        if not frappe.db.table_exists(doctype):
+            continue
+
+        for fields in indexes:
+            frappe.db.add_index(doctype, fields)
+
+def create_unique_keys():
+    """Create any missing unique key from UNIQUE_KEYS, existing duplicates must be merged first"""
+    for doctype, keys in UNIQUE_KEYS.items():
+        if not frappe.db.table_exists(doctype):
+            continue
+
+        for fields in keys:
+            frappe.db.add_unique(doctype, fields)
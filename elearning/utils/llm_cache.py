@@ -0,0 +1,218 @@
+import hashlib
+import json
+import re
+import time
+import unicodedata
+
+import frappe
+import redis
+from frappe.utils import add_days, now_datetime
+from redis.exceptions import RedisError
+from elearning.utils import bulk
+
+# Content-addressed cache of LLM responses.
+#
+# An entry is keyed by a hash of everything that goes into the prompt (model, prompts,
+# normalized answers), so a request that was answered before is served without calling
+# the LLM, and any change to the inputs simply produces a new key. Redis keeps entries
+# for CACHE_TTL_SECONDS and evicts the least recently used ones beyond MAX_ENTRIES.
+# With "llm_response_cache_persistent" set in site config, entries are also stored in
+# the LLM Response Cache doctype so they survive a cache flush.
+
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+MAX_ENTRIES = 20000
+
+# Persistent entries not used for this many days are removed by the daily prune
+PERSISTENT_TTL_DAYS = 90
+
+# Bump when the key derivation changes so older entries are no longer matched
+KEY_FORMAT = 1
+
+STAT_KINDS = ["redis_hits", "db_hits", "misses"]
+
+def normalize_answer(answer):
+    """
+    Normalize a free-text answer so equivalent spellings share a cache entry
+
+    Unicode is composed (NFC), so Vietnamese text typed with combining marks matches
+    precomposed input, and runs of whitespace are collapsed.
+
+    Args:
+        answer (str): Answer as typed by the user
+
+    Returns:
+        str: Normalized answer
+    """
+    if answer is None:
+        return ""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", str(answer))).strip()
+
+def make_cache_key(namespace, inputs):
+    """
+    Hash the inputs of an LLM request
+
+    Args:
+        namespace (str): Kind of request, e.g. "exam_answer_feedback"
+        inputs (dict): Everything the prompt is built from, must be JSON serializable
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    payload = json.dumps([KEY_FORMAT, namespace, inputs], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def get_entry_key(key):
+    return f"llm_response_cache|{key}"
+
+def get_lru_key():
+    return frappe.cache().make_key("llm_response_cache_lru")
+
+def get_stats_key():
+    return frappe.cache().make_key("llm_response_cache_stats")
+
+def is_persistent():
+    return bool(frappe.conf.get("llm_response_cache_persistent"))
+
+def get_response(namespace, inputs):
+    """
+    Look up a cached LLM response, first in Redis and then in the persistent tier
+
+    Args:
+        namespace (str): Kind of request
+        inputs (dict): Prompt inputs, see make_cache_key
+
+    Returns:
+        The cached response, or None on a miss
+    """
+    key = make_cache_key(namespace, inputs)
+
+    response = get_from_redis(key)
+    if response is not None:
+        record(namespace, "redis_hits")
+        return response
+
+    if is_persistent():
+        response = get_from_db(key)
+        if response is not None:
+            set_in_redis(key, response)
+            record(namespace, "db_hits")
+            return response
+
+    record(namespace, "misses")
+    return None
+
+def set_response(namespace, inputs, response):
+    """
+    Store an LLM response for the given prompt inputs
+
+    Only store responses that are valid for every later identical request, never errors.
+
+    Args:
+        namespace (str): Kind of request
+        inputs (dict): Prompt inputs, see make_cache_key
+        response: JSON serializable response
+    """
+    key = make_cache_key(namespace, inputs)
+    set_in_redis(key, response)
+
+    if is_persistent():
+        bulk.bulk_insert("LLM Response Cache", [{
+            "name": key,
+            "namespace": namespace,
+            "response": json.dumps(response, ensure_ascii=False),
+            "hit_count": 0,
+            "last_accessed": now_datetime()
+        }], ignore_duplicates=True)
+
+def get_from_redis(key):
+    try:
+        response = frappe.cache().get_value(get_entry_key(key))
+        if response is not None:
+            frappe.cache().zadd(get_lru_key(), {key: time.time()})
+        return response
+    except RedisError as e:
+        frappe.logger().warning(f"LLM response cache unavailable: {e}")
+        return None
+
+def set_in_redis(key, response):
+    try:
+        cache = frappe.cache()
+        cache.set_value(get_entry_key(key), response, expires_in_sec=CACHE_TTL_SECONDS)
+
+        # Track last use so the least recently used entries can be evicted past MAX_ENTRIES
+        lru_key = get_lru_key()
+        pipeline = cache.pipeline()
+        pipeline.zadd(lru_key, {key: time.time()})
+        pipeline.zremrangebyscore(lru_key, "-inf", time.time() - CACHE_TTL_SECONDS)
+        pipeline.zcard(lru_key)
+        size = pipeline.execute()[-1]
+
+        if size > MAX_ENTRIES:
+            evicted = cache.zpopmin(lru_key, size - MAX_ENTRIES)
+            cache.delete_value([get_entry_key(member.decode()) for member, _ in evicted])
+    except RedisError as e:
+        frappe.logger().warning(f"Could not store LLM response in cache: {e}")
+
+def get_from_db(key):
+    response = frappe.db.get_value("LLM Response Cache", key, "response")
+    if response is None:
+        return None
+
+    frappe.db.sql("""
+        UPDATE `tabLLM Response Cache`
+        SET hit_count = hit_count + 1, last_accessed = %s
+        WHERE name = %s
+    """, (now_datetime(), key))
+    return json.loads(response)
+
+def record(namespace, kind):
+    try:
+        frappe.cache().hincrby(get_stats_key(), f"{namespace}|{kind}", 1)
+    except RedisError:
+        pass
+
+@frappe.whitelist()
+def get_cache_stats():
+    """
+    Hit and miss counters of the LLM response cache
+
+    Returns:
+        dict: Namespace mapped to redis_hits, db_hits, misses, requests and hit_rate (0-1),
+            empty if the cache is unavailable
+    """
+    frappe.only_for("System Manager")
+
+    try:
+        # Raw read: the wrapped hgetall would prefix the key again and unpickle the counts
+        counters = redis.Redis.hgetall(frappe.cache(), get_stats_key())
+    except RedisError as e:
+        frappe.logger().warning(f"LLM response cache stats unavailable: {e}")
+        return {}
+
+    stats = {}
+    for field, count in counters.items():
+        namespace, kind = field.decode().rsplit("|", 1)
+        stats.setdefault(namespace, {stat: 0 for stat in STAT_KINDS})[kind] = int(count)
+
+    for namespace_stats in stats.values():
+        requests = sum(namespace_stats.values())
+        namespace_stats["requests"] = requests
+        namespace_stats["hit_rate"] = (
+            round((namespace_stats["redis_hits"] + namespace_stats["db_hits"]) / requests, 4) if requests else 0
+        )
+
+    return stats
+
+@frappe.whitelist()
+def reset_cache_stats():
+    """Reset the hit and miss counters of the LLM response cache"""
+    frappe.only_for("System Manager")
+    try:
+        frappe.cache().delete(get_stats_key())
+    except RedisError as e:
+        frappe.logger().warning(f"Could not reset LLM response cache stats: {e}")
+
+def prune_persistent_cache():
+    """Scheduled job: remove persistent entries that were not used for PERSISTENT_TTL_DAYS"""
+    frappe.db.delete("LLM Response Cache", {"last_accessed": ["<", add_days(now_datetime(), -PERSISTENT_TTL_DAYS)]})
+    frappe.db.commit()
@@ -0,0 +1,241 @@
+import threading
+import time
+
+import frappe
+import requests
+from frappe.utils import cint
+from redis.exceptions import RedisError
+from requests.adapters import HTTPAdapter
+
+# Process-wide client for the Gemini REST API.
+#
+# Every LLM call of the process goes through one keep-alive HTTP session. At most
+# MAX_CONCURRENCY calls are in flight and REQUESTS_PER_MINUTE are sent, callers wait up
+# to MAX_WAIT_SECONDS for a slot. After FAILURE_THRESHOLD consecutive failures the
+# circuit opens and calls fail immediately for CIRCUIT_COOLDOWN_SECONDS instead of
+# piling up on a broken upstream. The limits can be overridden with llm_max_concurrency
+# and llm_requests_per_minute in site config, gemini_api_base_url points the client at
+# another endpoint (e.g. a local stub). The API key is resolved once per process and
+# resolved again after Elearning Settings is saved, see invalidate_api_key.
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+CONNECT_TIMEOUT_SECONDS = 5
+READ_TIMEOUT_SECONDS = 60
+
+MAX_CONCURRENCY = 8
+REQUESTS_PER_MINUTE = 60
+MAX_WAIT_SECONDS = 10
+
+FAILURE_THRESHOLD = 5
+CIRCUIT_COOLDOWN_SECONDS = 30
+
+class LLMError(Exception):
+    """The LLM request failed"""
+
+class LLMUnavailableError(LLMError):
+    """The request was not sent: circuit open, rate limited or too many requests in flight"""
+
+_api_keys = {}
+_client = None
+_client_lock = threading.Lock()
+
+def get_api_key_version_key():
+    return frappe.cache().make_key("llm_api_key_version")
+
+def get_api_key_version():
+    try:
+        return cint(frappe.cache().get(get_api_key_version_key()))
+    except RedisError:
+        return None
+
+def get_api_key():
+    """
+    Gemini API key of the current site, resolved once per process and key version
+
+    Returns:
+        str: API key from site config or Elearning Settings, None if not configured
+    """
+    site = frappe.local.site
+    version = get_api_key_version()
+    cached = _api_keys.get(site)
+    # Without Redis the key resolved before is kept
+    if not cached or not cached[1] or (version is not None and cached[0] != version):
+        cached = _api_keys[site] = (version, (
+            frappe.conf.get("gemini_api_key")
+            or frappe.db.get_single_value("Elearning Settings", "gemini_api_key")
+        ))
+    return cached[1]
+
+def clear_api_key():
+    """Forget the resolved API key so the next call of this process reads the configuration again"""
+    _api_keys.pop(frappe.local.site, None)
+
+def invalidate_api_key():
+    """Make every process resolve the API key again, now and again once the transaction commits"""
+    def bump():
+        clear_api_key()
+        try:
+            frappe.cache().incr(get_api_key_version_key())
+        except RedisError as e:
+            frappe.logger().warning(f"Could not invalidate the LLM API key of other processes: {e}")
+
+    # Processes resolving the key before the commit read the old one, the commit bumps again
+    bump()
+    frappe.db.after_commit.add(bump)
+
+def on_settings_update(doc, method):
+    """
+    Hook handler when Elearning Settings is saved, e.g. after the API key was rotated
+
+    Args:
+        doc (Document): The Elearning Settings document
+        method (str): The method that triggered this hook
+    """
+    invalidate_api_key()
+
+def get_base_url():
+    return (frappe.conf.get("gemini_api_base_url") or DEFAULT_BASE_URL).rstrip("/")
+
+def extract_text(result):
+    """Text of the first candidate of a generateContent response, empty if there is none"""
+    candidates = result.get("candidates") or [{}]
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+class RateLimiter:
+    """Token bucket allowing requests_per_minute requests with bursts up to the same number"""
+
+    def __init__(self, requests_per_minute):
+        self.capacity = requests_per_minute
+        self.tokens = requests_per_minute
+        self.rate = requests_per_minute / 60
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class CircuitBreaker:
+    """Opens after threshold consecutive failures, lets one trial call through per cooldown"""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # Half open: this call is the trial, others keep failing until it succeeds
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+class LLMClient:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, requests_per_minute=REQUESTS_PER_MINUTE):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.circuit = CircuitBreaker(FAILURE_THRESHOLD, CIRCUIT_COOLDOWN_SECONDS)
+
+    def generate_content(self, parts, model, generation_config=None, timeout=None):
+        """
+        Send a generateContent request
+
+        Args:
+            parts (list): Prompt texts, sent as the parts of one user message
+            model (str): Model name, e.g. "gemini-2.0-flash"
+            generation_config (dict, optional): Gemini generationConfig
+            timeout (float, optional): Read timeout in seconds, defaults to READ_TIMEOUT_SECONDS
+
+        Returns:
+            str: Text of the first candidate, empty if the model returned none
+
+        Raises:
+            LLMUnavailableError: The request was not sent
+            LLMError: The request failed
+        """
+        api_key = get_api_key()
+        if not api_key:
+            raise LLMError("Gemini API key is not configured")
+
+        if not self.circuit.allow():
+            raise LLMUnavailableError("LLM requests are paused after repeated failures")
+        if not self.rate_limiter.acquire(MAX_WAIT_SECONDS):
+            raise LLMUnavailableError("LLM rate limit reached")
+        if not self.slots.acquire(timeout=MAX_WAIT_SECONDS):
+            raise LLMUnavailableError("Too many LLM requests in flight")
+
+        try:
+            response = self.session.post(
+                f"{get_base_url()}/models/{model}:generateContent",
+                params={"key": api_key},
+                json={
+                    "contents": [{"role": "user", "parts": [{"text": part} for part in parts]}],
+                    "generationConfig": generation_config or {}
+                },
+                timeout=(CONNECT_TIMEOUT_SECONDS, timeout or READ_TIMEOUT_SECONDS)
+            )
+        except requests.RequestException as e:
+            self.circuit.record_failure()
+            raise LLMError(f"LLM request failed: {e}") from e
+        finally:
+            self.slots.release()
+
+        # Only upstream trouble trips the circuit, a rejected request would fail the same way again
+        if response.status_code == 429 or response.status_code >= 500:
+            self.circuit.record_failure()
+        else:
+            self.circuit.record_success()
+
+        if not response.ok:
+            raise LLMError(f"LLM request failed: {response.status_code} {response.text[:500]}")
+
+        return extract_text(response.json())
+
+def get_client():
+    """The LLM client of this process, created on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient(
+                max_concurrency=frappe.conf.get("llm_max_concurrency") or MAX_CONCURRENCY,
+                requests_per_minute=frappe.conf.get("llm_requests_per_minute") or REQUESTS_PER_MINUTE
+            )
+        return _client
+
+def generate_content(parts, model, generation_config=None, timeout=None):
+    """Send a generateContent request with the process-wide client, see LLMClient.generate_content"""
+    return get_client().generate_content(parts, model, generation_config=generation_config, timeout=timeout)
@@ -0,0 +1,271 @@
+import frappe
+import redis
+from frappe.utils import get_datetime
+from datetime import datetime
+from redis.exceptions import RedisError
+
+# Materialized per-user, per-topic index of SRS cards ordered by due time.
+#
+# Every (user, topic) pair owns a Redis sorted set whose members are
+# "<progress name>|<flashcard>" and whose scores are the epoch value of
+# next_review_timestamp. Due and upcoming cards are read with score ranges, so a
+# card moves from "upcoming" to "due" as time passes without any rescan.
+#
+# Keys are built with make_key and used with raw Redis commands. Frappe's wrapped
+# exists, smembers and srem would apply make_key a second time, so those are called
+# on redis.Redis directly.
+
+INDEX_TTL_SECONDS = 7 * 24 * 60 * 60
+
+def get_topic_key(user, topic):
+    return frappe.cache().make_key(f"srs_due_index|{user}|{topic}")
+
+def get_topics_key(user):
+    return frappe.cache().make_key(f"srs_due_index_topics|{user}")
+
+def get_built_key(user):
+    return frappe.cache().make_key(f"srs_due_index_built|{user}")
+
+def to_score(timestamp):
+    return get_datetime(timestamp).timestamp()
+
+def from_score(score):
+    return datetime.fromtimestamp(score)
+
+def make_member(progress_name, flashcard):
+    return f"{progress_name}|{flashcard}"
+
+def parse_member(member, score):
+    if isinstance(member, bytes):
+        member = member.decode()
+    progress_name, flashcard = member.split("|", 1)
+    return frappe._dict({
+        "name": progress_name,
+        "flashcard": flashcard,
+        "next_review_timestamp": from_score(score)
+    })
+
+def get_progress_rows(user, end=None, start=None):
+    """
+    Load scheduled SRS cards of a user together with their topic
+
+    With end (and optionally start) only cards in the window start < next_review_timestamp <= end
+    are returned. The range is served by the (user, next_review_timestamp) index.
+
+    Args:
+        user (str): User ID
+        end (datetime, optional): Inclusive end of the window
+        start (datetime, optional): Exclusive start of the window
+
+    Returns:
+        list: Rows with name, flashcard, topic and next_review_timestamp, ordered by next review
+    """
+    conditions = ["progress.user = %(user)s", "progress.next_review_timestamp IS NOT NULL"]
+    if start:
+        conditions.append("progress.next_review_timestamp > %(start)s")
+    if end:
+        conditions.append("progress.next_review_timestamp <= %(end)s")
+
+    return frappe.db.sql(f"""
+        SELECT progress.name, progress.flashcard, progress.next_review_timestamp, flashcard.topic
+        FROM `tabUser SRS Progress` progress
+        INNER JOIN `tabFlashcard` flashcard ON flashcard.name = progress.flashcard
+        WHERE {" AND ".join(conditions)}
+        ORDER BY progress.next_review_timestamp
+    """, {"user": user, "start": start, "end": end}, as_dict=True)
+
+def get_review_window(next_review, now, upcoming_date):
+    """
+    Classify a next review time into the due or upcoming window
+
+    The windows are disjoint: due is next_review <= now, upcoming is now < next_review <= upcoming_date.
+
+    Args:
+        next_review (datetime): Next review timestamp of a card
+        now (datetime): End of the due window
+        upcoming_date (datetime): End of the upcoming window
+
+    Returns:
+        str: "due", "upcoming" or None when the card is outside both windows
+    """
+    if not next_review:
+        return None
+    next_review = get_datetime(next_review)
+    if next_review <= get_datetime(now):
+        return "due"
+    if next_review <= get_datetime(upcoming_date):
+        return "upcoming"
+    return None
+
+def rebuild_index(user):
+    """
+    Rebuild the due index of a user from User SRS Progress
+
+    Args:
+        user (str): User ID
+    """
+    cache = frappe.cache()
+    topics_key = get_topics_key(user)
+
+    pipeline = cache.pipeline()
+    for topic in redis.Redis.smembers(cache, topics_key):
+        pipeline.delete(get_topic_key(user, topic.decode()))
+    pipeline.delete(topics_key)
+
+    topic_keys = set()
+    for row in get_progress_rows(user):
+        if not row.topic:
+            continue
+        topic_key = get_topic_key(user, row.topic)
+        topic_keys.add(topic_key)
+        pipeline.zadd(topic_key, {make_member(row.name, row.flashcard): to_score(row.next_review_timestamp)})
+        pipeline.sadd(topics_key, row.topic)
+
+    # Expire the whole index together so it is periodically rebuilt from the table
+    for key in topic_keys | {topics_key}:
+        pipeline.expire(key, INDEX_TTL_SECONDS)
+    pipeline.set(get_built_key(user), 1, ex=INDEX_TTL_SECONDS)
+    pipeline.execute()
+
+def get_due_cards(user, now, upcoming_date):
+    """
+    Get due and upcoming SRS cards of a user grouped by topic
+
+    Args:
+        user (str): User ID
+        now (datetime): Cards scheduled at or before this time are due
+        upcoming_date (datetime): End of the upcoming window
+
+    Returns:
+        dict: Topic ID mapped to {"due": [...], "upcoming": [...]}, each list ordered by next review
+    """
+    try:
+        return get_due_cards_from_index(user, now, upcoming_date)
+    except RedisError as e:
+        frappe.logger().warning(f"SRS due index unavailable for user {user}, reading progress table: {e}")
+        return get_due_cards_from_rows(get_progress_rows(user, end=upcoming_date), now, upcoming_date)
+
+def get_due_cards_from_index(user, now, upcoming_date, retry=True):
+    cache = frappe.cache()
+    if not redis.Redis.exists(cache, get_built_key(user)):
+        rebuild_index(user)
+
+    topics = sorted(topic.decode() for topic in redis.Redis.smembers(cache, get_topics_key(user)))
+    now_score = to_score(now)
+    upcoming_score = to_score(upcoming_date)
+
+    pipeline = cache.pipeline()
+    for topic in topics:
+        topic_key = get_topic_key(user, topic)
+        pipeline.exists(topic_key)
+        pipeline.zrangebyscore(topic_key, "-inf", now_score, withscores=True)
+        pipeline.zrangebyscore(topic_key, f"({now_score}", upcoming_score, withscores=True)
+    results = pipeline.execute()
+
+    topic_cards = {}
+    for position, topic in enumerate(topics):
+        exists, due, upcoming = results[position * 3:position * 3 + 3]
+        if not exists:
+            # A topic set was evicted from the cache, the index can no longer be trusted
+            if retry:
+                rebuild_index(user)
+                return get_due_cards_from_index(user, now, upcoming_date, retry=False)
+            continue
+
+        if due or upcoming:
+            topic_cards[topic] = {
+                "due": [parse_member(member, score) for member, score in due],
+                "upcoming": [parse_member(member, score) for member, score in upcoming]
+            }
+
+    return topic_cards
+
+def get_due_cards_from_rows(rows, now, upcoming_date):
+    topic_cards = {}
+    for row in rows:
+        window = get_review_window(row.next_review_timestamp, now, upcoming_date)
+        if not row.topic or not window:
+            continue
+        topic_cards.setdefault(row.topic, {"due": [], "upcoming": []})[window].append(frappe._dict({
+            "name": row.name,
+            "flashcard": row.flashcard,
+            "next_review_timestamp": get_datetime(row.next_review_timestamp)
+        }))
+
+    return topic_cards
+
+def update_card(user, progress_name, flashcard, next_review, topic=None):
+    """
+    Schedule an index update for a card once the current transaction commits
+
+    Args:
+        user (str): User ID
+        progress_name (str): Name of the User SRS Progress record
+        flashcard (str): Name of the flashcard
+        next_review (datetime): New next_review_timestamp
+        topic (str, optional): Topic of the flashcard, looked up if not given
+    """
+    if not next_review:
+        return remove_card(user, progress_name, flashcard, topic)
+
+    topic = topic or frappe.get_cached_value("Flashcard", flashcard, "topic")
+    if not topic:
+        return
+
+    def apply():
+        try:
+            cache = frappe.cache()
+            # Nothing to update until the index is built on the next read
+            if not redis.Redis.exists(cache, get_built_key(user)):
+                return
+            topic_key = get_topic_key(user, topic)
+            pipeline = cache.pipeline()
+            pipeline.zadd(topic_key, {make_member(progress_name, flashcard): to_score(next_review)})
+            pipeline.sadd(get_topics_key(user), topic)
+            pipeline.expire(topic_key, INDEX_TTL_SECONDS)
+            pipeline.execute()
+        except RedisError as e:
+            invalidate_index(user)
+            frappe.logger().warning(f"Could not update SRS due index for user {user}: {e}")
+
+    frappe.db.after_commit.add(apply)
+
+def remove_card(user, progress_name, flashcard, topic=None):
+    """
+    Schedule removal of a card from the index once the current transaction commits
+
+    Args:
+        user (str): User ID
+        progress_name (str): Name of the User SRS Progress record
+        flashcard (str): Name of the flashcard
+        topic (str, optional): Topic of the flashcard, looked up if not given
+    """
+    topic = topic or frappe.db.get_value("Flashcard", flashcard, "topic")
+
+    def apply():
+        try:
+            cache = frappe.cache()
+            if not topic:
+                cache.delete(get_built_key(user))
+                return
+            topic_key = get_topic_key(user, topic)
+            cache.zrem(topic_key, make_member(progress_name, flashcard))
+            if not cache.zcard(topic_key):
+                redis.Redis.srem(cache, get_topics_key(user), topic)
+        except RedisError as e:
+            invalidate_index(user)
+            frappe.logger().warning(f"Could not update SRS due index for user {user}: {e}")
+
+    frappe.db.after_commit.add(apply)
+
+def invalidate_index(user):
+    """
+    Drop the index of a user so that it is rebuilt on the next read
+
+    Args:
+        user (str): User ID
+    """
+    try:
+        frappe.cache().delete(get_built_key(user))
+    except RedisError:
+        pass
@@ -0,0 +1,380 @@
+from datetime import timedelta
+
+# SM-2 scheduler used by the SRS endpoints.
+#
+# The state machine is kept free of database access so it can be reused for bulk
+# recomputation, simulation and forecasting. next_state handles one card,
+# next_states applies the same transitions to whole NumPy arrays and produces
+# bit-identical results.
+
+# Map user ratings to internal ratings
+RATING_MAP = {
+    "wrong": "again",  # User got it wrong
+    "again": "again",  # User got it wrong
+    "hard": "hard",    # Remembered with difficulty
+    "correct": "good", # User got it right
+    "good": "good",    # User got it right
+    "easy": "easy"     # User got it perfectly
+}
+
+# Quality scores for SM-2 algorithm (0-5)
+QUALITY_SCORES = {
+    "again": 0,  # Complete blackout
+    "hard": 1,   # Correct but with serious difficulty
+    "good": 3,   # Correct with some difficulty
+    "easy": 5    # Perfect recall
+}
+
+# Integer codes used by the batched path
+STATUSES = ["new", "learning", "review", "lapsed"]
+RATINGS = ["again", "hard", "good", "easy"]
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+RATING_CODES = {rating: code for code, rating in enumerate(RATINGS)}
+UNKNOWN_STATUS = -1
+
+def get_internal_rating(user_rating):
+    """Standardize a user rating, unknown ratings count as a failed review"""
+    return RATING_MAP.get(user_rating, "again")
+
+def next_state(status, interval_days, ease_factor, repetitions, learning_step, user_rating):
+    """
+    Apply one rating to a single card
+
+    Args:
+        status (str): Current status ("new", "learning", "review" or "lapsed")
+        interval_days (float): Current interval in days
+        ease_factor (float): Current ease factor
+        repetitions (int): Number of successful reviews in a row
+        learning_step (int): Current learning step
+        user_rating (str): User's rating (e.g., "correct", "wrong")
+
+    Returns:
+        dict: New status, interval_days, ease_factor, repetitions and learning_step
+    """
+    internal_rating = get_internal_rating(user_rating)
+    quality = QUALITY_SCORES[internal_rating]
+
+    interval = float(interval_days)
+    ease_factor = float(ease_factor)
+    repetitions = int(repetitions)
+    learning_step = int(learning_step)
+
+    if status == "new" or status == "learning":
+        # Initial learning phase
+        if internal_rating == "again":  # Failed
+            status = "learning"
+            learning_step = 0
+            interval = 0.0  # Review again in the same session
+        elif internal_rating == "hard":  # Hard but passed
+            learning_step += 1
+            if learning_step >= 2:  # Move to review after passing twice
+                status = "review"
+                repetitions = 1
+                interval = 1.0  # First interval is 1 day
+            else:
+                status = "learning"
+                interval = 0.5  # 12 hours
+        elif internal_rating == "good":  # Good
+            learning_step += 1
+            if learning_step >= 2:  # Move to review after passing twice
+                status = "review"
+                repetitions = 1
+                interval = 1.0  # First interval is 1 day
+            else:
+                status = "learning"
+                interval = 0.25  # 6 hours
+        elif internal_rating == "easy":  # Easy
+            status = "review"
+            repetitions = 1
+            interval = 3.0  # Skip to 3 days for easy cards
+
+    elif status == "review" or status == "lapsed":
+        # Regular review phase (SM-2 algorithm)
+        if internal_rating == "again":  # Failed review
+            status = "lapsed"
+            repetitions = 0
+            learning_step = 0
+            interval = 0.0  # Relearn immediately
+        else:
+            # Update ease factor based on quality
+            ease_factor = max(1.3, ease_factor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+
+            if internal_rating == "hard":
+                # Hard cards get a shorter interval
+                interval = max(1.0, interval * 1.2)
+            elif internal_rating == "good":
+                # Standard interval increase
+                if repetitions == 0:
+                    interval = 1.0
+                elif repetitions == 1:
+                    interval = 3.0
+                else:
+                    interval = interval * ease_factor
+            elif internal_rating == "easy":
+                # Easy cards get a longer interval
+                if repetitions == 0:
+                    interval = 3.0
+                else:
+                    interval = interval * ease_factor * 1.3
+
+            repetitions += 1
+            status = "review"
+
+    return {
+        "status": status,
+        "interval_days": interval,
+        "ease_factor": ease_factor,
+        "repetitions": repetitions,
+        "learning_step": learning_step
+    }
+
+def get_review_offset_seconds(interval_days):
+    """
+    Delay until the next review for an interval
+
+    Intervals under a day are scheduled in whole hours, longer ones in whole days.
+
+    Args:
+        interval_days (float): Interval in days
+
+    Returns:
+        int: Delay in seconds
+    """
+    if interval_days < 1:
+        return int(interval_days * 24) * 3600
+    return int(interval_days) * 86400
+
+def get_next_review(reviewed_at, interval_days):
+    """
+    Next review time for a card reviewed at reviewed_at
+
+    Args:
+        reviewed_at (datetime): Time of the review
+        interval_days (float): New interval in days
+
+    Returns:
+        datetime: Next review timestamp
+    """
+    return reviewed_at + timedelta(seconds=get_review_offset_seconds(interval_days))
+
+def encode_statuses(statuses):
+    """Convert status names to codes, unknown statuses become UNKNOWN_STATUS"""
+    import numpy as np
+
+    return np.array([STATUS_CODES.get(status, UNKNOWN_STATUS) for status in statuses], dtype=np.int64)
+
+def decode_statuses(codes):
+    """Convert status codes back to names"""
+    return [STATUSES[code] if 0 <= code < len(STATUSES) else None for code in codes]
+
+def encode_ratings(user_ratings):
+    """Convert user ratings to internal rating codes"""
+    import numpy as np
+
+    return np.array([RATING_CODES[get_internal_rating(rating)] for rating in user_ratings], dtype=np.int64)
+
+def next_states(statuses, interval_days, ease_factors, repetitions, learning_steps, ratings):
+    """
+    Apply one rating to each card of a batch
+
+    Gives bit-identical results to calling next_state card by card.
+
+    Args:
+        statuses (array): Status codes (see STATUS_CODES) or status names
+        interval_days (array): Current intervals in days
+        ease_factors (array): Current ease factors
+        repetitions (array): Current repetitions
+        learning_steps (array): Current learning steps
+        ratings (array): Internal rating codes (see RATING_CODES) or user ratings
+
+    Returns:
+        dict: Arrays for status (codes), interval_days, ease_factor, repetitions and learning_step
+    """
+    import numpy as np
+
+    status = np.asarray(statuses)
+    if status.dtype.kind not in "iu":
+        status = encode_statuses(status)
+    status = status.astype(np.int64)
+
+    rating = np.asarray(ratings)
+    if rating.dtype.kind not in "iu":
+        rating = encode_ratings(rating)
+    rating = rating.astype(np.int64)
+
+    interval = np.asarray(interval_days, dtype=np.float64)
+    ease = np.asarray(ease_factors, dtype=np.float64)
+    reps = np.asarray(repetitions, dtype=np.int64)
+    step = np.asarray(learning_steps, dtype=np.int64)
+
+    new_status = status.copy()
+    new_interval = interval.copy()
+    new_ease = ease.copy()
+    new_reps = reps.copy()
+    new_step = step.copy()
+
+    again = rating == RATING_CODES["again"]
+    hard = rating == RATING_CODES["hard"]
+    good = rating == RATING_CODES["good"]
+    easy = rating == RATING_CODES["easy"]
+
+    # Initial learning phase
+    learning = (status == STATUS_CODES["new"]) | (status == STATUS_CODES["learning"])
+
+    failed = learning & again
+    new_status[failed] = STATUS_CODES["learning"]
+    new_step[failed] = 0
+    new_interval[failed] = 0.0
+
+    passed = learning & (hard | good)
+    new_step[passed] = step[passed] + 1
+    graduated = passed & (new_step >= 2)
+    new_status[graduated] = STATUS_CODES["review"]
+    new_reps[graduated] = 1
+    new_interval[graduated] = 1.0
+    stepped = passed & ~graduated
+    new_status[stepped] = STATUS_CODES["learning"]
+    new_interval[stepped & hard] = 0.5
+    new_interval[stepped & good] = 0.25
+
+    skipped = learning & easy
+    new_status[skipped] = STATUS_CODES["review"]
+    new_reps[skipped] = 1
+    new_interval[skipped] = 3.0
+
+    # Regular review phase (SM-2 algorithm)
+    reviewing = (status == STATUS_CODES["review"]) | (status == STATUS_CODES["lapsed"])
+
+    lapsed = reviewing & again
+    new_status[lapsed] = STATUS_CODES["lapsed"]
+    new_reps[lapsed] = 0
+    new_step[lapsed] = 0
+    new_interval[lapsed] = 0.0
+
+    recalled = reviewing & ~again
+    quality = np.array([QUALITY_SCORES[name] for name in RATINGS], dtype=np.int64)[rating]
+    updated_ease = np.maximum(1.3, ease + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+    new_ease[recalled] = updated_ease[recalled]
+
+    recalled_hard = recalled & hard
+    new_interval[recalled_hard] = np.maximum(1.0, interval[recalled_hard] * 1.2)
+
+    recalled_good = recalled & good
+    new_interval[recalled_good & (reps == 0)] = 1.0
+    new_interval[recalled_good & (reps == 1)] = 3.0
+    grown = recalled_good & (reps > 1)
+    new_interval[grown] = interval[grown] * updated_ease[grown]
+
+    recalled_easy = recalled & easy
+    new_interval[recalled_easy & (reps == 0)] = 3.0
+    boosted = recalled_easy & (reps != 0)
+    new_interval[boosted] = interval[boosted] * updated_ease[boosted] * 1.3
+
+    new_reps[recalled] = reps[recalled] + 1
+    new_status[recalled] = STATUS_CODES["review"]
+
+    return {
+        "status": new_status,
+        "interval_days": new_interval,
+        "ease_factor": new_ease,
+        "repetitions": new_reps,
+        "learning_step": new_step
+    }
+
+def get_review_offsets_seconds(interval_days):
+    """
+    Batched get_review_offset_seconds
+
+    Args:
+        interval_days (array): Intervals in days
+
+    Returns:
+        array: Delays in seconds (int64)
+    """
+    import numpy as np
+
+    interval = np.asarray(interval_days, dtype=np.float64)
+    return np.where(
+        interval < 1,
+        np.trunc(interval * 24).astype(np.int64) * 3600,
+        np.trunc(interval).astype(np.int64) * 86400
+    )
+
+# Expected rating mix used when projecting future reviews
+DEFAULT_RATING_PROBABILITIES = {
+    "again": 0.1,
+    "hard": 0.15,
+    "good": 0.6,
+    "easy": 0.15
+}
+
+# Upper bound on reviews simulated per card, protects against cards that keep failing
+MAX_SIMULATION_PASSES = 64
+
+def simulate_review_load(statuses, interval_days, ease_factors, repetitions, learning_steps,
+        review_offsets, groups, group_count, days, rating_probabilities=None, seed=0):
+    """
+    Project how many reviews fall on each of the next days by replaying the scheduler
+
+    Every card due inside the horizon is reviewed at its due time with a rating drawn
+    from rating_probabilities, rescheduled with next_states and counted again if its
+    next review still falls inside the horizon.
+
+    Args:
+        statuses (array): Status codes
+        interval_days (array): Current intervals in days
+        ease_factors (array): Current ease factors
+        repetitions (array): Current repetitions
+        learning_steps (array): Current learning steps
+        review_offsets (array): Seconds from the start of today until each card is due,
+            overdue cards should already be clipped to the current time
+        groups (array): Group index (e.g. topic) of each card, in range(group_count)
+        group_count (int): Number of groups
+        days (int): Number of days to project, starting today
+        rating_probabilities (dict, optional): Internal rating mapped to its probability
+        seed (int): Seed for the rating draws, keeps projections reproducible
+
+    Returns:
+        array: Review counts with shape (days, group_count)
+    """
+    import numpy as np
+
+    probabilities = rating_probabilities or DEFAULT_RATING_PROBABILITIES
+    weights = np.array([float(probabilities.get(rating, 0)) for rating in RATINGS])
+    weights = weights / weights.sum()
+    rng = np.random.default_rng(seed)
+
+    state = {
+        "status": np.asarray(statuses, dtype=np.int64).copy(),
+        "interval_days": np.asarray(interval_days, dtype=np.float64).copy(),
+        "ease_factor": np.asarray(ease_factors, dtype=np.float64).copy(),
+        "repetitions": np.asarray(repetitions, dtype=np.int64).copy(),
+        "learning_step": np.asarray(learning_steps, dtype=np.int64).copy()
+    }
+    due_at = np.asarray(review_offsets, dtype=np.int64).copy()
+    groups = np.asarray(groups, dtype=np.int64)
+    horizon = days * 86400
+
+    counts = np.zeros((days, group_count), dtype=np.int64)
+    for _ in range(MAX_SIMULATION_PASSES):
+        reviewed = np.flatnonzero(due_at < horizon)
+        if not reviewed.size:
+            break
+
+        np.add.at(counts, (due_at[reviewed] // 86400, groups[reviewed]), 1)
+
+        ratings = rng.choice(len(RATINGS), size=reviewed.size, p=weights)
+        updated = next_states(
+            state["status"][reviewed],
+            state["interval_days"][reviewed],
+            state["ease_factor"][reviewed],
+            state["repetitions"][reviewed],
+            state["learning_step"][reviewed],
+            ratings
+        )
+        for field, values in updated.items():
+            state[field][reviewed] = values
+
+        due_at[reviewed] += get_review_offsets_seconds(updated["interval_days"])
+
+    return counts
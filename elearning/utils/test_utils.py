@@ -1,6 +1,253 @@
+import threading
+from collections import OrderedDict
+
 import frappe
 from frappe import _
 import frappe.utils
+from redis.exceptions import RedisError
+from elearning.utils.child_tables import get_child_rows
+
+# Compiled test payloads for the test-taking UI.
+#
+# A payload holds the test metadata and its questions without answer keys. It is built
+# once per test version together with the grading index of the test, which never leaves
+# the server. Both are stored in Redis under test_payload|...|{version}. The current
+# version of a test is a random token in test_questions_{name}, the key that has always
+# been cleared when a test changes. Invalidation replaces the token and deleting the key
+# makes the next reader draw a new one, a token is never reused. A reader that compiled
+# the test from data read before a change therefore only fills a version that is no
+# longer current. Every process also keeps the tests it has served most recently, so a
+# request only reads the token unless the test has changed.
+
+PAYLOAD_TTL_SECONDS = 24 * 60 * 60
+
+# Compiled tests kept per process
+LOCAL_PAYLOAD_LIMIT = 256
+
+# Bump when the payload layout changes so entries written by older code are ignored
+PAYLOAD_FORMAT = 3
+
+TEST_PAYLOAD_FIELDS = ["name", "title", "time_limit_minutes", "instructions", "is_active", "passing_score"]
+QUESTION_PAYLOAD_FIELDS = ["name", "content", "image_url", "question_type", "hint", "answer_key"]
+
+_local_payloads = OrderedDict()
+_local_payloads_lock = threading.Lock()
+
+def get_payload_version_key(test_id):
+    return frappe.cache().make_key(f"test_questions_{test_id}")
+
+def new_payload_version():
+    return frappe.generate_hash(length=12)
+
+def get_payload_version(test_id):
+    """Current payload version of a test, a new one is drawn if the key was cleared"""
+    cache = frappe.cache()
+    version_key = get_payload_version_key(test_id)
+    version = cache.get(version_key)
+    if version is None:
+        cache.set(version_key, new_payload_version(), ex=PAYLOAD_TTL_SECONDS, nx=True)
+        version = cache.get(version_key)
+    # Cleared again right after it was drawn, this reader's payload is simply not shared
+    return version.decode() if version else new_payload_version()
+
+def get_payload_key(test_id, version):
+    return f"test_payload|{PAYLOAD_FORMAT}|{test_id}|{version}"
+
+def normalize_answer_key(answer_key):
+    return str(answer_key).strip().lower() if answer_key else None
+
+def build_compiled_test(test_id):
+    """
+    Compile the payload and the grading index of a test from the database
+    
+    Args:
+        test_id (str): The ID of the Test document
+        
+    Returns:
+        dict: "payload" with id, title, time_limit_minutes, instructions, is_active and
+            questions in test order, "grading" with passing_score and items, see
+            get_grading_index. None if the test does not exist
+    """
+    test = frappe.db.get_value("Test", test_id, TEST_PAYLOAD_FIELDS, as_dict=True)
+    if not test:
+        return None
+    
+    items = frappe.get_all(
+        "Test Question Item",
+        filters={"parent": test_id, "parenttype": "Test", "parentfield": "questions"},
+        fields=["name", "question", "points", "idx"],
+        order_by="idx"
+    )
+    
+    question_names = list({item.question for item in items if item.question})
+    questions = {
+        question.name: question
+        for question in frappe.get_all(
+            "Question",
+            filters={"name": ["in", question_names]},
+            fields=QUESTION_PAYLOAD_FIELDS
+        )
+    } if question_names else {}
+    
+    options_by_question = get_child_rows(
+        "Question Option Item",
+        [name for name, question in questions.items() if question.question_type == "Multiple Choice"],
+        ["name", "option_text", "is_correct"]
+    )
+    
+    compiled_questions = []
+    grading_items = {}
+    for item in items:
+        question = questions.get(item.question)
+        
+        # Answers to a question that no longer exists are kept but not graded
+        grading_items[item.name] = {
+            "question": item.question,
+            "question_type": question.question_type if question else None,
+            "content": question.content if question else None,
+            "correct_option": None,
+            "answer_key": normalize_answer_key(question.answer_key) if question else None,
+            "points": item.points or 1,
+            "idx": item.idx
+        }
+        
+        if not question:
+            frappe.log_error(f"Question {item.question} linked in Test {test_id} (Test Question Item: {item.name}) not found.", "TestDataError")
+            continue
+        
+        options = None
+        if question.question_type == "Multiple Choice":
+            options = []
+            for idx, option in enumerate(options_by_question.get(question.name, [])):
+                options.append({"id": option.name, "text": option.option_text, "label": chr(65 + idx)})
+                if option.is_correct and not grading_items[item.name]["correct_option"]:
+                    grading_items[item.name]["correct_option"] = option.name
+        
+        compiled_questions.append({
+            "test_question_detail_id": item.name,
+            "question_id": question.name,
+            "content": question.content,
+            "image": question.image_url,
+            "question_type": question.question_type,
+            "options": options,
+            "hint": question.hint,
+            "point_value": item.points,
+            "question_order": item.idx
+        })
+    
+    return {
+        "payload": {
+            "id": test.name,
+            "title": test.title,
+            "time_limit_minutes": test.time_limit_minutes,
+            "instructions": test.instructions,
+            "is_active": test.is_active,
+            "questions": compiled_questions
+        },
+        "grading": {
+            "passing_score": test.passing_score,
+            "items": grading_items
+        }
+    }
+
+def get_local_payload(local_key, version):
+    with _local_payloads_lock:
+        cached = _local_payloads.get(local_key)
+        if not cached or cached[0] != version:
+            return None
+        _local_payloads.move_to_end(local_key)
+        return cached[1]
+
+def set_local_payload(local_key, version, compiled):
+    with _local_payloads_lock:
+        _local_payloads[local_key] = (version, compiled)
+        _local_payloads.move_to_end(local_key)
+        while len(_local_payloads) > LOCAL_PAYLOAD_LIMIT:
+            _local_payloads.popitem(last=False)
+
+def get_compiled_test(test_id):
+    """
+    Get the compiled test from the process cache, Redis or the database, in that order
+    
+    The result is shared between requests of this process and must not be modified.
+    
+    Args:
+        test_id (str): The ID of the Test document
+        
+    Returns:
+        dict: See build_compiled_test, None if the test does not exist
+    """
+    local_key = (frappe.local.site, test_id)
+    try:
+        cache = frappe.cache()
+        version = get_payload_version(test_id)
+        
+        compiled = get_local_payload(local_key, version)
+        if compiled is not None:
+            return compiled
+        
+        payload_key = get_payload_key(test_id, version)
+        compiled = cache.get_value(payload_key)
+        if compiled is None:
+            compiled = build_compiled_test(test_id)
+            if compiled is None:
+                return None
+            cache.set_value(payload_key, compiled, expires_in_sec=PAYLOAD_TTL_SECONDS)
+        
+        set_local_payload(local_key, version, compiled)
+        return compiled
+    except RedisError as e:
+        frappe.logger().warning(f"Test payload cache unavailable for test {test_id}, reading database: {e}")
+        return build_compiled_test(test_id)
+
+def get_test_payload(test_id):
+    """
+    Get the compiled payload of a test for the test-taking UI, without answer keys
+    
+    Args:
+        test_id (str): The ID of the Test document
+        
+    Returns:
+        dict: id, title, time_limit_minutes, instructions, is_active and questions,
+            None if the test does not exist. Shared, must not be modified
+    """
+    compiled = get_compiled_test(test_id)
+    return compiled["payload"] if compiled else None
+
+def get_grading_index(test_id):
+    """
+    Get the grading index of a test, compiled and cached with its payload
+    
+    Args:
+        test_id (str): The ID of the Test document
+        
+    Returns:
+        dict: passing_score and items, Test Question Item name mapped to question,
+            question_type (None if the question is missing), content, correct_option,
+            answer_key (stripped, lower case), points and idx (position in the test).
+            None if the test does not exist. Shared, must not be modified
+    """
+    compiled = get_compiled_test(test_id)
+    return compiled["grading"] if compiled else None
+
+def invalidate_test_payload(test_id):
+    """
+    Move a test to a new payload version, now and again once the transaction commits
+    
+    Args:
+        test_id (str): The ID of the Test document
+    """
+    def bump():
+        with _local_payloads_lock:
+            _local_payloads.pop((frappe.local.site, test_id), None)
+        try:
+            frappe.cache().set(get_payload_version_key(test_id), new_payload_version(), ex=PAYLOAD_TTL_SECONDS)
+        except RedisError as e:
+            frappe.logger().warning(f"Could not invalidate payload of test {test_id}: {e}")
+    
+    # Readers elsewhere may rebuild from uncommitted data until the commit bumps the version again
+    bump()
+    frappe.db.after_commit.add(bump)
 
 def on_test_update(doc, method):
     """
@@ -11,7 +258,7 @@ def on_test_update(doc, method):
         method (str): The method that triggered this hook
     """
     # Clear any cached data for this test
-    frappe.cache().delete_key(f"test_questions_{doc.name}")
+    invalidate_test_payload(doc.name)
     
     # Log an audit message
     frappe.log_error(
@@ -19,6 +266,32 @@ def on_test_update(doc, method):
         title="Test Updated"
     )
 
+def on_test_trash(doc, method):
+    """
+    Hook handler when a Test document is deleted
+    
+    Args:
+        doc (Document): The Test document
+        method (str): The method that triggered this hook
+    """
+    invalidate_test_payload(doc.name)
+
+def on_question_change(doc, method):
+    """
+    Hook handler when a Question is updated or deleted, the tests using it are recompiled
+    
+    Args:
+        doc (Document): The Question document
+        method (str): The method that triggered this hook
+    """
+    for test_id in frappe.get_all(
+        "Test Question Item",
+        filters={"question": doc.name, "parenttype": "Test"},
+        pluck="parent",
+        distinct=True
+    ):
+        invalidate_test_payload(test_id)
+
 def after_test_created(doc, method):
     """
     Hook handler when a Test document is created
@@ -9,11 +9,13 @@ import { CheckCircle, ThumbsUp } from "lucide-react";
  * @param {string} [props.title="Feedback Overall"] - The title for the feedback section.
  * @param {string[]} [props.feedback=[]] - An array of feedback strings to display.
  * @param {'checkCircle' | 'thumbsUp'} [props.icon='checkCircle'] - Which icon to display next to the title.
+ * @param {boolean} [props.pending=false] - Whether the feedback is still being generated.
  */
 export default function TestResultFeedback({
   title = "Feedback Overall",
   feedback = "", // Default to empty array
   icon = "checkCircle",
+  pending = false,
 }) {
   // Determine the icon component and color based on the icon prop
   const IconComponent = icon === "checkCircle" ? CheckCircle : ThumbsUp;
@@ -31,6 +33,10 @@ export default function TestResultFeedback({
 
       {feedback ? (
         <p className="text-sm pl-1">{feedback}</p>
+      ) : pending ? (
+        <p className="text-sm text-gray-500 pl-7">
+          Generating {title.toLowerCase()}...
+        </p>
       ) : (
         <p className="text-sm text-gray-500 pl-7">
           No {title.toLowerCase()} available.
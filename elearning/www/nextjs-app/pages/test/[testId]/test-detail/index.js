@@ -1,6 +1,12 @@
 "use client";
 
-import React, { useState, useEffect, useCallback, useMemo } from "react";
+import React, {
+  useState,
+  useEffect,
+  useCallback,
+  useMemo,
+  useRef,
+} from "react";
 
 import { useRouter } from "next/router";
 
@@ -55,6 +61,8 @@ export default function TestDetail() {
     attemptStartData?.attempt?.remaining_time_seconds;
   const initialLastViewedQuestionDetailId =
     attemptStartData?.attempt?.last_viewed_question_id;
+  const initialProgressRevision =
+    attemptStartData?.attempt?.progress_revision ?? 0;
 
   // --- Navigation ---
   const initialQuestionIndex = useMemo(() => {
@@ -95,6 +103,16 @@ export default function TestDetail() {
   const [isSaving, setIsSaving] = useState(false);
   const [submitting, setSubmitting] = useState(false); // Moved up for use in debouncedSaveProgress
 
+  // Autosave sends only the answers changed since the last successful save, with a
+  // revision the server uses to reject saves that arrive out of order
+  const lastSavedAnswersRef = useRef({});
+  const progressRevisionRef = useRef(0);
+
+  useEffect(() => {
+    progressRevisionRef.current = initialProgressRevision;
+    lastSavedAnswersRef.current = {};
+  }, [testAttemptId, initialProgressRevision]);
+
   const currentQuestionData = useMemo(
     () => questionsFromAttempt[currentQuestionIndex],
     [questionsFromAttempt, currentQuestionIndex]
@@ -165,10 +183,24 @@ export default function TestDetail() {
       const currentAnswersForSave =
         getAnswersForSubmission(questionsFromAttempt);
 
+      const serializedAnswers = {};
+      const changedAnswers = {};
+      Object.entries(currentAnswersForSave).forEach(([questionId, answer]) => {
+        serializedAnswers[questionId] = JSON.stringify(answer);
+        if (
+          lastSavedAnswersRef.current[questionId] !==
+          serializedAnswers[questionId]
+        ) {
+          changedAnswers[questionId] = answer;
+        }
+      });
+      const revision = progressRevisionRef.current + 1;
+
       // Create the progress_data object
       const progressData = {
 
-        answers: currentAnswersForSave,
+        answers: changedAnswers,
+        revision,
         remainingTimeSeconds: countdown,
         lastViewedTestQuestionId: currentQuestionData.testQuestionId,
       };
@@ -181,10 +213,25 @@ export default function TestDetail() {
 
       console.log("Saving progress data:", progressData);
       try {
-        await fetchWithAuth(`test_attempt.test_attempt.save_attempt_progress`, {
-          method: "PATCH",
-          body: payload, // Send the correctly structured payload
-        });
+        const response = await fetchWithAuth(
+          `test_attempt.test_attempt.save_attempt_progress`,
+          {
+            method: "PATCH",
+            body: payload, // Send the correctly structured payload
+          }
+        );
+        const result = response?.message;
+        if (result?.stale) {
+          // Another save got ahead of this one: continue after its revision and
+          // send every answer again with the next save
+          progressRevisionRef.current = result.revision;
+          lastSavedAnswersRef.current = {};
+          console.warn(`Progress save rejected as stale (${reason}).`);
+          setSavedStatus("idle");
+          return;
+        }
+        progressRevisionRef.current = revision;
+        lastSavedAnswersRef.current = serializedAnswers;
         console.log(`Progress saved successfully (${reason}).`);
         setSavedStatus("saved");
       } catch (error) {
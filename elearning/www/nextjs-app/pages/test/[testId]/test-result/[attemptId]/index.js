@@ -18,6 +18,9 @@ import { Skeleton } from "@/components/ui/skeleton";
 import { Alert, AlertDescription, AlertTitle } from "@/components/ui/alert";
 import { AlertCircle } from "lucide-react";
 
+// Feedback is generated in the background after submission, poll until it is ready
+const FEEDBACK_POLL_INTERVAL_MS = 3000;
+
 // Helper function to format duration (add this or import from utils)
 function formatDurationFromSeconds(totalSeconds) {
   if (totalSeconds === null || totalSeconds === undefined || totalSeconds < 0) {
@@ -61,6 +64,22 @@ export default function TestResultsPage() {
     }
   }, [router.isReady, attemptId]);
 
+  // Refresh the result while its feedback is still being generated
+  useEffect(() => {
+    if (!testResult?.feedback_pending || !attemptId) return;
+
+    const timer = setTimeout(async () => {
+      try {
+        const result = await fetchAttemptResult(attemptId);
+        if (result) setTestResult(result);
+      } catch (err) {
+        console.error("Failed to refresh test feedback:", err);
+      }
+    }, FEEDBACK_POLL_INTERVAL_MS);
+
+    return () => clearTimeout(timer);
+  }, [testResult, attemptId]);
+
   // Function to load data based on attemptId
   const loadTestResult = async (currentAttemptId) => {
     setLoading(true);
@@ -400,7 +419,10 @@ export default function TestResultsPage() {
             <Card className="bg-white shadow-sm">
               <CardContent className="pt-6">
                 {/* Use feedback data from testResult */}
-                <TestResultFeedback feedback={testResult.feedback} />
+                <TestResultFeedback
+                  feedback={testResult.feedback}
+                  pending={testResult.feedback_pending}
+                />
               </CardContent>
             </Card>
             <Card className="bg-white shadow-sm">
@@ -409,6 +431,7 @@ export default function TestResultsPage() {
                 <TestResultFeedback
                   title="Recommendations"
                   feedback={testResult.recommendation}
+                  pending={testResult.feedback_pending}
                   icon="thumbsUp"
                 />
               </CardContent>